@@ -10,6 +10,9 @@ Apparatus class
 
 Valid 'change_type' : "set_to", "increase_by", "decrease_by"
 
+- The on/off state can be bound to an element of a states array, so a HomeSimulation applies the
+  apparatus of all rooms at once.
+
 """
 
 class Apparatus:
@@ -19,5 +22,19 @@ class Apparatus:
         self.affected_stat = affected_stat
         self.change_type = change_type
         self.change_amount = change_amount
-        self.on = False
+        self._states = [False]
+        self._index = 0
+
+    def bind(self, states, index):
+        states[index] = self.on
+        self._states = states
+        self._index = index
+
+    @property
+    def on(self):
+        return bool(self._states[self._index])
+
+    @on.setter
+    def on(self, on):
+        self._states[self._index] = on
     
\ No newline at end of file
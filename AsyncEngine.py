@@ -0,0 +1,346 @@
+"""
+AsyncEngine Class
+- Runs the services of one or many NDNNodes on a single asyncio event loop, instead of a thread per
+  service and a thread per accepted TCP connection.
+- The engine hosts the following services for every node:
+    1. TCP listener for interest and data packets.
+    2. UDP listener for discovery and routing broadcasts.
+    3. Broadcast beacon announcing the presence of the node.
+    4. Timer expiring interests in the PIT.
+- Received packets are passed to the same NDNNode.handle_packet and NDNNode.handle_broadcast methods that
+  the threaded mode uses, so interests and data are handled the same way in both modes.
+- Like the ConnectionPool of the threaded mode, the engine keeps one persistent connection from every
+  node to each of its peers, which is closed when idle or when the peer goes offline.
+- Packets sent from other threads are handed to the event loop in batches, with one wake-up of the loop
+  per batch. A packet to a peer with an open connection is written to it right away. Otherwise it is
+  queued for the peer, and one task per peer connects and sends the queued packets in order.
+
+Example Usage:
+    engine = AsyncEngine()
+    node = NDNNode(node_name, port, broadcast_port, sensor_types, sensors, engine=engine)
+    node.start()
+"""
+
+import asyncio
+import socket
+import threading
+import time
+from collections import deque
+
+from framing import FrameBuffer
+
+SERVICES = ('connections', 'discovery', 'beacon', 'pending_interests')
+
+
+class AsyncEngine:
+    MAX_WRITE_BUFFER = 64 * 1024  # Bytes buffered on a connection above which packets wait in the queue
+
+    def __init__(self, connect_timeout=5.0, idle_timeout=30.0, max_pending_sends=64):
+        self.connect_timeout = connect_timeout
+        self.idle_timeout = idle_timeout
+        self.loop = asyncio.new_event_loop()
+        # Limits concurrent outgoing connections so bursts do not overflow the listen backlog of peers
+        self._send_slots = asyncio.Semaphore(max_pending_sends)
+        self._thread = None
+        self._services = {}
+        self._tasks = set()
+        self._connections = {}  # (node name, peer name) -> (reader, writer, time of last use)
+        self._send_queues = {}  # (node name, peer name) -> packets waiting for the connection to the peer
+        self._incoming = set()
+        self._outbox = deque()  # Packets sent from other threads
+        self._outbox_lock = threading.Lock()
+        self._outbox_scheduled = False
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+            self.loop.call_soon_threadsafe(self._spawn, self._evict_idle_connections())
+
+    def stop(self):
+        if self._thread is not None:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), self.loop).result()
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join()
+            self._thread = None
+
+    def start_node(self, node, services=SERVICES):
+        self.start()
+        self._run_coroutine(self._start_node(node, services))
+
+    def stop_node(self, node):
+        self._run_coroutine(self._stop_node(node))
+
+    def send(self, node, peer_node_name, addr, packet, json_packet, on_failure=None):
+        """
+        Queue an encoded packet to be sent to addr. This can be called from any thread.
+        If the packet cannot be delivered, on_failure is called on the event loop.
+        """
+        if self._in_loop():
+            self._send(node, peer_node_name, addr, packet, json_packet, on_failure)
+            return
+        with self._outbox_lock:
+            self._outbox.append((node, peer_node_name, addr, packet, json_packet, on_failure))
+            if self._outbox_scheduled:
+                return
+            self._outbox_scheduled = True
+        self.loop.call_soon_threadsafe(self._flush_outbox)
+
+    def broadcast(self, node, packet):
+        """
+        Broadcast a packet to the broadcast port of the node. This can be called from any thread.
+        """
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            s.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+            s.sendto(packet, ('<broadcast>', node.broadcast_port))
+
+    def call_later(self, delay, callback):
+        """
+        Call callback after delay seconds on the event loop. This can be called from any thread.
+        """
+        self._call_soon(self.loop.call_later, delay, callback)
+
+    def close_connections(self, node, peer_node_name=None):
+        """
+        Close the connections of a node to a peer, or to all peers if no peer is given.
+        This can be called from any thread.
+        """
+        self._call_soon(self._close_connections, node.node_name, peer_node_name)
+
+    # -------------------------------------------------------------------------
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def _in_loop(self):
+        try:
+            return asyncio.get_running_loop() is self.loop
+        except RuntimeError:
+            return False
+
+    def _call_soon(self, callback, *args):
+        if self._in_loop():
+            callback(*args)
+        else:
+            self.loop.call_soon_threadsafe(callback, *args)
+
+    def _run_coroutine(self, coro):
+        if self._in_loop():
+            self._spawn(coro)
+        else:
+            asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    def _spawn(self, coro):
+        # Keep a reference to running tasks so that they are not garbage collected
+        task = self.loop.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _shutdown(self):
+        for node in list(self._services):
+            await self._stop_node(node)
+        for key in list(self._connections):
+            self._close_connection(key)
+
+        for transport in list(self._incoming):
+            transport.close()
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await asyncio.sleep(0)
+
+    async def _start_node(self, node, services):
+        handles = []
+        if 'connections' in services:
+            server = await self.loop.create_server(lambda: _StreamProtocol(self, node), node.host, node.port)
+            handles.append(server)
+            node.logger.info("%s is listening for connections on port %s", node.node_name, node.port)
+
+        if 'discovery' in services:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+            sock.bind((node.host, node.broadcast_port))
+            transport, _ = await self.loop.create_datagram_endpoint(lambda: _BroadcastProtocol(node), sock=sock)
+            handles.append(transport)
+            node.logger.info("%s listening for broadcasts on %s", node.node_name, node.broadcast_port)
+
+        if 'beacon' in services:
+            handles.append(self._spawn(self._broadcast_presence(node)))
+
+        if 'pending_interests' in services:
+            handles.append(self._spawn(self._expire_pending_interests(node)))
+
+        self._services[node] = handles
+
+    async def _stop_node(self, node):
+        for handle in self._services.pop(node, []):
+            if isinstance(handle, asyncio.Task):
+                handle.cancel()
+            else:
+                handle.close()
+
+    def _flush_outbox(self):
+        with self._outbox_lock:
+            sends = self._outbox
+            self._outbox = deque()
+            self._outbox_scheduled = False
+        for send in sends:
+            self._send(*send)
+
+    def _send(self, node, peer_node_name, addr, packet, json_packet, on_failure):
+        key = (node.node_name, peer_node_name)
+        queue = self._send_queues.get(key)
+        if queue is None:
+            connection = self._connections.get(key)
+            # Peers never write back on these connections, so EOF means the peer closed it
+            if (connection is not None and not connection[0].at_eof() and not connection[1].is_closing()
+                    and connection[1].transport.get_write_buffer_size() <= self.MAX_WRITE_BUFFER):
+                connection[1].write(packet)
+                self._connections[key] = (connection[0], connection[1], time.monotonic())
+                node.logger.debug("Sent %s '%s' to %s",
+                                  json_packet['type'], json_packet['name'], json_packet['destination'])
+                return
+            queue = self._send_queues[key] = deque()
+            self._spawn(self._send_queued(node, key, addr, queue))
+        queue.append((packet, json_packet, on_failure))
+
+    async def _send_queued(self, node, key, addr, queue):
+        # The only task sending to the peer, until its queue is empty
+        try:
+            async with self._send_slots:
+                while queue:
+                    packet, json_packet, on_failure = queue[0]
+                    try:
+                        try:
+                            writer = await self._get_connection(key, addr)
+                            writer.write(packet)
+                            await writer.drain()
+                        except ConnectionError:
+                            # Pooled connection was broken, reconnect once
+                            self._close_connection(key)
+                            writer = await self._get_connection(key, addr)
+                            writer.write(packet)
+                            await writer.drain()
+                    except Exception as err:
+                        self._close_connection(key)
+                        node.logger.error("Error in send_packet() to %s %s: %s", key[1], type(err).__name__, err)
+                        # The peer cannot be reached, so the packets queued for it fail as well
+                        failed = list(queue)
+                        queue.clear()
+                        for _, _, on_failure in failed:
+                            if on_failure is not None:
+                                on_failure()
+                        continue
+                    queue.popleft()
+                    node.logger.debug("Sent %s '%s' to %s",
+                                      json_packet['type'], json_packet['name'], json_packet['destination'])
+        finally:
+            del self._send_queues[key]
+
+    async def _get_connection(self, key, addr):
+        connection = self._connections.get(key)
+        if connection is not None and (connection[0].at_eof() or connection[1].is_closing()):
+            self._close_connection(key)
+            connection = None
+        if connection is None:
+            reader, writer = await asyncio.wait_for(asyncio.open_connection(*addr), self.connect_timeout)
+        else:
+            reader, writer, _ = connection
+        self._connections[key] = (reader, writer, time.monotonic())
+        return writer
+
+    def _close_connection(self, key):
+        connection = self._connections.pop(key, None)
+        if connection is not None:
+            connection[1].close()
+
+    def _close_connections(self, node_name, peer_node_name=None):
+        for key in list(self._connections):
+            if key[0] == node_name and peer_node_name in (None, key[1]):
+                self._close_connection(key)
+
+    async def _evict_idle_connections(self):
+        while True:
+            await asyncio.sleep(1)
+            deadline = time.monotonic() - self.idle_timeout
+            for key, (_, _, last_used) in list(self._connections.items()):
+                if last_used < deadline:
+                    self._close_connection(key)
+
+    async def _broadcast_presence(self, node):
+        transport, _ = await self.loop.create_datagram_endpoint(asyncio.DatagramProtocol,
+                                                                family=socket.AF_INET,
+                                                                allow_broadcast=True)
+        wake = asyncio.Event()
+        node.beacon.on_wake = lambda: self._call_soon(wake.set)
+        try:
+            while node.running:
+                transport.sendto(node.build_presence_packet(), ('<broadcast>', node.broadcast_port))
+                try:
+                    await asyncio.wait_for(wake.wait(), node.beacon.next_delay(len(node.fib.peer_list)))
+                except asyncio.TimeoutError:
+                    pass
+                wake.clear()
+        finally:
+            node.beacon.on_wake = None
+            transport.close()
+
+    async def _expire_pending_interests(self, node):
+        while node.running:
+            await asyncio.sleep(node.pit.tick)
+            node.expire_pending_interests()
+
+
+class _BroadcastProtocol(asyncio.DatagramProtocol):
+    def __init__(self, node):
+        self.node = node
+
+    def datagram_received(self, data, addr):
+        # An exception here would close the transport, and the node would stop discovering peers
+        try:
+            self.node.handle_broadcast(data, addr)
+        except Exception as err:
+            self.node.logger.error("Error in handle_broadcast() of datagram from %s %s: %s",
+                                   addr, type(err).__name__, err)
+
+
+class _StreamProtocol(asyncio.BufferedProtocol):
+    """
+    Receives frames of an incoming connection directly into the buffer of a FrameBuffer.
+    """
+
+    def __init__(self, engine, node):
+        self.engine = engine
+        self.node = node
+        self.frames = FrameBuffer()
+        self.transport = None
+        self.addr = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.addr = transport.get_extra_info('peername')
+        self.engine._incoming.add(transport)
+
+    def connection_lost(self, exc):
+        self.engine._incoming.discard(self.transport)
+
+    def get_buffer(self, sizehint):
+        return self.frames.get_buffer()
+
+    def buffer_updated(self, nbytes):
+        try:
+            packets = self.frames.buffer_updated(nbytes)
+        except ValueError as err:
+            self.node.logger.error("Closing connection from %s: %s", self.addr, err)
+            self.transport.close()
+            return
+        for packet in packets:
+            self.node.handle_packet(packet, self.addr)
+
+    def eof_received(self):
+        for packet in self.frames.eof():
+            self.node.handle_packet(packet, self.addr)
+        return False
@@ -0,0 +1,69 @@
+"""
+CommandQueue Class
+- Passes commands received by an NDNNode to the Device that applies them to the apparatus of its room.
+- The device blocks on get() until a command arrives, instead of polling for commands.
+- Commands are delivered in the order they were received. A command for an apparatus that still has a command
+  pending replaces the pending one, so redundant on/off commands are coalesced into the latest one.
+- The latency from receiving a command to applying it is recorded by the device and exposed by get_stats().
+"""
+
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+Command = namedtuple('Command', ['apparatus', 'effect', 'received'])
+
+
+class CommandQueue:
+    def __init__(self):
+        self._pending = OrderedDict()  # apparatus -> Command
+        self._condition = threading.Condition()
+        self.received = 0
+        self.coalesced = 0
+        self.applied = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def __len__(self):
+        return len(self._pending)
+
+    def put(self, apparatus, effect):
+        """
+        Queue a command, replacing a pending command for the same apparatus. This can be called from any thread.
+        """
+        with self._condition:
+            if apparatus in self._pending:
+                self.coalesced += 1
+            self._pending[apparatus] = Command(apparatus, effect, time.monotonic())
+            self.received += 1
+            self._condition.notify()
+
+    def get(self, timeout=None):
+        """
+        Get the oldest pending command, waiting up to timeout seconds for one. Returns None on timeout.
+        """
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._pending, timeout):
+                return None
+            _, command = self._pending.popitem(last=False)
+            return command
+
+    def record_applied(self, command):
+        """
+        Record that a command was applied, for the latency from receiving it.
+        """
+        latency = time.monotonic() - command.received
+        with self._condition:
+            self.applied += 1
+            self.total_latency += latency
+            self.max_latency = max(self.max_latency, latency)
+        return latency
+
+    def get_stats(self):
+        with self._condition:
+            return {'pending': len(self._pending),
+                    'received': self.received,
+                    'coalesced': self.coalesced,
+                    'applied': self.applied,
+                    'mean_latency': self.total_latency / self.applied if self.applied else 0.0,
+                    'max_latency': self.max_latency}
@@ -0,0 +1,99 @@
+"""
+ConnectionPool Class
+- Keeps long-lived TCP connections to the peers of an NDNNode, so that consecutive packets to the same
+  peer share one connection instead of paying a TCP handshake each.
+- A connection is checked out of the pool for a single send and returned to it afterwards. Several
+  threads sending to the same peer at once open additional connections, of which up to
+  max_idle_per_peer are kept.
+- Connections that broke are re-established once, idle connections are closed after idle_timeout
+  and all connections to a peer are closed when it goes offline.
+"""
+
+import select
+import socket
+import threading
+import time
+
+
+class ConnectionPool:
+    def __init__(self, connect_timeout=5.0, idle_timeout=30.0, max_idle_per_peer=2):
+        self.connect_timeout = connect_timeout
+        self.idle_timeout = idle_timeout
+        self.max_idle_per_peer = max_idle_per_peer
+        self._idle = {}  # peer name -> list of (socket, time of last use)
+        self._lock = threading.Lock()
+
+    def send(self, peer_node_name, addr, packet):
+        """
+        Send a packet to a peer over a pooled connection, reconnecting once if
+        the pooled connection is broken. Raises OSError if the packet could not be sent.
+        """
+        sock = self._checkout(peer_node_name)
+        if sock is not None:
+            try:
+                sock.sendall(packet)
+                self._checkin(peer_node_name, sock)
+                return
+            except OSError:
+                sock.close()
+
+        sock = socket.create_connection(addr, timeout=self.connect_timeout)
+        try:
+            sock.sendall(packet)
+        except OSError:
+            sock.close()
+            raise
+        self._checkin(peer_node_name, sock)
+
+    def evict_idle(self):
+        """
+        Close connections that have not been used for idle_timeout seconds.
+        """
+        deadline = time.monotonic() - self.idle_timeout
+        with self._lock:
+            for peer_node_name, idle in list(self._idle.items()):
+                for sock, last_used in idle:
+                    if last_used < deadline:
+                        sock.close()
+                idle[:] = [(sock, last_used) for sock, last_used in idle if last_used >= deadline]
+                if not idle:
+                    del self._idle[peer_node_name]
+
+    def close(self, peer_node_name=None):
+        """
+        Close the idle connections to a peer, or to all peers if no peer is given.
+        """
+        with self._lock:
+            peers = list(self._idle) if peer_node_name is None else [peer_node_name]
+            for peer in peers:
+                for sock, _ in self._idle.pop(peer, []):
+                    sock.close()
+
+    # -------------------------------------------------------------------------
+
+    def _checkout(self, peer_node_name):
+        with self._lock:
+            idle = self._idle.get(peer_node_name)
+            while idle:
+                sock, _ = idle.pop()
+                if self._is_alive(sock):
+                    return sock
+                sock.close()
+        return None
+
+    def _checkin(self, peer_node_name, sock):
+        with self._lock:
+            idle = self._idle.setdefault(peer_node_name, [])
+            if len(idle) < self.max_idle_per_peer:
+                idle.append((sock, time.monotonic()))
+                return
+        sock.close()
+
+    @staticmethod
+    def _is_alive(sock):
+        # Peers never write back on pooled connections, so a readable socket means it was closed or reset
+        try:
+            readable, _, _ = select.select([sock], [], [], 0)
+            return not readable or sock.recv(1, socket.MSG_PEEK) != b''
+        except OSError:
+            return False
@@ -6,30 +6,37 @@ Device:
     - Sensors read from the room stats of the passed in Room
     - Triggers are stored on device but passed down to DeviceSensor (read DeviceSensor to see how they work)
     - Trigger condition defaults set, but no default trigger functions yet
+    - Triggers can be loaded from a JSON file instead, and are compiled into a RuleEngine once
+    - Sensors subscribe to the room stats and only wake the device when their reading changes by more than their
+      deadband, instead of the device polling all sensors
+    - The device and its node log to the same logger, whose file is written by the log writer of the home
 """
 
-import logging
 import threading
+from logs import get_device_logger
 from NDNNode import NDNNode
+from RuleEngine import RuleEngine
 
 SENSOR_TYPES = ["temp", "humidity", "CO", "CO2", "motion", "light"]
 
 class Device:
-    def __init__(self, room, home_id, device_id, listening_port, broadcast_port, trusted=True):
+    def __init__(self, room, home_id, device_id, listening_port, broadcast_port, trusted=True, engine=None,
+                 trigger_file=None):
         self._room = room
         self.device_id = device_id
         self.full_id = home_id + '/' + device_id
         self.trusted = trusted
-        self.logger = logging.getLogger(f"{self.full_id}_logger")
-        handler = logging.FileHandler(f"{home_id}/device_logs/{self.device_id}.log")
-        formatter = logging.Formatter("%(asctime)s.%(msecs)04d [%(levelname)s] %(message)s", datefmt="%H:%M:%S:%m")
-        handler.setFormatter(formatter)
-        self.logger.addHandler(handler)
-        self.logger.setLevel(logging.DEBUG)
+        self.logger = get_device_logger(home_id, device_id)
         
         self._sensors = [self.DeviceSensor(device_id, sens_type, self._room) 
                          for sens_type in SENSOR_TYPES]
-        self.node = NDNNode(self.full_id, listening_port, broadcast_port, SENSOR_TYPES, self._sensors)
+        self._changed_sensors = []
+        self._sensors_changed = threading.Condition()
+        if self._room is not None:
+            for sensor in self._sensors:
+                self._room.stats.subscribe(sensor.sensor_type,
+                                           lambda value, sensor=sensor: self._on_stat_change(sensor, value))
+        self.node = NDNNode(self.full_id, listening_port, broadcast_port, SENSOR_TYPES, self._sensors, engine)
         
 
         # Default Triggers
@@ -48,38 +55,60 @@ class Device:
             "motion":   [("<", 1, "lights", "off"),
                          (">", 0, "lights", "on")]               
         }
+        self._rules = RuleEngine.from_file(trigger_file) if trigger_file else RuleEngine(self._triggers)
+        self._triggers = self._rules.triggers
         
         self.on = False
 
     def _check_commands(self):
+        # Blocks until the node receives a command, waking up once a second to check whether the device is on
         while self.on:
-            for apparatus, effect in self.node.commands:
-                self._room.apparatus[apparatus].on = effect
-                self.logger.debug(f"{self.device_id}: Recieved command to turn '{apparatus}' '{effect}'")
-                self.node.commands.remove((apparatus, effect))
+            command = self.node.commands.get(timeout=1.0)
+            if command is None:
+                continue
+            if command.apparatus not in self._room.apparatus:
+                self.logger.warning("%s: Recieved command for unknown apparatus '%s'",
+                                    self.device_id, command.apparatus)
+                continue
+            self._room.apparatus[command.apparatus].on = (command.effect == "on")
+            latency = self.node.commands.record_applied(command)
+            self.logger.debug("%s: Recieved command to turn '%s' '%s' (applied after %.2f ms)",
+                              self.device_id, command.apparatus, command.effect, latency * 1000)
+
+    def _on_stat_change(self, sensor, value):
+        # Called by the thread that changed the room stat
+        if sensor.is_changed(value):
+            with self._sensors_changed:
+                if sensor not in self._changed_sensors:
+                    self._changed_sensors.append(sensor)
+                self._sensors_changed.notify()
 
     def _run_sensors(self):
+        with self._sensors_changed:
+            self._changed_sensors = list(self._sensors)
+        # Blocks until a reading changes, waking up once a second to check whether the device is on
         while self.on:
-            for sensor in self._sensors:
+            with self._sensors_changed:
+                self._sensors_changed.wait_for(lambda: self._changed_sensors, timeout=1.0)
+                changed_sensors, self._changed_sensors = self._changed_sensors, []
+            for sensor in changed_sensors:
                 reading = sensor.get_reading()
-                if reading != sensor.last_reading:
+                if sensor.is_changed(reading):
                     sensor.last_reading = reading
                     self._actuate(sensor.sensor_type, reading)
 
     def _actuate(self, sensor_type, reading):
-        if sensor_type in self._triggers:
-            for (comparer, value, apparatus, effect) in self._triggers[sensor_type]:
-                compare_string = f"{reading} {comparer} {value}"
-                if eval(compare_string) and apparatus in self._room.apparatus:
-                    if self._room.apparatus[apparatus].on != (effect == "on"):
-                        self._room.apparatus[apparatus].on = (effect == "on")
-                        self.logger.debug(f"{self.device_id}: actuating {apparatus} {effect}")
+        for apparatus, effect in self._rules.fired(sensor_type, reading):
+            if apparatus in self._room.apparatus:
+                if self._room.apparatus[apparatus].on != (effect == "on"):
+                    self._room.apparatus[apparatus].on = (effect == "on")
+                    self.logger.debug("%s: actuating %s %s", self.device_id, apparatus, effect)
 
     def actuate(self, apparatus_name):
         # public version of actuate, it just toggles on/off an apparatus
         apparatus = self._room.apparatus[apparatus_name]
         apparatus.on = not apparatus.on
-        self.logger.debug(f"{self.device_id}: actuating {apparatus_name} {'on' if apparatus.on else 'off'}")
+        self.logger.debug("%s: actuating %s %s", self.device_id, apparatus_name, 'on' if apparatus.on else 'off')
 
     def turn_on(self):
         self.on = True
@@ -89,17 +118,17 @@ class Device:
             t.daemon = True
             t.start()
         self.node.start()
-        self.logger.debug(f"{self.device_id} is on")
+        self.logger.debug("%s is on", self.device_id)
 
     def turn_on_untrusted(self):
         self.on = True
         self.node.start_untrusted()
-        self.logger.debug(f"{self.device_id} (untrusted) is on")
+        self.logger.debug("%s (untrusted) is on", self.device_id)
 
     def turn_off(self):
         self.on = False
         self.node.stop()
-        self.logger.debug(f"{self.device_id} is off")
+        self.logger.debug("%s is off", self.device_id)
     
     def toggle(self):
         if self.on:
@@ -110,13 +139,19 @@ class Device:
     """
     DeviceSensor:
         - Reads the correct stat from the room (eg 'temp' sensor reads 'temp' stat)
+        - A reading only counts as changed if it differs from the last reading by more than the deadband
     """
     class DeviceSensor:
-        def __init__(self, device_id, sensor_type, room):
+        def __init__(self, device_id, sensor_type, room, deadband=0):
             self.room = room
             self.name = device_id + '/' + sensor_type
             self.sensor_type = sensor_type
+            self.deadband = deadband
             self.last_reading = None
 
         def get_reading(self):
             return round(self.room.stats[self.sensor_type], 3)
+
+        def is_changed(self, value):
+            last_reading = self.last_reading
+            return last_reading is None or abs(round(value, 3) - last_reading) > self.deadband
@@ -6,18 +6,43 @@ ECCManager Class
     1. Generating private key and public key for each Name Data Network node.
     2. Generating shared key between any pair of nodes to establish trusted connections.
     3. Encrypt and decrypt data using shared secrets.
+    4. Creating a PeerSession per peer, which keeps an AES-GCM context for the shared secret, so packets to and
+       from the peer are encrypted and authenticated without building a cipher for every packet.
+- Sessions are derived lazily from the PEM public keys that peers announce, when the first packet is sent to
+  or received from the peer, so discovering many peers at once never blocks the discovery listener on key
+  agreement. Sessions are cached by the fingerprint of the public key, and parsed public keys are shared by all
+  nodes of the process.
 """
 
-from cryptography.hazmat.primitives import hashes
+import functools
+import hashlib
+import itertools
+import os
+import threading
+
+from cryptography.hazmat.primitives import hashes, serialization
 from cryptography.hazmat.primitives.asymmetric import ec
 from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 from cryptography.hazmat.backends import default_backend
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
-import os
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+@functools.lru_cache(maxsize=4096)
+def load_public_key(public_key_pem):
+    return serialization.load_pem_public_key(public_key_pem.encode('utf-8'), backend=default_backend())
+
+
+def fingerprint(public_key_pem):
+    return hashlib.sha256(public_key_pem.encode('utf-8')).digest()
+
 
 class ECCManager:
     def __init__(self):
         self.private_key = ec.generate_private_key(ec.SECP256R1(), default_backend())
+        self._public_point = self.private_key.public_key().public_bytes(serialization.Encoding.X962,
+                                                                        serialization.PublicFormat.UncompressedPoint)
+        self._sessions = {}  # public key fingerprint -> PeerSession
+        self._sessions_lock = threading.Lock()
 
     def get_public_key(self):
         return self.private_key.public_key()
@@ -34,6 +59,30 @@ class ECCManager:
         ).derive(shared_secret)
         return derived_key
 
+    def create_session(self, peer_public_key):
+        """
+        Derive the shared secret with a peer and create the session used for all packets exchanged with it.
+        """
+        # Both peers derive the same key, so they use distinct nonce prefixes, ordered by their public keys
+        peer_point = peer_public_key.public_bytes(serialization.Encoding.X962,
+                                                  serialization.PublicFormat.UncompressedPoint)
+        side = b'\x01' if self._public_point > peer_point else b'\x00'
+        nonce_prefix = bytes(PeerSession.NONCE_PREFIX_SIZE - 1) + side
+        return PeerSession(self.generate_shared_secret(peer_public_key), nonce_prefix)
+
+    def get_session(self, peer_public_key_pem):
+        """
+        Get the session for a PEM public key, deriving it on first use.
+        A peer that comes back with the same public key gets its previous session, so nonces are never reused.
+        """
+        key = fingerprint(peer_public_key_pem)
+        with self._sessions_lock:
+            session = self._sessions.get(key)
+            if session is None:
+                session = self.create_session(load_public_key(peer_public_key_pem))
+                self._sessions[key] = session
+        return session
+
     def encrypt_data(self, key, data):
         iv = os.urandom(16)
         cipher = Cipher(algorithms.AES(key), modes.CFB(iv), backend=default_backend())
@@ -45,3 +94,45 @@ class ECCManager:
         cipher = Cipher(algorithms.AES(key), modes.CFB(iv), backend=default_backend())
         decryptor = cipher.decryptor()
         return decryptor.update(encrypted_data[16:]) + decryptor.finalize()
+
+
+class PeerSession:
+    """
+    AES-GCM session with one peer.
+    - The AESGCM context, and with it the key schedule, is created once per peer.
+    - Every packet is sealed under a 12 byte nonce made of the nonce prefix of this side and a packet counter,
+      which is sent in front of the ciphertext, so nonces never repeat for the lifetime of the key.
+    - The raw key stays available for the AES-CFB encryption of ECCManager, used with peers on API version v2.
+    """
+
+    NONCE_PREFIX_SIZE = 4
+    NONCE_SIZE = 12
+
+    def __init__(self, key, nonce_prefix):
+        self.key = key
+        self._aead = AESGCM(key)
+        self._nonce_prefix = nonce_prefix
+        self._counter = itertools.count()  # next() is atomic, so sending threads never share a nonce
+
+    def encrypt(self, data):
+        nonce = self._nonce_prefix + next(self._counter).to_bytes(self.NONCE_SIZE - self.NONCE_PREFIX_SIZE, 'big')
+        return nonce + self._aead.encrypt(nonce, data, None)
+
+    def decrypt(self, encrypted_data):
+        """
+        Decrypt data sealed by the session of the peer.
+        Raises cryptography.exceptions.InvalidTag if the data was not sealed with the shared key or was altered.
+        """
+        return self._aead.decrypt(encrypted_data[:self.NONCE_SIZE], encrypted_data[self.NONCE_SIZE:], None)
+
+    def encrypt_batch(self, data_list):
+        """
+        Encrypt many packets to the peer, with the nonces reserved in one go.
+        """
+        encrypt, prefix, counter_size = self._aead.encrypt, self._nonce_prefix, self.NONCE_SIZE - self.NONCE_PREFIX_SIZE
+        nonces = [prefix + next(self._counter).to_bytes(counter_size, 'big') for _ in data_list]
+        return [nonce + encrypt(nonce, data, None) for nonce, data in zip(nonces, data_list)]
+
+    def decrypt_batch(self, encrypted_data_list):
+        decrypt, nonce_size = self._aead.decrypt, self.NONCE_SIZE
+        return [decrypt(data[:nonce_size], data[nonce_size:], None) for data in encrypted_data_list]
@@ -0,0 +1,300 @@
+"""
+HomeRunner Class
+- Runs a smart home headless, with its rooms partitioned across a pool of worker processes, so a home of
+  hundreds or thousands of rooms is not limited to the threads of one interpreter and its GIL.
+- Every HomeWorker owns the Rooms, Devices and NDNNodes of a contiguous shard of rooms. Its HomeSimulation
+  steps the rows of its rooms in arrays memory-mapped from room_stats/simulation.bin, which the runner appends
+  to the StatsStore of the home every step, so RoomMonitor and UntrustedDevice see the home as before.
+- Startup is in order: every worker builds its rooms and reports 'ready', and the devices are only turned on
+  once all workers are ready. On shutdown, the workers turn their devices off, report 'stopped' and exit,
+  and workers that do not stop in time are terminated.
+- A scripted workload replaces the interactive menu of SmartHome: motion walks through the rooms of every
+  worker, and the devices send interests for random data of random rooms of the home at a given rate.
+- Workers report their health every report interval, and the runner prints one line aggregated over all
+  workers and reports workers that exited or stopped reporting.
+- The metrics of the nodes of every worker are served on metrics_port + worker and/or written to
+  room_stats/metrics_<worker>.json every metrics_interval seconds.
+
+Example Usage:
+    runner = HomeRunner("home_1", n_rooms=1000, workers=4, interest_rate=10)
+    runner.run(duration=60)
+"""
+
+import multiprocessing
+import queue
+import random
+import signal
+import threading
+import time
+
+import numpy as np
+
+from AsyncEngine import AsyncEngine
+from Device import SENSOR_TYPES
+from HomeSimulation import APPARATUS, STATS, HomeSimulation
+from logs import close_logs, set_level
+from metrics import MetricsExporter
+from Room import Room
+from StatsStore import StatsStore
+
+LISTENING_PORT = 8080
+BROADCAST_PORT = 33000
+
+
+def shared_arrays(path, n_rooms, create=False):
+    """
+    Map the stats (rooms x stats) and apparatus states (rooms x apparatus) of a home from a file.
+    """
+    stats_size = n_rooms * len(STATS) * 8
+    if create:
+        with open(path, 'wb') as file:
+            file.truncate(stats_size + n_rooms * len(APPARATUS))
+    stats = np.memmap(path, dtype='<f8', mode='r+', shape=(n_rooms, len(STATS)))
+    apparatus_on = np.memmap(path, dtype=bool, mode='r+', offset=stats_size, shape=(n_rooms, len(APPARATUS)))
+    return stats, apparatus_on
+
+
+def shard(n_rooms, workers):
+    """
+    Split the rooms of a home into contiguous (start, stop) ranges of about the same size, one per worker.
+    """
+    bounds = np.linspace(0, n_rooms, min(workers, n_rooms) + 1).astype(int).tolist()
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+class HomeWorker:
+    def __init__(self, worker, home_id, n_rooms, rooms, use_asyncio=False, trigger_file=None, interest_rate=0.0,
+                 metrics_port=None, metrics_interval=None, log_level=None, strategies=()):
+        self.worker = worker
+        self.home_id = home_id
+        self.n_rooms = n_rooms
+        self.interest_rate = interest_rate
+        self.interests_sent = 0
+        self.running = False
+        if log_level is not None:
+            set_level(log_level)
+        start, stop = rooms
+        stats, apparatus_on = shared_arrays(f"{home_id}/room_stats/simulation.bin", n_rooms)
+        self.simulation = HomeSimulation(stop - start, stats=stats[start:stop], apparatus_on=apparatus_on[start:stop])
+        self.engine = AsyncEngine() if use_asyncio else None
+        self.rooms = [Room(home_id, f"room_{i}", LISTENING_PORT + i, BROADCAST_PORT, self.engine, trigger_file,
+                           simulation=self.simulation, index=i - start) for i in range(start, stop)]
+        for room in self.rooms:
+            for prefix, strategy in strategies:
+                room.device.node.set_strategy(prefix, strategy)
+        self.exporter = None
+        if metrics_port is not None or metrics_interval:
+            self.exporter = MetricsExporter(
+                [room.device.node.metrics for room in self.rooms],
+                port=None if metrics_port is None else metrics_port + worker,
+                snapshot_file=f"{home_id}/room_stats/metrics_{worker}.json" if metrics_interval else None,
+                interval=metrics_interval)
+
+    @classmethod
+    def main(cls, worker, home_id, n_rooms, rooms, options, report_interval, start_event, stop_event, reports):
+        """
+        Entry point of a worker process: build the rooms, start them once all workers are ready, report health
+        until stopped.
+        """
+        # Ctrl-C reaches the whole process group, the runner decides when the workers stop
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        try:
+            home_worker = cls(worker, home_id, n_rooms, rooms, **options)
+        except Exception as e:
+            reports.put({'worker': worker, 'state': 'failed', 'error': repr(e)})
+            return
+        reports.put({'worker': worker, 'state': 'ready'})
+        while not start_event.wait(1.0):
+            if stop_event.is_set():
+                return
+        home_worker.start()
+        reports.put(home_worker.health())
+        while not stop_event.wait(report_interval):
+            reports.put(home_worker.health())
+        home_worker.stop()
+        close_logs()
+        reports.put(dict(home_worker.health(), state='stopped'))
+
+    def start(self):
+        self.running = True
+        for room in self.rooms:
+            room.device.turn_on()
+        threads = [threading.Thread(target=self.simulation.run),
+                   threading.Thread(target=self.simulate_walking)]
+        if self.interest_rate > 0:
+            threads.append(threading.Thread(target=self.send_interests))
+        for t in threads:
+            t.daemon = True
+            t.start()
+        if self.exporter is not None:
+            self.exporter.start()
+
+    def stop(self):
+        self.running = False
+        self.simulation.stop()
+        for room in self.rooms:
+            room.device.turn_off()
+        if self.engine is not None:
+            self.engine.stop()
+        if self.exporter is not None:
+            self.exporter.stop()
+
+    def simulate_walking(self):
+        # simulate motion in the rooms of the worker
+        while self.running:
+            room = random.choice(self.rooms)
+            room.stats['motion'] = 1
+            time.sleep(random.uniform(0, 5))
+            room.stats['motion'] = 0
+
+    def send_interests(self):
+        # send interests for random data of random rooms of the home, from random rooms of the worker
+        while self.running:
+            time.sleep(random.expovariate(self.interest_rate))
+            node = random.choice(self.rooms).device.node
+            destination = f"{self.home_id}/room_{random.randrange(self.n_rooms)}_device"
+            if node.running and destination != node.node_name:
+                node.create_send_interest_packet(f"{destination}/{random.choice(SENSOR_TYPES)}", destination)
+                self.interests_sent += 1
+
+    def health(self):
+        nodes = [room.device.node for room in self.rooms]
+        pit_stats = [node.pit.get_stats() for node in nodes]
+        cs_stats = [node.cs.get_stats() for node in nodes]
+        return {'worker': self.worker,
+                'state': 'running',
+                'rooms': len(self.rooms),
+                'devices_on': sum(room.device.on for room in self.rooms),
+                'peers': sum(len(node.fib.peer_list) for node in nodes),
+                'interests_sent': self.interests_sent,
+                'pending_interests': sum(stats['entries'] for stats in pit_stats),
+                'satisfied': sum(stats['satisfied'] for stats in pit_stats),
+                'expired': sum(stats['expired'] for stats in pit_stats),
+                'rejected': sum(stats['rejected'] for stats in pit_stats),
+                'cs_hits': sum(stats['hits'] for stats in cs_stats),
+                'cs_misses': sum(stats['misses'] for stats in cs_stats),
+                'commands_applied': sum(node.commands.get_stats()['applied'] for node in nodes),
+                'time': time.time()}
+
+
+class HomeRunner:
+    def __init__(self, home_id, n_rooms, workers, use_asyncio=False, trigger_file=None, interest_rate=0.0,
+                 report_interval=5.0, startup_timeout=120.0, shutdown_timeout=30.0, metrics_port=None,
+                 metrics_interval=None, log_level=None, strategies=()):
+        self.home_id = home_id
+        self.n_rooms = n_rooms
+        self.shards = shard(n_rooms, workers)
+        self.options = {'use_asyncio': use_asyncio, 'trigger_file': trigger_file,
+                        'interest_rate': interest_rate / len(self.shards),
+                        'metrics_port': metrics_port, 'metrics_interval': metrics_interval, 'log_level': log_level,
+                        'strategies': list(strategies)}
+        self.report_interval = report_interval
+        self.startup_timeout = startup_timeout
+        self.shutdown_timeout = shutdown_timeout
+        self.stats, self.apparatus_on = shared_arrays(f"{home_id}/room_stats/simulation.bin", n_rooms,
+                                                      create=True)
+        self.store = StatsStore.create(f"{home_id}/room_stats/stats.bin", n_rooms)
+        context = multiprocessing.get_context('spawn')
+        self.start_event = context.Event()
+        self.stop_event = context.Event()
+        self.reports = context.Queue()
+        self.processes = [context.Process(target=HomeWorker.main, name=f"{home_id}_worker_{worker}",
+                                          args=(worker, home_id, n_rooms, rooms, self.options, report_interval,
+                                                self.start_event, self.stop_event, self.reports))
+                          for worker, rooms in enumerate(self.shards)]
+        self.health = {}  # worker -> latest report
+
+    def run(self, duration=None):
+        """
+        Start the workers and log the stats of the home every second, until the duration in seconds elapsed
+        (or forever) or Ctrl-C.
+        """
+        try:
+            if self.start():
+                self.log_stats(duration)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def start(self):
+        started = time.monotonic()
+        for process in self.processes:
+            process.start()
+        print(f"Starting {self.n_rooms} rooms on {len(self.processes)} workers...")
+        ready = set()
+        while len(ready) < len(self.processes):
+            try:
+                report = self.reports.get(timeout=max(0.0, started + self.startup_timeout - time.monotonic()))
+            except queue.Empty:
+                print(f"Workers {sorted(set(range(len(self.processes))) - ready)} did not start in time")
+                return False
+            if report['state'] == 'failed':
+                print(f"Worker {report['worker']} failed to start: {report['error']}")
+                return False
+            ready.add(report['worker'])
+        self.start_event.set()
+        print(f"All workers ready after {time.monotonic() - started:.1f} s, devices are turning on")
+        return True
+
+    def log_stats(self, duration=None):
+        started = time.monotonic()
+        next_report = started + self.report_interval
+        while duration is None or time.monotonic() - started < duration:
+            step = time.monotonic()
+            self.store.append(time.time(), self.stats, self.apparatus_on)
+            self.collect_reports()
+            if step >= next_report:
+                print(self.summary(step - started))
+                next_report += self.report_interval
+            time.sleep(max(0.0, 1.0 - (time.monotonic() - step)))
+
+    def collect_reports(self):
+        while True:
+            try:
+                report = self.reports.get_nowait()
+            except queue.Empty:
+                return
+            self.health[report['worker']] = report
+
+    def summary(self, elapsed):
+        now = time.time()
+        alive = []
+        for worker, process in enumerate(self.processes):
+            report = self.health.get(worker)
+            if not process.is_alive():
+                print(f"Worker {worker} exited with code {process.exitcode}")
+            elif report is None or now - report['time'] > 3 * self.report_interval:
+                print(f"Worker {worker} is not reporting")
+            else:
+                alive.append(report)
+
+        def total(key):
+            return sum(report[key] for report in alive)
+
+        lookups = total('cs_hits') + total('cs_misses')
+        return (f"[{elapsed:7.1f} s] workers {len(alive)}/{len(self.processes)} | "
+                f"devices on {total('devices_on')}/{self.n_rooms} | "
+                f"peers {total('peers') / max(1, total('rooms')):.1f} avg | "
+                f"interests {total('interests_sent')} sent, {total('satisfied')} satisfied, "
+                f"{total('expired')} expired, {total('rejected')} without route, "
+                f"{total('pending_interests')} pending | "
+                f"CS hit rate {total('cs_hits') / lookups if lookups else 0:.0%} | "
+                f"commands {total('commands_applied')} applied")
+
+    def stop(self):
+        print("Turning off devices safely...")
+        self.stop_event.set()
+        deadline = time.monotonic() + self.shutdown_timeout
+        # Keep draining the reports, a worker only exits once its reports are flushed to the queue
+        while any(process.is_alive() for process in self.processes) and time.monotonic() < deadline:
+            self.collect_reports()
+            time.sleep(0.1)
+        for process in self.processes:
+            if process.is_alive():
+                print(f"Worker {process.name} did not stop in time, terminating it")
+                process.terminate()
+            if process.pid is not None:
+                process.join()
+        self.collect_reports()
+        self.store.close()
@@ -0,0 +1,157 @@
+"""
+HomeSimulation Class
+- Simulates the stats of all rooms of a home in one thread. The stats of all rooms are stored in one NumPy array
+  with a row per room and a column per stat, and the on/off states of their apparatus in another one.
+- Every step advances all rooms at once: the effects of the apparatus that are on, then the natural changes of
+  the stats, clamped to their realistic ranges.
+- Room.stats is a RoomStats view of the row of its room, and the Apparatus of a room are bound to the states
+  array, so devices and the rest of the home read and write them as before. Subscribers of a stat are notified
+  whenever a step or a write changes it.
+- The arrays can be passed in, e.g. rows of arrays in shared memory when the rooms of a home are split across
+  processes. A step is computed on a copy and written back at once, so readers of the arrays see whole steps.
+
+Example Usage:
+    simulation = HomeSimulation(n_rooms)
+    stats = simulation.room_stats(0)
+    simulation.run()
+"""
+
+import threading
+import time
+from collections.abc import MutableMapping
+
+import numpy as np
+
+from Apparatus import Apparatus
+
+STATS = ("temp", "humidity", "CO", "CO2", "motion", "light")
+COLUMNS = {stat: column for column, stat in enumerate(STATS)}
+INITIAL_STATS = {
+    "temp": 20,         # Temp in degrees Celsius
+    "humidity": 0.4,    # Humidity percentage as decimal
+    "CO": 30,           # CO level in ppm (parts per million)
+    "CO2": 400,         # CO2 level in ppm (parts per million)
+    "motion": 0,        # Whether or not something is moving in the room (0 or 1)
+    "light": 0,         # Light level in lux
+}
+# Maximum natural change of a stat per step and the realistic range it is kept in
+NATURAL_CHANGES = {"temp": 0.01, "humidity": 0.005, "CO": 0.01, "CO2": 0.01}
+STAT_RANGES = {"temp": (-10, 40), "humidity": (0, 1), "CO": (0, 100), "CO2": (300, 1000)}
+# Apparatus of every room: (affected stat, change type, change amount)
+APPARATUS = {
+    "heater":     ("temp", "increase_by", 0.1),
+    "lights":     ("light", "set_to", 100),
+    "ac":         ("temp", "decrease_by", 0.05),
+    "humidifier": ("humidity", "increase_by", 0.01),
+}
+
+
+class HomeSimulation:
+    def __init__(self, n_rooms, seed=None, stats=None, apparatus_on=None):
+        self.n_rooms = n_rooms
+        self.stats = np.empty((n_rooms, len(STATS))) if stats is None else stats
+        self.stats[:] = [INITIAL_STATS[stat] for stat in STATS]
+        self.apparatus_on = np.zeros((n_rooms, len(APPARATUS)), dtype=bool) if apparatus_on is None else apparatus_on
+        self.apparatus_on[:] = False
+        self.running = False
+        self._natural_changes = np.array([NATURAL_CHANGES.get(stat, 0) for stat in STATS])
+        self._lower = np.array([STAT_RANGES.get(stat, (-np.inf, np.inf))[0] for stat in STATS])
+        self._upper = np.array([STAT_RANGES.get(stat, (-np.inf, np.inf))[1] for stat in STATS])
+        self._effects = [(COLUMNS[stat], change_type, amount) for stat, change_type, amount in APPARATUS.values()]
+        self._random = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+        self._subscribed = np.zeros(self.stats.shape, dtype=bool)
+        self._subscribers = {}  # (room, stat column) -> list of callbacks
+
+    def room_stats(self, room):
+        return RoomStats(self, room)
+
+    def room_apparatus(self, room_id, room):
+        apparatus = {}
+        for column, (apparatus_type, (stat, change_type, amount)) in enumerate(APPARATUS.items()):
+            apparatus[apparatus_type] = Apparatus(room_id, apparatus_type, stat, change_type, amount)
+            apparatus[apparatus_type].bind(self.apparatus_on[room], column)
+        return apparatus
+
+    def subscribe(self, room, stat, callback):
+        with self._lock:
+            column = COLUMNS[stat]
+            self._subscribers.setdefault((room, column), []).append(callback)
+            self._subscribed[room, column] = True
+
+    def step(self):
+        """
+        Advance the stats of all rooms by one step and notify the subscribers of the stats that changed.
+        """
+        with self._lock:
+            stats = self.stats.copy()
+            for apparatus, (column, change_type, amount) in enumerate(self._effects):
+                on = self.apparatus_on[:, apparatus]
+                if change_type == "set_to":
+                    stats[:, column] = np.where(on, amount, 0)
+                elif change_type == "increase_by":
+                    stats[on, column] += amount
+                elif change_type == "decrease_by":
+                    stats[on, column] -= amount
+            stats += self._random.uniform(-1, 1, stats.shape) * self._natural_changes
+            np.clip(stats, self._lower, self._upper, out=stats)
+
+            changed = np.argwhere((stats != self.stats) & self._subscribed)
+            self.stats[:] = stats
+            notifications = [(self._subscribers[room, column], float(self.stats[room, column]))
+                             for room, column in changed.tolist()]
+        for callbacks, value in notifications:
+            for callback in callbacks:
+                callback(value)
+
+    def run(self, interval=1.0, on_step=None):
+        """
+        Step the simulation every interval seconds until stop() is called, calling on_step after every step.
+        """
+        self.running = True
+        while self.running:
+            start = time.monotonic()
+            self.step()
+            if on_step is not None:
+                on_step()
+            time.sleep(max(0, interval - (time.monotonic() - start)))
+
+    def stop(self):
+        self.running = False
+
+    def _set(self, room, stat, value):
+        column = COLUMNS[stat]
+        with self._lock:
+            changed = self.stats[room, column] != value
+            self.stats[room, column] = value
+            callbacks = self._subscribers.get((room, column), []) if changed else []
+        for callback in callbacks:
+            callback(float(value))
+
+
+class RoomStats(MutableMapping):
+    """
+    View of the stats of one room in a HomeSimulation, used like a dict of stats.
+    """
+
+    def __init__(self, simulation, room):
+        self._simulation = simulation
+        self._room = room
+
+    def subscribe(self, stat, callback):
+        self._simulation.subscribe(self._room, stat, callback)
+
+    def __getitem__(self, stat):
+        return float(self._simulation.stats[self._room, COLUMNS[stat]])
+
+    def __setitem__(self, stat, value):
+        self._simulation._set(self._room, stat, value)
+
+    def __delitem__(self, stat):
+        raise TypeError("Room stats cannot be deleted")
+
+    def __iter__(self):
+        return iter(STATS)
+
+    def __len__(self):
+        return len(STATS)
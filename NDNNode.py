@@ -3,10 +3,27 @@
 NDNNode Class
 - This class constructs a Node for Named Data Network based UDP protocol for broadcasting and TCP protocol for data exchange.
 - The class offers the following functionalities:
-    1. Broadcasting presence and distance vectors between nodes.
+    1. Broadcasting presence and distance vectors between nodes. Presence beacons back off while the
+       neighbourhood is stable and are re-announced quickly when it changes.
     2. Logics of handling and sending out broadcasting packet, routing packet, interest packet and data packet.
-    3. Register Pending Interest to PIT(Pending Interest Table) at each Node.
-    4. Save named data to CS(content store) which is cache for each Node and invalid them after certain time period.
+    3. Register Pending Interest to PIT(Pending Interest Table) at each Node. Identical interests are forwarded
+       once, and interests that are not satisfied within their lifetime are answered with a NACK.
+       Interests are forwarded with the forwarding strategy of their name prefix, e.g. to several routes at
+       once, and the first data that comes back satisfies them.
+       The FIB measures the round trip time of every neighbour an interest is sent to and counts the ones that
+       fail or do not reply, and ranks the routes by them, so traffic moves away from busy neighbours.
+    4. Save named data to CS(content store), a bounded LRU cache in which data expires after the freshness
+       period of its data name.
+- Packets to a peer are sent as length-prefixed frames over persistent connections, so that one
+  connection carries many packets of any size.
+- By default every service of the node runs in its own thread. If an AsyncEngine is given, the services run
+  on the event loop of the engine instead, which can be shared by many nodes.
+- The engine also carries the packets and broadcasts of the node, so a VirtualNetwork can be given instead,
+  which connects many nodes in one process without sockets.
+- Interests, data, sends, broadcasts and FIB updates are counted and timed in the MetricsRegistry of the
+  node, which a MetricsExporter serves over HTTP or writes to a snapshot file.
+- Messages are logged with lazily formatted arguments to the queue of the log writer of the home, so the
+  packet path does not format disabled messages or wait for the log file.
 """
 
 import base64
@@ -16,18 +33,27 @@ import re
 import socket
 import threading
 import time
+from collections import OrderedDict
+from datetime import datetime, timezone
 
-from cryptography.hazmat.backends import default_backend
 from cryptography.hazmat.primitives import serialization
 
 import fib
+from beacon import BeaconScheduler
+from cs import ContentStore
+from pit import PendingInterestTable
+from strategy import Forwarder
+from CommandQueue import CommandQueue
+from ConnectionPool import ConnectionPool
 from ECCManager import ECCManager
-from helper import build_packet, build_broadcast_packet, decode_command
-
-API_VERSION = 'v2'
+from framing import FrameBuffer, MAX_DATAGRAM_SIZE, decode_broadcast, encode_broadcast, frame
+from helper import (API_VERSION, BINARY_API_VERSION, build_packet, build_broadcast_packet, decode_binary_packet,
+                    decode_command, encode_binary_packet, is_binary_packet)
+from logs import get_device_logger
+from metrics import COUNT_BUCKETS, MetricsRegistry
 
 class NDNNode:
-    def __init__(self, node_name, port, broadcast_port, sensor_types, sensors):
+    def __init__(self, node_name, port, broadcast_port, sensor_types, sensors, engine=None):
         self.host = '0.0.0.0'
         self.port = port
         self.node_name = node_name
@@ -35,47 +61,120 @@ class NDNNode:
         self.log_file = f"device_logs/{self.node_name}.log"
         self.broadcast_port = broadcast_port
         self.fib = fib.ForwardingInfoBase(self.node_name)  # Forwarding Information Base
-        self.pit = {}  # Pending Interest Table
-        self.cs = {}
+        self.pit = PendingInterestTable()  # Pending Interest Table
+        self.cs = ContentStore()  # Content Store
         self.sensor_types = sensor_types
-        self.commands = []
-        logging.getLogger().handlers = []
+        self.commands = CommandQueue()  # Commands for the apparatus of the device
         home_id, device_id = tuple(node_name.split('/'))
-        self.logger = logging.getLogger(f"{self.node_name}_logger")
-        handler = logging.FileHandler(f"{home_id}/device_logs/{device_id}.log")
-        formatter = logging.Formatter("%(asctime)s.%(msecs)04d [%(levelname)s] %(message)s", datefmt="%H:%M:%S:%m")
-        handler.setFormatter(formatter)
-        self.logger.addHandler(handler)
-        self.logger.setLevel(logging.DEBUG)
+        # The logger is shared with the Device of the node and written by the log writer of the home
+        self.logger = get_device_logger(home_id, device_id)
 
         # Create list of data name as <node_name>/<sensor_name>
         if not node_name.endswith('/'):
             node_name += '/'
         self.data_names = [node_name + s for s in sensor_types]
-        self.logger.info(f"{self.node_name} is the source for: {self.data_names}")
+        self.logger.info("%s is the source for: %s", self.node_name, self.data_names)
 
         self.ecc_manager = ECCManager()
         self.public_key_pem = self.ecc_manager.get_public_key().public_bytes(
             encoding=serialization.Encoding.PEM,
             format=serialization.PublicFormat.SubjectPublicKeyInfo
         ).decode('utf-8')
-        self.shared_secrets = {}
+        self.peer_keys = {}  # PEM public key per trusted peer
+        self.sessions = {}  # Encryption session per trusted peer, derived on first use
+        self.api_version = API_VERSION
+        self.peer_versions = {}
+        self.connection_pool = ConnectionPool()
+        self.beacon = BeaconScheduler()
+        self._presence_packet = None  # (API version, JSON before and after the time stamp)
         self.threads = []
         self.running = False
+        self.engine = engine
+        # Without an engine sends block until connected, so the sends on multiple routes start concurrently
+        self.forwarder = Forwarder(self.send_interest, self.call_later, self.pit.lifetime,
+                                   parallel_sends=engine is None)
+        self.metrics = MetricsRegistry(self.node_name)
+        self._interest_started = {}  # data name -> time its PIT entry was created, for round trip times
+        # data name -> {neighbour: time the interest was sent to it}, in order of the last send, to measure routes
+        self._upstreams = OrderedDict()
+        self._upstream_lock = threading.Lock()
+        self._register_metrics()
+
+    def _register_metrics(self):
+        metrics = self.metrics
+        self._interests_received = metrics.counter('ndn_interests_received_total', 'Interests received')
+        self._interests_produced = metrics.counter('ndn_interests_produced_total',
+                                                   'Interests answered by this node as the producer')
+        self._interests_forwarded = metrics.counter('ndn_interests_forwarded_total', 'Interests forwarded upstream')
+        self._route_failures = metrics.counter('ndn_route_failures_total', 'Routes an interest could not be sent on')
+        self._nacks_sent = metrics.counter('ndn_nacks_sent_total', 'NACKs sent to requesters')
+        self._data_received = metrics.counter('ndn_data_received_total', 'Data packets received')
+        self._data_forwarded = metrics.counter('ndn_data_forwarded_total', 'Data packets forwarded to requesters')
+        self._data_stray = metrics.counter('ndn_data_stray_total', 'Data packets nobody was waiting for')
+        self._decrypt_errors = metrics.counter('ndn_decrypt_errors_total', 'Packets discarded as undecryptable')
+        self._packets_sent = metrics.counter('ndn_packets_sent_total', 'Packets sent to peers')
+        self._bytes_sent = metrics.counter('ndn_bytes_sent_total', 'Bytes of the packets sent to peers')
+        self._send_errors = metrics.counter('ndn_send_errors_total', 'Packets that could not be sent')
+        self._broadcasts_received = metrics.counter('ndn_broadcasts_received_total',
+                                                    'Discovery and routing broadcasts received')
+        self._dv_changes = metrics.counter('ndn_distance_vector_changes_total',
+                                           'FIB updates that changed the distance vector')
+        self._interest_rtt = metrics.histogram('ndn_interest_rtt_seconds',
+                                               'Time from sending an interest of this node to its data or NACK')
+        self._forwarded_rtt = metrics.histogram('ndn_forwarded_interest_rtt_seconds',
+                                                'Time from forwarding an interest to its data or NACK')
+        self._send_time = metrics.histogram('ndn_send_seconds', 'Time to encrypt, encode and send a packet')
+        self._fib_update_time = metrics.histogram('ndn_fib_update_seconds',
+                                                  'Time to recompute the FIB after a broadcast')
+        self._fanout = metrics.histogram('ndn_forward_fanout', 'Routes available per forwarded interest',
+                                         buckets=COUNT_BUCKETS)
+        # The tables count their own events, which are read when the metrics are collected
+        metrics.counter('ndn_cs_hits_total', 'Interests answered from the CS', lambda: self.cs.hits)
+        metrics.counter('ndn_cs_misses_total', 'CS lookups without fresh data', lambda: self.cs.misses)
+        metrics.counter('ndn_pit_aggregated_total', 'Interests aggregated into a pending entry',
+                        lambda: self.pit.aggregated)
+        metrics.counter('ndn_pit_satisfied_total', 'Pending entries satisfied by data', lambda: self.pit.satisfied)
+        metrics.counter('ndn_pit_expired_total', 'Pending entries that expired', lambda: self.pit.expired)
+        metrics.counter('ndn_pit_rejected_total', 'Pending entries NACKed because no route accepted them',
+                        lambda: self.pit.rejected)
+        metrics.counter('ndn_forward_hedges_total', 'Interests sent on another route after the hedge delay',
+                        lambda: self.forwarder.hedges)
+        metrics.counter('ndn_data_duplicates_total', 'Replies suppressed after another route satisfied the interest',
+                        lambda: self.forwarder.duplicates)
+        metrics.counter('ndn_nacks_held_total', 'NACKs held back while other routes could still return data',
+                        lambda: self.forwarder.nacks_held)
+        metrics.counter('ndn_fib_explorations_total', 'Route lookups that tried another route than the best one',
+                        lambda: self.fib.explorations)
+        metrics.gauge('ndn_cs_hit_ratio', lambda: self.cs.hits / max(1, self.cs.hits + self.cs.misses),
+                      'Fraction of CS lookups that found fresh data')
+        metrics.gauge('ndn_cs_entries', lambda: len(self.cs), 'Data names cached in the CS')
+        metrics.gauge('ndn_cs_bytes', lambda: self.cs.size_bytes, 'Bytes of data cached in the CS')
+        metrics.gauge('ndn_pit_entries', lambda: len(self.pit), 'Pending interests')
+        metrics.gauge('ndn_fib_peers', lambda: len(self.fib.peer_list), 'Neighbours in the FIB')
+        metrics.gauge('ndn_fib_route_cache_hit_ratio',
+                      lambda: self.fib.cache_hits / max(1, self.fib.cache_hits + self.fib.cache_misses),
+                      'Fraction of route lookups answered by the route cache')
 
     def start(self):
         self.running = True
+        if self.engine is not None:
+            self.engine.start_node(self)
+            return
         listener_thread = threading.Thread(target=self.listen_for_connections)
         broadcast_thread = threading.Thread(target=self.broadcast_presence)
         discovery_thread = threading.Thread(target=self.listen_for_peer_broadcasts)
-        cs_clear_thread = threading.Thread(target=self.clear_content_store)
-        self.threads = [listener_thread, broadcast_thread, discovery_thread, cs_clear_thread]
+        pool_thread = threading.Thread(target=self.maintain_connections)
+        pit_thread = threading.Thread(target=self.maintain_pending_interests)
+        self.threads = [listener_thread, broadcast_thread, discovery_thread, pool_thread, pit_thread]
         for t in self.threads:
             t.setDaemon(True)
             t.start()
 
     def start_untrusted(self):
         self.running = True
+        if self.engine is not None:
+            self.engine.start_node(self, services=('discovery',))
+            return
         discovery_thread = threading.Thread(target=self.listen_for_peer_broadcasts)
         self.threads = [discovery_thread]
         for t in self.threads:
@@ -84,8 +183,13 @@ class NDNNode:
 
     def stop(self):
         self.running = False
+        self.beacon.wake()
+        if self.engine is not None:
+            self.engine.stop_node(self)
         for t in self.threads:
             t.join()
+        self.forwarder.close()
+        self.close_connections()
         self.broadcast_offline()
 
     def listen_for_connections(self):
@@ -93,12 +197,12 @@ class NDNNode:
             s.bind((self.host, self.port))
             s.listen()
             s.settimeout(1.0)
-            self.logger.info(f"{self.node_name} is listening for connections on port {self.port}")
+            self.logger.info("%s is listening for connections on port %s", self.node_name, self.port)
             while self.running:
                 try:
                     s.getsockname()
                     conn, addr = s.accept()
-                    threading.Thread(target=self.handle_connection, args=(conn, addr)).start()
+                    threading.Thread(target=self.handle_connection, args=(conn, addr), daemon=True).start()
                 except socket.timeout:
                     pass
 
@@ -106,140 +210,207 @@ class NDNNode:
         with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
             s.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
             while self.running:
-                json_packet = build_broadcast_packet(packet_type='discovery',
-                                                     name=self.node_name,
-                                                     data={'port': self.port,
-                                                           'status': 'online',
-                                                           'pub_key': self.public_key_pem,
-                                                           'sensor_types': ','.join(self.sensor_types)},
-                                                     api_version=API_VERSION
-                                                     )
-                s.sendto(json.dumps(json_packet).encode('utf-8'), ('<broadcast>', self.broadcast_port))      
+                s.sendto(self.build_presence_packet(), ('<broadcast>', self.broadcast_port))
+                self.beacon.wait(self.beacon.next_delay(len(self.fib.peer_list)))
 
-    def broadcast_offline(self):
-        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
-            s.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+    def build_presence_packet(self):
+        # Only the time stamp changes between beacons, so the rest of the packet is serialized once
+        if self._presence_packet is None or self._presence_packet[0] != self.api_version:
             json_packet = build_broadcast_packet(packet_type='discovery',
                                                  name=self.node_name,
                                                  data={'port': self.port,
-                                                       'status': 'offline',
+                                                       'status': 'online',
                                                        'pub_key': self.public_key_pem,
                                                        'sensor_types': ','.join(self.sensor_types)},
-                                                 api_version=API_VERSION
+                                                 api_version=self.api_version
                                                  )
-            s.sendto(json.dumps(json_packet).encode('utf-8'), ('<broadcast>', self.broadcast_port))
-        self.logger.info(f"{self.node_name} went offline.")
+            prefix, suffix = json.dumps(json_packet).encode('utf-8').split(json_packet['timestamp'].encode('utf-8'))
+            self._presence_packet = (self.api_version, prefix, suffix)
+        _, prefix, suffix = self._presence_packet
+        return b''.join((prefix, datetime.now(timezone.utc).isoformat().encode('utf-8'), suffix))
+
+    def broadcast(self, packet):
+        """
+        Broadcast a packet to the broadcast port of the peers.
+        """
+        if self.engine is not None:
+            self.engine.broadcast(self, packet)
+            return
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            s.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+            s.sendto(packet, ('<broadcast>', self.broadcast_port))
+
+    def broadcast_offline(self):
+        json_packet = build_broadcast_packet(packet_type='discovery',
+                                             name=self.node_name,
+                                             data={'port': self.port,
+                                                   'status': 'offline',
+                                                   'pub_key': self.public_key_pem,
+                                                   'sensor_types': ','.join(self.sensor_types)},
+                                             api_version=self.api_version
+                                             )
+        self.broadcast(json.dumps(json_packet).encode('utf-8'))
+        self.logger.info("%s went offline.", self.node_name)
 
     def broadcast_distance_vector(self):
         """
         Broadcast when distance vector changes
 
         """
-        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
-            s.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
-            json_packet = build_broadcast_packet(packet_type='routing',
-                                                 name=self.node_name,
-                                                 data={'port': self.port,
-                                                       'vector': self.fib.get_distance_vector()},
-                                                 api_version=API_VERSION
-                                                 )
-            self.logger.debug(f"{self.node_name} broadcasting distance vector on port {self.broadcast_port}")
-            s.sendto(json.dumps(json_packet).encode('utf-8'), ('<broadcast>', self.broadcast_port))
+        json_packet = build_broadcast_packet(packet_type='routing',
+                                             name=self.node_name,
+                                             data={'port': self.port,
+                                                   'vector': self.fib.get_distance_vector()},
+                                             api_version=self.api_version
+                                             )
+        try:
+            # Vectors of large networks are compressed to fit into a datagram
+            packet = encode_broadcast(json.dumps(json_packet).encode('utf-8'))
+        except ValueError as err:
+            self.logger.error("%s cannot broadcast its distance vector of %d nodes: %s",
+                              self.node_name, len(json_packet['data']['vector']), err)
+            return
+        self.logger.debug("%s broadcasting distance vector on port %s", self.node_name, self.broadcast_port)
+        self.broadcast(packet)
 
     def listen_for_peer_broadcasts(self):
         with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
             s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
             s.bind((self.host, self.broadcast_port))
             s.settimeout(1.0)
-            self.logger.info(f"{self.node_name} listening for broadcasts on {self.broadcast_port}")
+            self.logger.info("%s listening for broadcasts on %s", self.node_name, self.broadcast_port)
+            buffer = memoryview(bytearray(MAX_DATAGRAM_SIZE))
             while self.running:
                 try:
-                    data, addr = s.recvfrom(1024)
-                    message = json.loads(data.decode())
-                    packet_type = message['type']
-                    peer_port = message['data']['port']
-                    node_name = message['name']
-                    if peer_port != self.port:
-                        if packet_type == 'discovery':
-                            status = message['data']['status']
-                            if status == "online":
-                                if node_name not in self.fib:
-                                    self.logger.debug(f"{self.node_name} received broadcast: discovered peer {node_name}")
-                                    public_key_pem = message['data']['pub_key']
-                                    peer_addr = (addr[0], peer_port)
-                                    self.logger.debug(f"{self.node_name} adding peer {node_name} on {peer_addr} to FIB")
-                                    self.fib.add_entry(node_name, peer_addr)
-                                    self.logger.debug(
-                                        f"{self.node_name} updated distance vector: {self.fib.get_distance_vector()}")
-                                    # Send distance vector updates to neighbours
-                                    self.broadcast_distance_vector()
-
-                                    peer_public_key = serialization.load_pem_public_key(
-                                        public_key_pem.encode('utf-8'),
-                                        backend=default_backend()
-                                    )
-                                    shared_secret = self.ecc_manager.generate_shared_secret(peer_public_key)
-                                    self.shared_secrets[node_name] = shared_secret
-
-                            elif status == "offline":
-                                self.logger.debug(f"{self.node_name} received broadcast: peer {node_name} went offline")
-                                if node_name in self.fib:
-                                    self.logger.debug(f"{self.node_name} removing peer {node_name} from FIB")
-                                    self.fib.remove_entry(node_name)
-                                    self.logger.debug(
-                                        f"{self.node_name} updated distance vector: {self.fib.get_distance_vector()}")
-                                    # Send distance vector updates to neighbours
-                                    self.broadcast_distance_vector()
-                                    del self.shared_secrets[node_name]
-
-                        elif packet_type == 'routing':
-                            self.logger.debug(f"{self.node_name} received broadcast: peer {node_name} updated distance vector")
-                            if node_name in self.fib:
-                                peer_vector = message["data"]["vector"]
-                                self.logger.debug(f"{self.node_name} updating peer {node_name} in FIB")
-                                dv_changed = self.fib.update_distance_vector(node_name, peer_vector)
-                                self.logger.debug(f"{self.node_name} updated distance vector: {self.fib.get_distance_vector()}")
-                                if dv_changed:
-                                    # Send distance vector updates to neighbours
-                                    self.broadcast_distance_vector()
+                    nbytes, addr = s.recvfrom_into(buffer)
                 except socket.timeout:
-                    pass
+                    continue
+                # A datagram that cannot be handled must not stop the discovery of peers
+                try:
+                    self.handle_broadcast(bytes(buffer[:nbytes]), addr)
+                except Exception as err:
+                    self.logger.error("Error in handle_broadcast() of datagram from %s %s: %s",
+                                      addr, type(err).__name__, err)
+
+    def handle_broadcast(self, data, addr):
+        self._broadcasts_received.inc()
+        message = json.loads(decode_broadcast(data))
+        packet_type = message['type']
+        peer_port = message['data']['port']
+        node_name = message['name']
+        if peer_port != self.port:
+            if packet_type == 'discovery':
+                status = message['data']['status']
+                if status == "online":
+                    if node_name not in self.fib:
+                        self.logger.debug("%s received broadcast: discovered peer %s", self.node_name, node_name)
+                        public_key_pem = message['data']['pub_key']
+                        peer_addr = (addr[0], peer_port)
+                        # Key agreement is deferred to the first packet exchanged with the peer
+                        self.peer_keys[node_name] = public_key_pem
+                        self.logger.debug("%s adding peer %s on %s to FIB", self.node_name, node_name, peer_addr)
+                        start = time.perf_counter()
+                        self.fib.add_entry(node_name, peer_addr)
+                        self._fib_update_time.observe(time.perf_counter() - start)
+                        self._dv_changes.inc()
+                        self.peer_versions[node_name] = message['version']
+                        self.beacon.reset()
+                        if self.logger.isEnabledFor(logging.DEBUG):
+                            self.logger.debug("%s updated distance vector: %s", self.node_name,
+                                              self.fib.get_distance_vector())
+                        # Send distance vector updates to neighbours
+                        self.broadcast_distance_vector()
+
+                elif status == "offline":
+                    self.logger.debug("%s received broadcast: peer %s went offline", self.node_name, node_name)
+                    if node_name in self.fib:
+                        self.logger.debug("%s removing peer %s from FIB", self.node_name, node_name)
+                        start = time.perf_counter()
+                        self.fib.remove_entry(node_name)
+                        self._fib_update_time.observe(time.perf_counter() - start)
+                        self._dv_changes.inc()
+                        if self.logger.isEnabledFor(logging.DEBUG):
+                            self.logger.debug("%s updated distance vector: %s", self.node_name,
+                                              self.fib.get_distance_vector())
+                        # Send distance vector updates to neighbours
+                        self.broadcast_distance_vector()
+                        del self.peer_keys[node_name]
+                        self.sessions.pop(node_name, None)
+                        self.peer_versions.pop(node_name, None)
+                        self.close_connections(node_name)
+                        self.beacon.reset()
+
+            elif packet_type == 'routing':
+                self.logger.debug("%s received broadcast: peer %s updated distance vector", self.node_name, node_name)
+                if node_name in self.fib:
+                    peer_vector = message["data"]["vector"]
+                    self.logger.debug("%s updating peer %s in FIB", self.node_name, node_name)
+                    start = time.perf_counter()
+                    dv_changed = self.fib.update_distance_vector(node_name, peer_vector)
+                    self._fib_update_time.observe(time.perf_counter() - start)
+                    if self.logger.isEnabledFor(logging.DEBUG):
+                        self.logger.debug("%s updated distance vector: %s", self.node_name,
+                                          self.fib.get_distance_vector())
+                    # Unchanged vectors are not rebroadcast, so routing goes quiet once it converged
+                    if dv_changed:
+                        self._dv_changes.inc()
+                        # Send distance vector updates to neighbours
+                        self.broadcast_distance_vector()
 
     def handle_connection(self, conn, addr):
+        # Connections are kept open by peers, so read frames until the peer closes it
         with conn:
+            frames = FrameBuffer()
             try:
-                data = conn.recv(1024)
-                if data:
-                    packet = json.loads(data.decode())
-                    sender = packet['sender']
-                    if sender in self.shared_secrets:
-                        try:
-                            # Decrypt data
-                            encrypted_data = base64.b64decode(packet['data'])
-                            key = self.shared_secrets[sender]
-                            decrypted_data = self.ecc_manager.decrypt_data(key, encrypted_data)
-                            packet['data'] = decrypted_data.decode('utf-8')
-                        except Exception as e:
-                            self.logger.error(f"Error decrypting data: {e}")
-
-                        if packet['type'] == 'interest':
-                            self.logger.debug(f"Received interest packet from {packet['sender']}")
-                            self.handle_interest(packet, packet['sender'], addr)
-                        elif packet['type'] == 'data':
-                            self.logger.debug(f"Received data packet from {packet['sender']}")
-                            self.handle_data(packet)
-                        else:
-                            self.logger.warning("Unknown packet type from {sender}. Discarding packet")
-                    else:
-                        self.logger.warning("Received packet with unknown encryption.")
+                while nbytes := conn.recv_into(frames.get_buffer()):
+                    for packet in frames.buffer_updated(nbytes):
+                        self.handle_packet(packet, addr)
+                for packet in frames.eof():
+                    self.handle_packet(packet, addr)
             except ConnectionResetError:
                 pass
+            except ValueError as err:
+                self.logger.error("Closing connection from %s: %s", addr, err)
+
+    def handle_packet(self, data, addr):
+        if is_binary_packet(data):
+            packet = decode_binary_packet(data)
+        else:
+            packet = json.loads(data.decode())
+        sender = packet['sender']
+        if sender in self.peer_keys:
+            try:
+                session = self.get_session(sender)
+                # Binary packets are sealed by the session, JSON packets carry AES-CFB data Base64 encoded
+                if isinstance(packet['data'], str):
+                    decrypted_data = self.ecc_manager.decrypt_data(session.key, base64.b64decode(packet['data']))
+                else:
+                    decrypted_data = session.decrypt(packet['data'])
+                packet['data'] = decrypted_data.decode('utf-8')
+            except Exception as e:
+                self._decrypt_errors.inc()
+                self.logger.error("Error decrypting data from %s: %s %s. Discarding packet",
+                                  sender, type(e).__name__, e)
+                return
+
+            if packet['type'] == 'interest':
+                self.logger.debug("Received interest packet from %s", packet['sender'])
+                self.handle_interest(packet, packet['sender'], addr)
+            elif packet['type'] == 'data':
+                self.logger.debug("Received data packet from %s", packet['sender'])
+                self.handle_data(packet)
+            else:
+                self.logger.warning("Unknown packet type from %s. Discarding packet", sender)
+        else:
+            self.logger.warning("Received packet with unknown encryption.")
 
     def handle_interest(self, interest_packet, requester, addr):
         name = interest_packet['name']
+        self._interests_received.inc()
 
         # Check if data name prefix is this node's name
         if name[:name.rindex('/')] == self.node_name:
+            self._interests_produced.inc()
             if name in self.data_names:
                 # Generate data if this is the source
                 sensor = name[name.rindex('/') + 1:]
@@ -263,8 +434,7 @@ class NDNNode:
                 self.send_packet(requester, json_packet)
 
         # Else check Content Store
-        elif name in self.cs:
-            data = self.cs.get(name)
+        elif (data := self.cs.get(name)) is not None:
             json_packet = build_packet('data', self.node_name, requester, name, data)
             self.send_packet(requester, json_packet)
 
@@ -274,99 +444,264 @@ class NDNNode:
             addr_to_try = self.fib.get_routes(name)
 
             if addr_to_try:
-                # Add interest to PIT
-                if name not in self.pit:
-                    self.pit[name] = set([(requester, addr)])
+                # Add interest to PIT, and only forward it if no identical interest is pending
+                if self.pit.add(name, requester, addr):
+                    self.logger.debug("%s added interest in %s to PIT", self.node_name, name)
+                    self._interest_started[name] = time.perf_counter()
+                    self._fanout.observe(len(addr_to_try))
+                    self.forward_interest(name, requester, addr, addr_to_try)
                 else:
-                    self.pit[name].add((requester, addr))
+                    self.logger.debug("%s aggregated interest in %s from %s in PIT", self.node_name, name, requester)
 
-                self.logger.debug(f"{self.node_name} added interest in {name} to PIT")
+            else:
+                json_packet = build_packet('data', self.node_name, requester, name,
+                                           f'No data {name} available')
+                self.send_packet(requester, json_packet, addr)
 
-                success = False
-                for destination, dest_addr in addr_to_try:
-                    json_packet = build_packet('interest', self.node_name, destination, name, '')
-                    success = self.send_packet(destination, json_packet, dest_addr)
+    def forward_interest(self, name, requester, addr, addr_to_try):
+        """
+        Forward an interest along the given routes with the forwarding strategy of its name, but never back
+        to the requester. If no route accepts it, a NACK is sent to all requesters waiting for the data.
+        """
+        def on_exhausted():
+            self._interest_started.pop(name, None)
+            self.send_nack(name, self.pit.reject(name) or {(requester, addr)})
 
-                    if success:
-                        break
+        routes = [route for route in addr_to_try if route[0] != requester]
+        self.forwarder.forward(name, routes, on_exhausted)
 
-                if not success:
-                    json_packet = build_packet('data', self.node_name, requester, name,
-                                               f'No data {name} available')
-                    self.send_packet(requester, json_packet, addr)
+    def send_interest(self, name, destination, dest_addr, on_failure):
+        """
+        Send an interest forwarded by the strategy to one of its routes. Returns whether it was sent.
+        """
+        def on_send_failure():
+            # With an engine the send completes later, and the strategy continues with the next route
+            self._route_failures.inc()
+            self._upstream_failed(name, destination)
+            on_failure()
+
+        json_packet = build_packet('interest', self.node_name, destination, name, '')
+        started = time.perf_counter()
+        if self.send_packet(destination, json_packet, dest_addr, on_failure=on_send_failure):
+            self._interests_forwarded.inc()
+            self._upstream_sent(name, destination, started)
+            return True
+        self._route_failures.inc()
+        self.fib.record_failure(destination)
+        return False
+
+    def set_strategy(self, prefix, strategy):
+        """
+        Set the forwarding strategy of the data names under a prefix, '' for all data names.
+        """
+        self.forwarder.strategies.set(prefix, strategy)
 
-            else:
+    def call_later(self, delay, callback):
+        """
+        Call callback after delay seconds, on the engine if the node has one and on a timer thread otherwise.
+        """
+        if self.engine is not None:
+            self.engine.call_later(delay, callback)
+        else:
+            timer = threading.Timer(delay, callback)
+            timer.daemon = True
+            timer.start()
+
+    def send_nack(self, name, requesters):
+        for requester, addr in requesters:
+            if requester != self.node_name:
                 json_packet = build_packet('data', self.node_name, requester, name,
                                            f'No data {name} available')
                 self.send_packet(requester, json_packet, addr)
+                self._nacks_sent.inc()
 
     def create_send_interest_packet(self, data_name, destination):
         # Add interest to PIT
-        if data_name not in self.pit:
-            self.pit[data_name] = set([(self.node_name, None)])
-        else:
-            self.pit[data_name].add((self.node_name, None))
+        if self.pit.add(data_name, self.node_name, None):
+            self._interest_started[data_name] = time.perf_counter()
 
         json_packet = build_packet('interest', self.node_name, destination, data_name, '')
         # send interest to node according to fib
-        self.send_packet(destination, json_packet)
+        started = time.perf_counter()
+        on_failure = lambda: self._upstream_failed(data_name, destination)
+        if self.send_packet(destination, json_packet, on_failure=on_failure):
+            self._upstream_sent(data_name, destination, started)
+        else:
+            self.fib.record_failure(destination)
+
+    def _upstream_sent(self, name, neighbour, started):
+        # The reply of the neighbour, or its absence, is recorded in the FIB
+        with self._upstream_lock:
+            self._upstreams.setdefault(name, {})[neighbour] = started
+            self._upstreams.move_to_end(name)
+
+    def _upstream_replied(self, name, neighbour):
+        with self._upstream_lock:
+            sent = self._upstreams.get(name)
+            if sent is None:
+                return
+            started = sent.pop(neighbour, None)
+            if not sent:
+                del self._upstreams[name]
+        if started is not None:
+            self.fib.record_rtt(neighbour, name, time.perf_counter() - started)
+
+    def _upstream_failed(self, name, neighbour):
+        with self._upstream_lock:
+            sent = self._upstreams.get(name)
+            if sent is not None and sent.pop(neighbour, None) is not None and not sent:
+                del self._upstreams[name]
+        self.fib.record_failure(neighbour)
+
+    def _expire_upstreams(self):
+        """
+        Record the neighbours that did not reply to an interest within its lifetime as failed in the FIB.
+        """
+        deadline = time.perf_counter() - self.pit.lifetime
+        failed = []
+        with self._upstream_lock:
+            while self._upstreams:
+                name, sent = next(iter(self._upstreams.items()))
+                if max(sent.values()) > deadline:
+                    break
+                del self._upstreams[name]
+                failed.extend(sent)
+        for neighbour in failed:
+            self.fib.record_failure(neighbour)
 
     def handle_data(self, data_packet):
         name = data_packet['name']
         destination = data_packet['destination']
         data = str(data_packet['data'])
 
-        if name in self.pit or destination == self.node_name:
+        self._data_received.inc()
+        # Every reply measures the route it came from, also the ones the strategy suppresses
+        self._upstream_replied(name, data_packet['sender'])
+        # The forwarding strategy decides which reply of the routes it forwarded an interest on wins
+        nack = data == f'No data {name} available'
+        if not self.forwarder.on_reply(name, nack, name in self.pit):
+            self.logger.debug("%s suppressed %s %s from %s", self.node_name, 'NACK' if nack else 'duplicate data',
+                              name, data_packet['sender'])
+            return
+
+        # Pending interests are satisfied by the data => remove from PIT
+        requesters = self.pit.pop(name)
+        started = self._interest_started.pop(name, None)
+        if started is not None and requesters is not None:
+            # Interests of this node and interests forwarded for others wait for the same data
+            rtt = time.perf_counter() - started
+            if (self.node_name, None) in requesters:
+                self._interest_rtt.observe(rtt)
+            if len(requesters) > ((self.node_name, None) in requesters):
+                self._forwarded_rtt.observe(rtt)
+        if requesters is not None or destination == self.node_name:
             # If this node is interested in the data or the intended recipient
             # then process the data
-            if destination == self.node_name or self.node_name in self.pit[name]:
+            if destination == self.node_name or (self.node_name, None) in requesters:
                 if re.compile(r'command').search(data):
                     sensor_type = data_packet['name'].split('/').pop()
                     if sensor_type in self.sensor_types:
                         actuator, command = decode_command(name, data)
-                        self.commands.append((actuator, command))
+                        self.commands.put(actuator, command)
                 elif re.compile(r'alert').search(data):
                     if self.node_name.__contains__('phone'):
-                        self.logger.info(f"Alert {name.split('/')[-1]} is set off.")
+                        self.logger.info("Alert %s is set off.", name.split('/')[-1])
                 else:
-                    self.logger.info(f"Received data {name}: {data}")
+                    self.logger.info("Received data %s: %s", name, data)
+
+            # If there is pending interest, forward the data. Every hop is the sender of the packet it forwards,
+            # so the next hop decrypts it with the session of this node
+            for requester, addr in requesters or ():
+                if requester != self.node_name:
+                    self.logger.debug("Transmitting data packet from %s to %s", data_packet['sender'], requester)
+                    self.send_packet(requester, dict(data_packet, sender=self.node_name), addr)
+                    self._data_forwarded.inc()
+
+            # Store in content store, but not NACKs, which would answer later interests until they go stale
+            if not nack:
+                self.cs.put(name, data)
+        else:
+            self._data_stray.inc()
+            self.logger.info("Received stray data packet %s", data_packet)
+
+    def send_packet(self, peer_node_name, json_packet, addr=None, on_failure=None):
+        """
+        Encrypt and send a packet to a peer. Returns whether the packet was sent.
+        With an engine the packet is only queued here; if sending it fails later,
+        on_failure is called on the event loop instead.
+        """
+        success = False
+        start = time.perf_counter()
+        try:
+            # Known peers are reached at their listening address rather than the source address of their packets
+            if addr == None or peer_node_name in self.fib:
+                addr = self.fib.peer_list[peer_node_name]
+
+            packet = self.encode_packet(peer_node_name, json_packet)
+            if self.engine is not None:
+                self.engine.send(self, peer_node_name, addr, packet, json_packet, on_failure)
+            else:
+                self.connection_pool.send(peer_node_name, addr, packet)
+                self.logger.debug("Sent %s '%s' to %s",
+                                  json_packet['type'], json_packet['name'], json_packet['destination'])
+            self._packets_sent.inc()
+            self._bytes_sent.add(len(packet))
+            success = True
+        except Exception as err:
+            self._send_errors.inc()
+            self.logger.error("Error in send_packet() to %s %s: %s", peer_node_name, type(err).__name__, err)
+        self._send_time.observe(time.perf_counter() - start)
+        return success
+
+    def encode_packet(self, peer_node_name, json_packet):
+        session = self.get_session(peer_node_name)
+        data = json_packet['data'].encode('utf-8')
+        if self.api_version == BINARY_API_VERSION and self.peer_versions.get(peer_node_name) == BINARY_API_VERSION:
+            return frame(encode_binary_packet(json_packet, session.encrypt(data)))
 
-            # If there is pending interest, forward the data and remove entry from PIT
-            if name in self.pit:
-                for requester, addr in self.pit[name]:
-                    if requester != self.node_name:
-                        self.logger.debug(f"Transmitting data packet from {data_packet['sender']} to {requester}")
-                        self.send_packet(requester, data_packet, addr)
+        encrypted_data = self.ecc_manager.encrypt_data(session.key, data)
+        # Convert encrypted byte string to Base64 encoded string, leaving the packet intact for other peers
+        json_packet = dict(json_packet, data=base64.b64encode(encrypted_data).decode('utf-8'))
+        return frame(json.dumps(json_packet).encode('utf-8'))
 
-                # Pending interests satisfied => remove from PIT
-                del self.pit[name]
+    def get_session(self, peer_node_name):
+        """
+        Get the encryption session of a trusted peer, deriving it on first use.
+        Raises KeyError if the peer is not trusted.
+        """
+        session = self.sessions.get(peer_node_name)
+        if session is None:
+            session = self.ecc_manager.get_session(self.peer_keys[peer_node_name])
+            self.sessions[peer_node_name] = session
+        return session
 
-            # Store in content store
-            self.cs[name] = data
+    def close_connections(self, peer_node_name=None):
+        """
+        Close the persistent connections to a peer, or to all peers if no peer is given.
+        """
+        if self.engine is not None:
+            self.engine.close_connections(self, peer_node_name)
         else:
-            self.logger.info(f"Received stray data packet {data_packet}")
+            self.connection_pool.close(peer_node_name)
 
-    def send_packet(self, peer_node_name, json_packet, addr=None):
-        success = False
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-            try:
-                if addr == None:
-                    addr = self.fib.peer_list[peer_node_name]
-
-                s.connect(addr)
-                key = self.shared_secrets[peer_node_name]
-                encrypted_data = self.ecc_manager.encrypt_data(key, json_packet['data'].encode('utf-8'))
-                # Convert encrypted byte string to Base64 encoded string
-                json_packet['data'] = base64.b64encode(encrypted_data).decode('utf-8')
-                packet = json.dumps(json_packet).encode('utf-8')
-                s.sendall(packet)
-                self.logger.debug(f"Sent {json_packet['type']} '{json_packet['name']}' to {json_packet['destination']}")
-                success = True
-            except Exception as err:
-                self.logger.error(f"Error in send_packet() to {peer_node_name} {type(err).__name__}: {err}")
-        return success
+    def maintain_connections(self):
+        while self.running:
+            time.sleep(1)
+            self.connection_pool.evict_idle()
 
-    def clear_content_store(self):
+    def maintain_pending_interests(self):
         while self.running:
-            time.sleep(10) 
-            self.cs.clear()
+            time.sleep(self.pit.tick)
+            self.expire_pending_interests()
+
+    def expire_pending_interests(self):
+        """
+        Remove expired interests from the PIT and send a NACK to the requesters waiting for them.
+        """
+        self._expire_upstreams()
+        for name, requesters in self.pit.expire():
+            self._interest_started.pop(name, None)
+            self.logger.debug("%s interest in %s expired in PIT", self.node_name, name)
+            if (self.node_name, None) in requesters:
+                self.logger.info("No data %s received before the interest expired", name)
+            self.send_nack(name, requesters)
@@ -2,38 +2,103 @@
 @author: C. Jonathan Cicai
 Room Monitor:
     - When run in the terminal, will display rooms stats and apparatus in realtime
+    - Attaches to the memory-mapped StatsStore of the home and reads consistent snapshots of the latest stats of
+      all rooms, without opening or re-reading any file on refresh
+    - Watches any number of rooms as one table that is redrawn in place with ANSI cursor moves
+
+Example Usage: python3 RoomMonitor.py --home_id=1 --rooms=0,2-4 --interval=0.5
 """
 
+import argparse
+import sys
 import time
-import os
+
+from HomeSimulation import APPARATUS, COLUMNS
+from StatsStore import StatsStore
+
+CURSOR_HOME = '\x1b[H'
+CLEAR_SCREEN = '\x1b[2J'
+CLEAR_LINE = '\x1b[K'
+CLEAR_BELOW = '\x1b[J'
+HEADER = f"{'room':<10} {'temp °C':>8} {'humidity %':>10} {'CO ppm':>8} {'CO2 ppm':>8} {'motion':>6} " \
+         f"{'light lux':>9}  " + " ".join(f"{apparatus_type:<10}" for apparatus_type in APPARATUS)
+
+
+def parse_rooms(rooms_input, n_rooms):
+    """
+    Parse a room selection such as '0,2-4' or 'all' into a list of room indices.
+    """
+    if rooms_input.strip().lower() == 'all':
+        return list(range(n_rooms))
+    rooms = []
+    for part in rooms_input.split(','):
+        first, _, last = part.strip().partition('-')
+        rooms.extend(range(int(first), int(last or first) + 1))
+    return rooms
+
 
 class RoomMonitor:
-    def __init__(self):
-        self.existed = False
+    def __init__(self, interval=1.0):
+        self.interval = interval
 
-    def monitor_input(self):
-        home_id_input = input("Enter a house id: ").strip()
-        room_id_input = input("Enter room ID to monitor (or type 'quit' to exit): ").strip()
+    def monitor_input(self, home_id_input=None, rooms_input=None):
+        if home_id_input is None:
+            home_id_input = input("Enter a house id: ").strip()
+        if rooms_input is None:
+            rooms_input = input("Enter room IDs to monitor, e.g. 0,2-4 or 'all' (or type 'quit' to exit): ").strip()
+        if rooms_input == 'quit':
+            return
         try:
-            home_id = int(home_id_input)
-            room_id = int(room_id_input)
-            self.display_stats(home_id, room_id)
+            self.display_stats(int(home_id_input), rooms_input)
         except ValueError:
-            print("Invalid input. Please enter a valid room ID or 'quit'.")
+            print("Invalid input. Please enter valid room IDs or 'quit'.")
         except FileNotFoundError:
-            print("The file doesn't exist" if not self.existed else "The simulation ended")
+            print("The file doesn't exist")
+        except KeyboardInterrupt:
+            pass
 
-    def display_stats(self, home_id, room_id):
-        stats_file = f"home_{home_id}/room_stats/room_{room_id}_stats.txt"
-        while True:
-            os.system('clear' if os.name == 'posix' else 'cls') 
-            with open(stats_file, "r") as file:
-                content = file.read().strip()
-                print(content)
-                self.existed = True
-            time.sleep(1)
+    def display_stats(self, home_id, rooms_input):
+        with StatsStore.open(f"home_{home_id}/room_stats/stats.bin") as store:
+            rooms = parse_rooms(rooms_input, store.n_rooms)
+            missing = [room for room in rooms if not 0 <= room < store.n_rooms]
+            if missing:
+                print(f"Home {home_id} has no room {', '.join(map(str, missing))}")
+                return
+            sys.stdout.write(CLEAR_SCREEN)
+            while not store.closed:
+                sys.stdout.write(self.render(home_id, rooms, store.latest_rows()))
+                sys.stdout.flush()
+                time.sleep(self.interval)
+            print("The simulation ended")
+
+    @staticmethod
+    def render(home_id, rooms, rows):
+        """
+        Render the table of the latest stats of the watched rooms as one frame that overwrites the previous one.
+        """
+        lines = [f"Home {home_id}", HEADER]
+        if rows is not None:
+            lines.append(f"updated {time.strftime('%H:%M:%S', time.localtime(rows['time'].max()))}")
+            stats, apparatus = rows['stats'][rooms], rows['apparatus'][rooms].tolist()
+            for room, room_stats, room_apparatus in zip(rooms, stats.tolist(), apparatus):
+                lines.append(f"{f'room_{room}':<10} {room_stats[COLUMNS['temp']]:>8.2f} "
+                             f"{room_stats[COLUMNS['humidity']] * 100:>10.2f} {room_stats[COLUMNS['CO']]:>8.2f} "
+                             f"{room_stats[COLUMNS['CO2']]:>8.2f} "
+                             f"{'yes' if room_stats[COLUMNS['motion']] else 'no':>6} "
+                             f"{room_stats[COLUMNS['light']]:>9.0f}  "
+                             + " ".join(f"{'on' if room_apparatus >> i & 1 else 'off':<10}"
+                                        for i in range(len(APPARATUS))))
+        else:
+            lines.append("waiting for the first step")
+        return CURSOR_HOME + "".join(line + CLEAR_LINE + "\n" for line in lines) + CLEAR_BELOW
 
 
 if __name__ == "__main__":
-    monitor = RoomMonitor()
-    monitor.monitor_input()
+    parser = argparse.ArgumentParser(description='Monitor the stats and apparatus of the rooms of a home.')
+    parser.add_argument('--home_id', help='Home ID, asked for if not given')
+    parser.add_argument('--rooms', help="Rooms to watch, e.g. 0,2-4 or 'all', asked for if not given")
+    parser.add_argument('--interval', type=float, default=1.0, help='Seconds between refreshes')
+    args = parser.parse_args()
+
+    monitor = RoomMonitor(args.interval)
+    monitor.monitor_input(args.home_id, args.rooms)
@@ -0,0 +1,80 @@
+"""
+RuleEngine Class
+- Evaluates the triggers of a Device, given in the format {sensor_type: [(comparer, value, apparatus, effect)]},
+  without building and evaluating an expression for every trigger.
+- The triggers are compiled once: the thresholds of each sensor type and comparer are sorted, so the triggers
+  fired by a reading are found with a bisect over the thresholds instead of testing every trigger.
+- Fired triggers are returned in the order they were given, so later triggers still win over earlier ones.
+- Triggers can be loaded from a JSON file in the same format.
+
+Example Usage:
+    rules = RuleEngine({"temp": [("<", 19, "heater", "on"), (">", 26, "heater", "off")]})
+    rules.fired("temp", 18.5)  # [("heater", "on")]
+"""
+
+import json
+import operator
+from bisect import bisect_left, bisect_right
+
+OPERATORS = {
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    '==': operator.eq,
+    '!=': operator.ne,
+}
+
+
+class RuleEngine:
+    def __init__(self, triggers):
+        self.triggers = triggers
+        self._index = {}  # sensor type -> comparer -> (sorted thresholds, trigger positions, actions)
+        for sensor_type, sensor_triggers in triggers.items():
+            by_comparer = {}
+            for position, (comparer, value, apparatus, effect) in enumerate(sensor_triggers):
+                if comparer not in OPERATORS:
+                    raise ValueError(f"Unknown comparer '{comparer}' in trigger for {sensor_type}")
+                by_comparer.setdefault(comparer, []).append((value, position, (apparatus, effect)))
+            self._index[sensor_type] = {comparer: tuple(map(list, zip(*sorted(entries))))
+                                        for comparer, entries in by_comparer.items()}
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, 'r') as file:
+            return cls(json.load(file))
+
+    def __len__(self):
+        return sum(len(sensor_triggers) for sensor_triggers in self.triggers.values())
+
+    def fired(self, sensor_type, reading):
+        """
+        Get the (apparatus, effect) of the triggers of a sensor type fired by a reading, in trigger order.
+        """
+        fired = []
+        for comparer, (thresholds, positions, actions) in self._index.get(sensor_type, {}).items():
+            # Triggers fire if 'reading comparer threshold' holds, which is a contiguous range of sorted thresholds
+            if comparer == '<':
+                matches = range(bisect_right(thresholds, reading), len(thresholds))
+            elif comparer == '<=':
+                matches = range(bisect_left(thresholds, reading), len(thresholds))
+            elif comparer == '>':
+                matches = range(bisect_left(thresholds, reading))
+            elif comparer == '>=':
+                matches = range(bisect_right(thresholds, reading))
+            elif comparer == '==':
+                matches = range(bisect_left(thresholds, reading), bisect_right(thresholds, reading))
+            else:
+                equal = range(bisect_left(thresholds, reading), bisect_right(thresholds, reading))
+                matches = [i for i in range(len(thresholds)) if i not in equal]
+            fired.extend((positions[i], actions[i]) for i in matches)
+        if len(fired) > 1:
+            fired.sort()
+        return [action for _, action in fired]
+
+    def matches(self, sensor_type, reading):
+        """
+        Get the (apparatus, effect) of the fired triggers by testing every trigger, for checking fired().
+        """
+        return [(apparatus, effect) for comparer, value, apparatus, effect in self.triggers.get(sensor_type, ())
+                if OPERATORS[comparer](reading, value)]
@@ -3,8 +3,22 @@
 
 SmartHome:
     - Sets up a smart home, with the given home_id and n_rooms
+    - The stats of all rooms are simulated together by one HomeSimulation in a single thread
+    - The stats of every step are appended to the StatsStore of the home in room_stats/stats.bin
+
+    - With --asyncio, the network services of all devices share one asyncio event loop
+    - With --triggers, the devices load their triggers from a JSON file instead of using the defaults
+    - With --headless, the rooms are split across --workers processes by a HomeRunner, which runs a scripted
+      workload instead of the interactive menu and prints the aggregated health of the workers
+    - With --metrics_port, the metrics of all nodes are served on http://127.0.0.1:<port>/metrics (one port per
+      worker in headless mode, counting up), and with --metrics_interval they are written to
+      room_stats/metrics.json (metrics_<worker>.json in headless mode) every interval
+    - --log_level sets the level of the device logs, which every process writes from one thread per home
+    - --strategy sets the forwarding strategy of the devices for all data names or for a name prefix, e.g.
+      --strategy hedged:2:0.05 --strategy home_1/room_3_device=multicast:2
 
 Example Usage: python3 SmartHome.py --home_id=1 --rooms=2
+               python3 SmartHome.py --home_id=1 --rooms=1000 --headless --workers=8 --asyncio --duration=300
 """
 import threading
 import random
@@ -12,17 +26,28 @@ import time
 import os
 import shutil
 import argparse
+from AsyncEngine import AsyncEngine
+from HomeRunner import HomeRunner
+from HomeSimulation import HomeSimulation
+from logs import set_level
+from metrics import MetricsExporter
 from Room import Room
+from StatsStore import StatsStore
+from strategy import parse_strategy_choice
 
 class SmartHome:
-    def __init__(self, home_id, n_rooms):
+    def __init__(self, home_id, n_rooms, engine=None, trigger_file=None):
         self.home_id = home_id
         self.n_rooms = n_rooms
+        self.engine = engine
         broadcast_port = 33000
         port = 8080
+        self.simulation = HomeSimulation(n_rooms)
+        self.store = StatsStore.create(f"{home_id}/room_stats/stats.bin", n_rooms)
         self.rooms = []
         for i in range(n_rooms):
-            self.rooms.append(Room(home_id, f"room_{i}", port, broadcast_port))
+            self.rooms.append(Room(home_id, f"room_{i}", port, broadcast_port, engine, trigger_file,
+                                   simulation=self.simulation, index=i))
             port+=1
         
     def simulate_walking(self):
@@ -34,8 +59,14 @@ class SmartHome:
             time.sleep(walk_time)
             room.stats['motion'] = 0
 
+    def log_stats(self):
+        self.store.append(time.time(), self.simulation.stats, self.simulation.apparatus_on)
+
     def main(self):
-        threads = [threading.Thread(target=room.main) for room in self.rooms] + [threading.Thread(target=self.simulate_walking)]
+        for room in self.rooms:
+            room.device.turn_on()
+        threads = [threading.Thread(target=self.simulation.run, kwargs={'on_step': self.log_stats}),
+                   threading.Thread(target=self.simulate_walking)]
         for t in threads:
             t.daemon = True
             t.start()
@@ -121,6 +152,21 @@ def parse_args():
     parser = argparse.ArgumentParser(description='Simulate a Smart Home with motion detection in multiple rooms.')
     parser.add_argument('--home_id', type=int, required=True, help='Home ID')
     parser.add_argument('--rooms', type=int, required=True, help='Number of Rooms')
+    parser.add_argument('--asyncio', action='store_true', help='Run the network of all devices on one event loop')
+    parser.add_argument('--triggers', help='JSON file with the triggers of the devices')
+    parser.add_argument('--headless', action='store_true', help='Run the rooms in worker processes without the menu')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Worker processes in headless mode')
+    parser.add_argument('--interest_rate', type=float, default=1.0,
+                        help='Interests sent per second by the whole home in headless mode')
+    parser.add_argument('--duration', type=float, help='Seconds to run in headless mode, until Ctrl-C if not given')
+    parser.add_argument('--report_interval', type=float, default=5.0,
+                        help='Seconds between health reports in headless mode')
+    parser.add_argument('--metrics_port', type=int, help='Serve the metrics of the nodes over HTTP on this port')
+    parser.add_argument('--metrics_interval', type=float, help='Seconds between metrics snapshot files')
+    parser.add_argument('--log_level', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'], default='DEBUG',
+                        help='Level of the device logs')
+    parser.add_argument('--strategy', type=parse_strategy_choice, action='append', default=[],
+                        help="Forwarding strategy [prefix=]best_route, multicast:<k> or hedged:<k>:<delay>")
     return parser.parse_args()
 
 if __name__ == "__main__":
@@ -131,9 +177,36 @@ if __name__ == "__main__":
         os.makedirs(home_dir+"/device_logs")
         os.makedirs(home_dir+"/room_stats")
     
-    home = SmartHome(home_id=f"home_{args.home_id}", n_rooms=args.rooms)
-    home.main()
-    print("Turning off devices safely...")
-    for room in home.rooms:
-        room.device.turn_off()
-    shutil.rmtree(f"home_{args.home_id}")
\ No newline at end of file
+    if args.headless:
+        runner = HomeRunner(f"home_{args.home_id}", args.rooms, args.workers, use_asyncio=args.asyncio,
+                            trigger_file=args.triggers, interest_rate=args.interest_rate,
+                            report_interval=args.report_interval, metrics_port=args.metrics_port,
+                            metrics_interval=args.metrics_interval, log_level=args.log_level,
+                            strategies=args.strategy)
+        runner.run(args.duration)
+    else:
+        set_level(args.log_level)
+        engine = AsyncEngine() if args.asyncio else None
+        home = SmartHome(home_id=f"home_{args.home_id}", n_rooms=args.rooms, engine=engine,
+                         trigger_file=args.triggers)
+        for room in home.rooms:
+            for prefix, strategy in args.strategy:
+                room.device.node.set_strategy(prefix, strategy)
+        exporter = None
+        if args.metrics_port is not None or args.metrics_interval:
+            exporter = MetricsExporter([room.device.node.metrics for room in home.rooms], port=args.metrics_port,
+                                       snapshot_file=f"{home_dir}/room_stats/metrics.json"
+                                       if args.metrics_interval else None,
+                                       interval=args.metrics_interval)
+            exporter.start()
+        home.main()
+        print("Turning off devices safely...")
+        home.simulation.stop()
+        home.store.close()
+        for room in home.rooms:
+            room.device.turn_off()
+        if engine is not None:
+            engine.stop()
+        if exporter is not None:
+            exporter.stop()
+    shutil.rmtree(f"home_{args.home_id}")
@@ -0,0 +1,197 @@
+"""
+StatsStore Class
+- Keeps the history of the stats of all rooms of a home in one memory-mapped file, instead of a text file per
+  room that is rewritten every second.
+- The file holds a ring buffer of fixed-width records: every simulation step appends a row with a record per
+  room (time stamp, the six stats and a bitmask of the apparatus that are on). Once the ring buffer is full,
+  the oldest row is overwritten, so the file keeps the last `retention` steps.
+- Readers open the same file read-only, and read records of a room within a time range or a text snapshot of
+  its latest stats, in the format of the previous stats files.
+- Appends are protected by a seqlock: the sequence number in the header is odd while a row is written, so
+  readers of the latest row retry until they copied it between two equal, even sequence numbers. Reading the
+  latest stats therefore takes no locks and no system calls. If the writer died in the middle of an append,
+  the sequence number stays odd: readers back off after READ_SPINS retries, and after READ_TIMEOUT seconds
+  return the last rows they read consistently, or None.
+
+Example Usage:
+    store = StatsStore.create("home_1/room_stats/stats.bin", n_rooms=5)
+    store.append(time.time(), simulation.stats, simulation.apparatus_on)
+    print(StatsStore.open("home_1/room_stats/stats.bin").snapshot(0))
+"""
+
+import mmap
+import struct
+import time
+
+import numpy as np
+
+from HomeSimulation import APPARATUS, STATS
+
+MAGIC = b'NDNSTAT1'
+HEADER = struct.Struct('<8sIIQQI')  # magic, rooms, retention in steps, steps appended, sequence, closed
+HEADER_SIZE = 64
+STEPS_OFFSET = 16
+SEQUENCE_OFFSET = 24
+CLOSED_OFFSET = 32
+COUNTER = struct.Struct('<Q')
+FLAG = struct.Struct('<I')
+READ_SPINS = 1000  # Retries of a read that overlapped an append before backing off
+READ_TIMEOUT = 0.1  # Seconds a reader waits for an append to complete before it gives up
+RECORD = np.dtype([('time', '<f8'), ('stats', '<f8', (len(STATS),)), ('apparatus', 'u1')])
+
+
+class StatsStore:
+    def __init__(self, path, writable):
+        self.path = path
+        with open(path, 'r+b' if writable else 'rb') as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ)
+        magic, self.n_rooms, self.retention, _, _, _ = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC:
+            self._mmap.close()
+            raise ValueError(f"{path} is not a stats store")
+        self.records = np.ndarray((self.retention, self.n_rooms), dtype=RECORD, buffer=self._mmap,
+                                  offset=HEADER_SIZE)
+        self.writable = writable
+        self._latest_rows = None  # Last consistent copy of the latest rows
+        self._stuck_sequence = None  # Odd sequence number of an append that never completed
+
+    @classmethod
+    def create(cls, path, n_rooms, retention=3600):
+        """
+        Create a store for n_rooms that keeps the last retention steps, replacing an existing file.
+        """
+        with open(path, 'wb') as file:
+            file.write(HEADER.pack(MAGIC, n_rooms, retention, 0, 0, 0).ljust(HEADER_SIZE, b'\0'))
+            file.truncate(HEADER_SIZE + retention * n_rooms * RECORD.itemsize)
+        return cls(path, writable=True)
+
+    @classmethod
+    def open(cls, path):
+        """
+        Open an existing store for reading.
+        """
+        return cls(path, writable=False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """
+        Close the store. Closing the writable store marks it as closed for its readers.
+        """
+        if self.writable:
+            FLAG.pack_into(self._mmap, CLOSED_OFFSET, 1)
+        self.records = None
+        self._mmap.close()
+
+    @property
+    def steps(self):
+        """
+        Number of steps appended since the store was created.
+        """
+        return COUNTER.unpack_from(self._mmap, STEPS_OFFSET)[0]
+
+    @property
+    def closed(self):
+        """
+        Whether the writer closed the store, e.g. because the simulation ended.
+        """
+        return FLAG.unpack_from(self._mmap, CLOSED_OFFSET)[0] == 1
+
+    def append(self, timestamp, stats, apparatus_on):
+        """
+        Append the stats (rooms x stats) and apparatus states (rooms x apparatus) of all rooms at one step.
+        """
+        steps = self.steps
+        sequence = COUNTER.unpack_from(self._mmap, SEQUENCE_OFFSET)[0]
+        COUNTER.pack_into(self._mmap, SEQUENCE_OFFSET, sequence + 1)
+        row = self.records[steps % self.retention]
+        row['time'] = timestamp
+        row['stats'] = stats
+        row['apparatus'] = np.packbits(apparatus_on, axis=1, bitorder='little')[:, 0]
+        # Publish the row only once it is complete
+        COUNTER.pack_into(self._mmap, STEPS_OFFSET, steps + 1)
+        COUNTER.pack_into(self._mmap, SEQUENCE_OFFSET, sequence + 2)
+
+    def read(self, room, start=None, end=None):
+        """
+        Read the records of a room with start <= time <= end in time order, as a structured array with the
+        fields 'time', 'stats' and 'apparatus'. The oldest record is left out once the ring buffer is full,
+        as the writer overwrites it next.
+        """
+        steps = self.steps
+        first = max(0, steps - self.retention)
+        slots = np.arange(first, steps) % self.retention
+        times = self.records['time'][slots, room]
+        lower = 0 if start is None else np.searchsorted(times, start, side='left')
+        upper = len(slots) if end is None else np.searchsorted(times, end, side='right')
+        records = self.records[slots[lower:upper], room]
+
+        # Drop records in slots the writer may have been overwriting while they were read
+        overwritten = max(0, self.steps - self.retention + 1) - (first + lower)
+        return records[max(0, overwritten):]
+
+    def latest_rows(self):
+        """
+        Get a consistent copy of the latest records of all rooms, or None if nothing was appended yet.
+        If an append does not complete within READ_TIMEOUT, e.g. as the writer died, the last consistent
+        copy is returned instead, or None if there is none.
+        """
+        retries = 0
+        deadline = None
+        delay = 1e-4
+        while True:
+            sequence = COUNTER.unpack_from(self._mmap, SEQUENCE_OFFSET)[0]
+            if sequence % 2 == 0:
+                steps = self.steps
+                if steps == 0:
+                    return None
+                rows = self.records[(steps - 1) % self.retention].copy()
+                if COUNTER.unpack_from(self._mmap, SEQUENCE_OFFSET)[0] == sequence:
+                    self._latest_rows = rows
+                    return rows
+            elif sequence == self._stuck_sequence:
+                # Waited for this append before, it is not going to complete
+                return self._latest_rows
+
+            retries += 1
+            if retries > READ_SPINS:
+                now = time.monotonic()
+                if deadline is None:
+                    deadline = now + READ_TIMEOUT
+                elif now > deadline:
+                    if sequence % 2:
+                        self._stuck_sequence = sequence
+                    return self._latest_rows
+                time.sleep(delay)
+                delay = min(2 * delay, 0.01)
+
+    def latest(self, room):
+        """
+        Get the latest record of a room, or None if nothing was appended yet.
+        """
+        rows = self.latest_rows()
+        return None if rows is None else rows[room]
+
+    def snapshot(self, room, room_id=None):
+        """
+        Get the latest stats and apparatus of a room as text.
+        """
+        record = self.latest(room)
+        if record is None:
+            return ""
+        stats = dict(zip(STATS, record['stats'].tolist()))
+        room_id = f"room_{room}" if room_id is None else room_id
+        stats_content = f"Room {room_id}:\n" \
+                        f"Temperature: {stats['temp']} °C\n" \
+                        f"Humidity: {stats['humidity'] * 100} %\n" \
+                        f"CO Level: {stats['CO']} ppm\n" \
+                        f"CO2 Level: {stats['CO2']} ppm\n" \
+                        f"Motion: {'Yes' if stats['motion'] else 'No'}\n" \
+                        f"Light Level: {stats['light']} lux\n\n"
+        for i, apparatus_type in enumerate(APPARATUS):
+            stats_content += f"{apparatus_type}: {'on' if record['apparatus'] >> i & 1 else 'off'}\n"
+        return stats_content
@@ -10,6 +10,7 @@ UntrusedDevice:
 
 import os
 from Device import Device
+from StatsStore import StatsStore
 
 broadcast_port = 33000
 port = 8079
@@ -19,10 +20,10 @@ home_id =  f"home_{home_id}"
 device = Device(None, home_id, "untrusted_device", port, broadcast_port, trusted=False)
 device.turn_on_untrusted()
 while True:
-    active_rooms = os.listdir(f'{home_id}/room_stats')
+    with StatsStore.open(f'{home_id}/room_stats/stats.bin') as store:
+        active_rooms = [f"room_{i}" for i in range(store.n_rooms)]
     print("Choose destination device (or 'quit'):")
-    for i, file_name in enumerate(active_rooms):
-        room_name = file_name[:-10]  # Remove "_stats.txt" to get "room_X"
+    for i, room_name in enumerate(active_rooms):
         print(f"{i}: {room_name}_device")
 
     dest_selection = input().strip()
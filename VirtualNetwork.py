@@ -0,0 +1,263 @@
+"""
+VirtualNetwork Class
+- An in-memory network for NDNNodes, used in place of an AsyncEngine, so that thousands of nodes run in one
+  process without binding a single socket, e.g. for routing and forwarding benchmarks.
+- Like an AsyncEngine, the network hosts the services of its nodes: it delivers packets sent to their listening
+  address and broadcasts to their broadcast port, sends their presence beacons and expires their pending
+  interests. Received packets are passed to the same NDNNode.handle_packet and NDNNode.handle_broadcast
+  methods as with real sockets.
+- The address of a node is (node name, listening port). Ports only need to be unique within the network.
+- Broadcasts and packets are delivered after the latency of the link plus a random jitter, and are lost with
+  the loss probability of the link. A lost packet is reported to the sender after the latency of the link,
+  like a connection that broke while sending, so its forwarding strategy and FIB see the loss, while lost
+  broadcasts go unnoticed like datagrams. Packets over a link are delivered in the order they were sent, like over
+  a connection, while broadcasts may be reordered by the jitter like datagrams. A broadcast is scheduled once
+  for all neighbours it reaches at the same time. Every delivery, beacon and timer runs on one scheduler
+  thread, so the nodes of a network never handle packets concurrently.
+- All events run on the one scheduler thread, so its throughput bounds the size of a network: thousands of
+  nodes can be started, but distance vector routing converges in practical time only for a few hundred of
+  them (see benchmark_network.py).
+- Without a topology all nodes share one broadcast domain. With links between nodes, a node only hears the
+  broadcasts of its neighbours and can only send packets to them, so packets to other nodes are routed over
+  multiple hops.
+
+Example Usage:
+    network = VirtualNetwork(latency=0.001, loss=0.01, topology=[("home_1/a", "home_1/b")])
+    node = NDNNode(node_name, port, broadcast_port, sensor_types, sensors, engine=network)
+    node.start()
+"""
+
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+
+from framing import HEADER
+
+SERVICES = ('connections', 'discovery', 'beacon', 'pending_interests')
+
+logger = logging.getLogger(__name__)
+
+
+class VirtualNetwork:
+    def __init__(self, latency=0.0, jitter=0.0, loss=0.0, topology=None, tick=0.1, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.loss = loss
+        self.tick = tick
+        self.links = None  # node name -> neighbour name -> (latency, loss) of the link, None for one broadcast domain
+        self._random = random.Random(seed)
+        self._nodes = {}  # node name -> node receiving packets and broadcasts
+        self._services = {}  # node -> services
+        self._beacons = {}  # node -> generation of its scheduled beacon, to drop beacons that were rescheduled
+        self._link_clocks = {}  # (node name, neighbour name) -> time of the last delivery over the link
+        self._events = []  # heap of (time, sequence, callback, args)
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._thread = None
+        self.running = False
+        self.delivered = 0
+        self.dropped = 0
+        for a, b in topology or ():
+            self.link(a, b)
+
+    def start(self):
+        with self._condition:
+            if self._thread is None:
+                self.running = True
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+                self._schedule(self.tick, self._expire_pending_interests)
+
+    def stop(self):
+        with self._condition:
+            self.running = False
+            self._condition.notify()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+
+    def link(self, a, b, latency=None, loss=None):
+        """
+        Link two nodes by name, with the latency and loss of the network unless given.
+        Linking nodes turns the single broadcast domain into a topology of links.
+        """
+        with self._condition:
+            if self.links is None:
+                self.links = {}
+            self.links.setdefault(a, {})[b] = self.links.setdefault(b, {})[a] = (latency, loss)
+
+    def unlink(self, a, b):
+        with self._condition:
+            self.links.get(a, {}).pop(b, None)
+            self.links.get(b, {}).pop(a, None)
+
+    def neighbours(self, node_name):
+        """
+        Get the names of the nodes that hear the broadcasts of a node.
+        """
+        with self._condition:
+            if self.links is None:
+                return [name for name in self._nodes if name != node_name]
+            return [name for name in self.links.get(node_name, ()) if name in self._nodes]
+
+    def get_stats(self):
+        """
+        Get the number of nodes, of scheduled events, of packets delivered and dropped, and the lag in seconds
+        of the scheduler behind the events that are due.
+        """
+        with self._condition:
+            return {'nodes': len(self._nodes),
+                    'pending': len(self._events),
+                    'lag': max(0.0, time.monotonic() - self._events[0][0]) if self._events else 0.0,
+                    'delivered': self.delivered,
+                    'dropped': self.dropped}
+
+    def start_node(self, node, services=SERVICES):
+        self.start()
+        with self._condition:
+            self._services[node] = services
+            if 'connections' in services or 'discovery' in services:
+                self._nodes[node.node_name] = node
+            if 'beacon' in services:
+                self._beacons[node] = 0
+                node.beacon.on_wake = lambda: self._reschedule_beacon(node)
+                self._schedule(0.0, self._broadcast_presence, node, 0)
+        node.logger.info("%s joined the virtual network on port %s", node.node_name, node.port)
+
+    def stop_node(self, node):
+        with self._condition:
+            self._services.pop(node, None)
+            self._beacons.pop(node, None)
+            if self._nodes.get(node.node_name) is node:
+                del self._nodes[node.node_name]
+        node.beacon.on_wake = None
+
+    def send(self, node, peer_node_name, addr, packet, json_packet, on_failure=None):
+        """
+        Queue an encoded packet to be delivered to addr. This can be called from any thread.
+        If no node can be reached at addr, or the packet is lost on the link, on_failure is called on the
+        scheduler thread.
+        """
+        peer_name, port = addr
+        now = time.monotonic()
+        # Nodes and links may change on other threads, so the route is checked and taken under the lock
+        with self._condition:
+            peer = self._nodes.get(peer_name)
+            reachable = peer is not None and peer.port == port and 'connections' in self._services.get(peer, ()) \
+                and (self.links is None or peer_name in self.links.get(node.node_name, ()))
+            if reachable:
+                latency, loss = self._link(node.node_name, peer_name)
+                lost = loss and self._random.random() < loss
+                if lost:
+                    self.dropped += 1
+                    if on_failure is not None:
+                        self._push(now + latency, on_failure)
+                else:
+                    key = (node.node_name, peer_name)
+                    due = max(now + latency + self._jitter(), self._link_clocks.get(key, 0.0))
+                    self._link_clocks[key] = due
+                    # The frame header is only needed on a byte stream
+                    self._push(due, self._receive, 'handle_packet', [peer], packet[HEADER.size:],
+                               (node.node_name, node.port))
+            elif on_failure is not None:
+                self._push(now, on_failure)
+        if not reachable:
+            node.logger.error("Error in send_packet() to %s: %s is not reachable", peer_node_name, addr)
+        elif not lost:
+            node.logger.debug("Sent %s '%s' to %s",
+                              json_packet['type'], json_packet['name'], json_packet['destination'])
+
+    def broadcast(self, node, packet):
+        """
+        Queue a broadcast packet to be delivered to the neighbours of a node. This can be called from any thread.
+        """
+        now = time.monotonic()
+        with self._condition:
+            peers = [peer for peer in map(self._nodes.get, self.neighbours(node.node_name))
+                     if peer is not None and 'discovery' in self._services.get(peer, ())]
+            if self.links is None and not self.loss and not self.jitter:
+                peers_by_delay = {self.latency: peers}
+            else:
+                peers_by_delay = {}
+                for peer in peers:
+                    latency, loss = self._link(node.node_name, peer.node_name)
+                    if loss and self._random.random() < loss:
+                        self.dropped += 1
+                        continue
+                    peers_by_delay.setdefault(latency + self._jitter(), []).append(peer)
+            for delay, peers in peers_by_delay.items():
+                self._push(now + delay, self._receive, 'handle_broadcast', peers, packet, (node.node_name, node.port))
+
+    def call_later(self, delay, callback):
+        """
+        Call callback after delay seconds on the scheduler thread. This can be called from any thread.
+        """
+        self._schedule(delay, callback)
+
+    def close_connections(self, node, peer_node_name=None):
+        # Packets are delivered without connections
+        pass
+
+    # -------------------------------------------------------------------------
+
+    def _link(self, node_name, peer_name):
+        # Latency and loss of the link between two nodes, called under the lock
+        latency, loss = (None, None) if self.links is None else self.links[node_name][peer_name]
+        return self.latency if latency is None else latency, self.loss if loss is None else loss
+
+    def _jitter(self):
+        return self._random.uniform(0, self.jitter) if self.jitter else 0.0
+
+    def _receive(self, handler, peers, packet, addr):
+        for peer in peers:
+            if self._nodes.get(peer.node_name) is not peer:
+                continue
+            self.delivered += 1
+            try:
+                getattr(peer, handler)(packet, addr)
+            except Exception as err:
+                peer.logger.error("Error in %s() of packet from %s %s: %s", handler, addr, type(err).__name__, err)
+
+    def _schedule(self, delay, callback, *args):
+        with self._condition:
+            self._push(time.monotonic() + delay, callback, *args)
+
+    def _push(self, due, callback, *args):
+        heapq.heappush(self._events, (due, next(self._sequence), callback, args))
+        if self._events[0][0] == due:
+            self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self.running and (not self._events or self._events[0][0] > time.monotonic()):
+                    self._condition.wait(self._events[0][0] - time.monotonic() if self._events else None)
+                if not self.running:
+                    return
+                _, _, callback, args = heapq.heappop(self._events)
+            # A failing callback must not stop the scheduler thread, which carries the events of every node
+            try:
+                callback(*args)
+            except Exception:
+                logger.exception("Error in scheduled callback %s", getattr(callback, '__qualname__', callback))
+
+    def _reschedule_beacon(self, node):
+        with self._condition:
+            if node in self._beacons:
+                self._beacons[node] += 1
+                self._push(time.monotonic(), self._broadcast_presence, node, self._beacons[node])
+
+    def _broadcast_presence(self, node, generation):
+        if self._beacons.get(node) != generation or not node.running:
+            return
+        self.broadcast(node, node.build_presence_packet())
+        self._schedule(node.beacon.next_delay(len(node.fib.peer_list)), self._broadcast_presence, node, generation)
+
+    def _expire_pending_interests(self):
+        self._schedule(self.tick, self._expire_pending_interests)
+        for node, services in list(self._services.items()):
+            if 'pending_interests' in services and len(node.pit):
+                node.expire_pending_interests()
@@ -0,0 +1,62 @@
+"""
+Beacon Scheduler Class
+- Decides when a node broadcasts its presence. Beacons start at min_interval and the interval doubles
+  after every beacon while the neighbourhood of the node is stable, up to max_interval.
+- A topology change (a peer discovered or gone offline) resets the interval to min_interval and wakes
+  the beacon, so new nodes learn about their neighbours quickly.
+- The stable interval also grows with the number of known peers, so that all nodes of a home together
+  send at most max_home_rate beacons per second, however many rooms are added.
+- Every delay is jittered, so nodes started together do not keep broadcasting at the same moment.
+"""
+
+import random
+import threading
+
+BEACON_MIN_INTERVAL = 0.5  # Seconds between beacons after a topology change
+BEACON_MAX_INTERVAL = 8.0  # Seconds between beacons of a stable node in a small home
+BEACON_MAX_HOME_RATE = 2.0  # Beacons per second of all stable nodes together
+BEACON_JITTER = 0.2  # Delays are randomised by up to this fraction
+
+
+class BeaconScheduler:
+    def __init__(self, min_interval=BEACON_MIN_INTERVAL, max_interval=BEACON_MAX_INTERVAL,
+                 max_home_rate=BEACON_MAX_HOME_RATE, jitter=BEACON_JITTER):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.max_home_rate = max_home_rate
+        self.jitter = jitter
+        self.interval = min_interval
+        self.on_wake = None  # Called when the beacon is woken, for beacons that do not use wait()
+        self._wake = threading.Event()
+        self._random = random.Random()
+
+    def next_delay(self, peer_count=0):
+        """
+        Get the delay until the next beacon and back off the interval after it.
+        """
+        delay = self.interval * self._random.uniform(1 - self.jitter, 1 + self.jitter)
+        max_interval = max(self.max_interval, (peer_count + 1) / self.max_home_rate)
+        self.interval = min(2 * self.interval, max_interval)
+        return delay
+
+    def reset(self):
+        """
+        Re-announce quickly after a topology change.
+        """
+        self.interval = self.min_interval
+        self.wake()
+
+    def wake(self):
+        """
+        Send the next beacon right away, e.g. to stop the beacon.
+        """
+        self._wake.set()
+        if self.on_wake is not None:
+            self.on_wake()
+
+    def wait(self, delay):
+        """
+        Block for delay seconds or until the beacon is woken.
+        """
+        self._wake.wait(delay)
+        self._wake.clear()
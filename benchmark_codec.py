@@ -0,0 +1,66 @@
+"""
+Benchmark of the packet encodings
+
+- Compares encoding and decoding of the JSON packets (API version v2) against the binary packets
+  (API version v3) for the packet shapes in mock_packet.json.
+- The data field of every packet is encrypted first, as NDNNode.encode_packet does, so JSON packets
+  carry AES-CFB ciphertext Base64 encoded and binary packets carry raw AES-GCM ciphertext.
+
+Example Usage: python3 benchmark_codec.py --repeat 20000
+"""
+
+import argparse
+import base64
+import json
+import timeit
+from datetime import datetime, timezone
+
+from ECCManager import ECCManager
+from helper import decode_binary_packet, encode_binary_packet
+
+
+def load_packets(path):
+    with open(path, 'r') as file:
+        packets = json.load(file)
+    # Mock packets use a placeholder time stamp
+    for packet in packets:
+        packet['time_stamp'] = datetime.now(timezone.utc).isoformat()
+    return packets
+
+
+def encode_json(json_packet, encrypted_data):
+    json_packet = dict(json_packet, data=base64.b64encode(encrypted_data).decode('utf-8'))
+    return json.dumps(json_packet).encode('utf-8')
+
+
+def decode_json(packet):
+    json_packet = json.loads(packet.decode())
+    json_packet['data'] = base64.b64decode(json_packet['data'])
+    return json_packet
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the JSON and binary packet encodings.')
+    parser.add_argument('--packets', default='mock_packet.json', help='JSON file with example packets')
+    parser.add_argument('--repeat', type=int, default=20000, help='Encodes and decodes per packet')
+    args = parser.parse_args()
+
+    ecc_manager = ECCManager()
+    session = ecc_manager.create_session(ECCManager().get_public_key())
+
+    print(f"{'packet':<28} {'codec':<7} {'bytes':>6} {'encode (us)':>12} {'decode (us)':>12}")
+    for json_packet in load_packets(args.packets):
+        data = json_packet['data'].encode('utf-8')
+        label = f"{json_packet['type']} '{json_packet['data']}'"
+        codecs = {'json': (encode_json, decode_json, ecc_manager.encrypt_data(session.key, data)),
+                  'binary': (encode_binary_packet, decode_binary_packet, session.encrypt(data))}
+        for codec, (encode, decode, encrypted_data) in codecs.items():
+            packet = encode(json_packet, encrypted_data)
+            assert bytes(decode(packet)['data']) == encrypted_data
+            encode_us = 1e6 * timeit.timeit(lambda: encode(json_packet, encrypted_data), number=args.repeat) / args.repeat
+            decode_us = 1e6 * timeit.timeit(lambda: decode(packet), number=args.repeat) / args.repeat
+            print(f"{label:<28} {codec:<7} {len(packet):>6} {encode_us:>12.2f} {decode_us:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+Benchmark of the packet encryption
+- Compares the AES-CFB encryption of ECCManager, which builds a cipher for every packet, against the AES-GCM
+  PeerSession, which keeps one context per peer, for single packets and batches of packets to one peer.
+- Every packet is encrypted by one node and decrypted by its peer, as in NDNNode.encode_packet and
+  NDNNode.handle_packet.
+
+Example Usage: python3 benchmark_crypto.py --sizes 16 1024 65536 --packets 2000
+"""
+
+import argparse
+import os
+import time
+
+from ECCManager import ECCManager
+
+
+def measure(label, size, n_packets, round_trip):
+    start = time.perf_counter()
+    round_trip()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<14} {size:>8} {1e6 * elapsed / n_packets:>12.2f} {n_packets * size / elapsed / 1e6:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark AES-CFB against AES-GCM peer sessions.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[16, 1024, 65536], help='Packet data sizes in bytes')
+    parser.add_argument('--packets', type=int, default=2000, help='Packets encrypted and decrypted per size')
+    args = parser.parse_args()
+
+    node, peer = ECCManager(), ECCManager()
+    session = node.create_session(peer.get_public_key())
+    peer_session = peer.create_session(node.get_public_key())
+    key = session.key
+
+    print(f"{'mode':<14} {'bytes':>8} {'us/packet':>12} {'MB/s':>10}")
+    for size in args.sizes:
+        packets = [os.urandom(size) for _ in range(args.packets)]
+        measure('cfb', size, args.packets,
+                lambda: [peer.decrypt_data(key, node.encrypt_data(key, data)) for data in packets])
+        measure('gcm session', size, args.packets,
+                lambda: [peer_session.decrypt(session.encrypt(data)) for data in packets])
+        measure('gcm batch', size, args.packets,
+                lambda: peer_session.decrypt_batch(session.encrypt_batch(packets)))
+
+
+if __name__ == "__main__":
+    main()
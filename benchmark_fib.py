@@ -0,0 +1,221 @@
+"""
+Benchmark of the ForwardingInfoBase distance vector engine
+
+- Compares the NumPy backed ForwardingInfoBase against the previous pandas
+  DataFrame implementation, which is kept below as PandasForwardingInfoBase.
+- A random network of N nodes is generated and the FIB of one node is fed with
+  the distance vectors of its neighbours, as NDNNode does on routing broadcasts.
+- Results of get_distance_vector() are checked to be equal. Without round trip
+  times, get_routes() ranks the routes to a known producer by the hops via each
+  neighbour, so its results are checked against the same ranking computed from
+  the pandas table, and against the pandas get_routes() for other names.
+
+Example Usage: python3 benchmark_fib.py --nodes 10 100 1000
+"""
+
+import argparse
+import random
+import time
+import warnings
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+import fib
+
+
+class PandasForwardingInfoBase:
+    """
+    Previous pandas DataFrame implementation of the FIB, kept for comparison.
+    """
+
+    def __init__(self, node_name):
+        self.name = node_name
+        self.peer_list = {}
+        self.dv_table = pd.DataFrame(columns=[self.name], index=[self.name], data=[[0]])
+
+    def add_entry(self, node_name, node_addr):
+        self.peer_list[node_name] = node_addr
+        self._add_peer_to_distance_vector(node_name, set_as_nbr=True)
+        self._calculate_distance_vector()
+        return True
+
+    def remove_entry(self, node_name):
+        del self.peer_list[node_name]
+        self.dv_table = self.dv_table.drop(index=[node_name], columns=[node_name], errors='ignore')
+        self._calculate_distance_vector()
+        return True
+
+    def update_distance_vector(self, node_name, node_vector):
+        vector = pd.Series(node_vector, name=node_name)
+        for node in set(vector.index) - set(self.dv_table.index):
+            self._add_peer_to_distance_vector(node)
+        self.dv_table = self.dv_table.drop(columns=[node_name], errors='ignore')
+        self.dv_table = pd.concat([self.dv_table, vector], axis=1).fillna(np.inf)
+        return self._calculate_distance_vector()
+
+    def get_routes(self, data_name):
+        dist_nbr = self.dv_table[[idx in self.peer_list.keys() for idx in self.dv_table.index]][self.name]
+        dist_nbr_fmt = dist_nbr.add_suffix('/')
+        peer_list_cpy = self.peer_list.copy()
+        addr_to_try = []
+        split = data_name.split('/')
+        for i in range(0, len(split)):
+            prefix = '/'.join(split[:len(split)-i])
+            if not prefix.endswith('/'):
+                prefix += '/'
+            if prefix == '/':
+                break
+            for index, value in dist_nbr[dist_nbr_fmt.index.str.startswith(prefix)].sort_values(kind='stable').items():
+                addr = peer_list_cpy.pop(index, None)
+                if addr is not None:
+                    addr_to_try.append((index, addr))
+                if not peer_list_cpy:
+                    break
+            if not peer_list_cpy:
+                break
+        return addr_to_try
+
+    def get_distance_vector(self):
+        return self.dv_table[self.name].to_dict()
+
+    def _calculate_distance_vector(self):
+        cost = pd.Series(data=np.concatenate([[0], np.ones(len(self.peer_list.keys()))]),
+                         index=[self.name]+list(self.peer_list.keys()),
+                         name='cost')
+        dv = []
+        for node, distance in self.dv_table.iterrows():
+            tmp = pd.concat([cost, distance], axis=1).fillna(np.inf)
+            dv.append(min(tmp['cost'] + tmp[node]))
+        self.dv_table[self.name] = dv
+        return dv != list(cost)
+
+    def _add_peer_to_distance_vector(self, name, set_as_nbr=False):
+        self.dv_table[name] = np.inf
+        self.dv_table.loc[name] = np.inf
+        self.dv_table.loc[name, name] = 0
+        if set_as_nbr:
+            self.dv_table.loc[self.name, name] = 1
+            self.dv_table.loc[name, self.name] = 1
+
+
+def expected_routes(legacy, data_name, stretch=1):
+    """
+    Routes that ForwardingInfoBase.get_routes returns before any round trip was measured: neighbours at most
+    stretch hops longer than the shortest route to the producer, by hops and then in order of addition, followed
+    by the longer routes in the same order.
+    """
+    producer = data_name[:data_name.rindex('/')]
+    if producer != legacy.name and producer in legacy.dv_table.index:
+        hops = {nbr: legacy.dv_table.loc[producer, nbr] + 1 for nbr in legacy.peer_list}
+        shortest = min(hops.values(), default=np.inf)
+        if shortest < np.inf:
+            ranked = sorted((nbr for nbr in hops if hops[nbr] <= shortest + stretch), key=hops.get)
+            ranked += sorted((nbr for nbr in hops if hops[nbr] > shortest + stretch), key=hops.get)
+            return [(nbr, legacy.peer_list[nbr]) for nbr in ranked]
+    return legacy.get_routes(data_name)
+
+
+def build_network(n_nodes, degree, seed):
+    """
+    Builds a connected random network and the hop distances between its nodes.
+    """
+    rng = random.Random(seed)
+    names = [f"home_1/room_{i}_device" for i in range(n_nodes)]
+    adjacency = {name: set() for name in names}
+    for i in range(1, n_nodes):
+        j = rng.randrange(i)
+        adjacency[names[i]].add(names[j])
+        adjacency[names[j]].add(names[i])
+    for _ in range(n_nodes * (degree - 1) // 2):
+        a, b = rng.sample(names, 2)
+        adjacency[a].add(b)
+        adjacency[b].add(a)
+    return names, adjacency
+
+
+def hop_distances(adjacency, source):
+    distances = {source: 0}
+    queue = deque([source])
+    while queue:
+        node = queue.popleft()
+        for nbr in adjacency[node]:
+            if nbr not in distances:
+                distances[nbr] = distances[node] + 1
+                queue.append(nbr)
+    return {name: float(dist) for name, dist in distances.items()}
+
+
+def run_scenario(fib_class, names, adjacency, n_updates, seed):
+    """
+    Runs one routing scenario on the FIB of the first node and returns the
+    timings of each operation and the resulting FIB.
+    """
+    rng = random.Random(seed)
+    own = names[0]
+    nbrs = sorted(adjacency[own])
+    vectors = {nbr: hop_distances(adjacency, nbr) for nbr in nbrs}
+    table = fib_class(own)
+    timings = {'add_entry': [], 'update_distance_vector': [], 'get_routes': []}
+
+    for port, nbr in enumerate(nbrs):
+        start = time.perf_counter()
+        table.add_entry(nbr, ('127.0.0.1', 8080 + port))
+        timings['add_entry'].append(time.perf_counter() - start)
+
+    # First round of vectors introduces every node of the network to the table
+    for nbr in nbrs:
+        start = time.perf_counter()
+        table.update_distance_vector(nbr, vectors[nbr])
+        timings['update_distance_vector'].append(time.perf_counter() - start)
+
+    # Subsequent rounds are the steady state of routing broadcasts
+    for _ in range(n_updates):
+        nbr = rng.choice(nbrs)
+        vector = dict(vectors[nbr])
+        vector[rng.choice(names)] = float(rng.randint(1, 10))
+        start = time.perf_counter()
+        table.update_distance_vector(nbr, vector)
+        timings['update_distance_vector'].append(time.perf_counter() - start)
+
+    for _ in range(n_updates):
+        data_name = f"{rng.choice(names)}/temp"
+        start = time.perf_counter()
+        table.get_routes(data_name)
+        timings['get_routes'].append(time.perf_counter() - start)
+
+    return timings, table
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the FIB distance vector engine against pandas.')
+    parser.add_argument('--nodes', type=int, nargs='+', default=[10, 100, 1000], help='Network sizes')
+    parser.add_argument('--degree', type=int, default=4, help='Average number of neighbours per node')
+    parser.add_argument('--updates', type=int, default=50, help='Steady state updates per size')
+    parser.add_argument('--seed', type=int, default=21, help='Random seed')
+    args = parser.parse_args()
+
+    # The pandas implementation grows its table one column at a time
+    warnings.simplefilter('ignore', pd.errors.PerformanceWarning)
+
+    print(f"{'nodes':>6} {'operation':<24} {'pandas (ms)':>12} {'numpy (ms)':>12} {'speedup':>9}")
+    for n_nodes in args.nodes:
+        names, adjacency = build_network(n_nodes, args.degree, args.seed)
+        legacy_timings, legacy = run_scenario(PandasForwardingInfoBase, names, adjacency, args.updates, args.seed)
+        # Without exploration the routes are deterministic
+        new_timings, new = run_scenario(lambda name: fib.ForwardingInfoBase(name, exploration=0),
+                                        names, adjacency, args.updates, args.seed)
+
+        assert legacy.get_distance_vector() == new.get_distance_vector(), "distance vectors differ"
+        for name in names:
+            assert expected_routes(legacy, name + '/temp') == new.get_routes(name + '/temp'), "routes differ"
+
+        for operation in new_timings:
+            legacy_ms = 1000 * np.mean(legacy_timings[operation])
+            new_ms = 1000 * np.mean(new_timings[operation])
+            print(f"{n_nodes:>6} {operation:<24} {legacy_ms:>12.3f} {new_ms:>12.3f} {legacy_ms / new_ms:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
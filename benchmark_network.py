@@ -0,0 +1,179 @@
+"""
+Benchmark of routing and forwarding on a VirtualNetwork
+
+- Runs a topology of NDNNodes in one process on a VirtualNetwork, without sockets, and measures:
+    1. Routing: the time from starting all nodes until the distance vector of every node reaches every other
+       node, through discovery beacons and distance vector broadcasts, and the network caught up with them.
+    2. Forwarding: interests from random consumers for the data of random producers, forwarded hop by hop
+       along the FIB, and the round trip time until the data (or a NACK) arrives back at the consumer.
+       Interests that are not answered within the PIT lifetime after the last one was sent are unanswered.
+- Topologies: 'mesh' (one broadcast domain), 'line', 'ring', 'grid' (as square as possible) and 'random'
+  (every node linked to --degree random nodes, plus a line through all nodes so the network is connected).
+- Routing is the limit of the network size: every change of a distance vector is broadcast as a whole vector,
+  so the work grows with about the cube of the number of nodes, all on the one scheduler thread. On a grid
+  with 1 ms links, routing converged in 3 s for 100 nodes, 19 s for 200 nodes and 171 s for 400 nodes.
+  Thousands of nodes can be created and started, but their routes do not converge within --timeout.
+- All nodes forward interests with the --strategy, e.g. hedged:2:0.01, to compare the tail latency of the
+  forwarding strategies on lossy links.
+
+Example Usage: python3 benchmark_network.py --nodes 100 --topology grid --latency 0.001 --interests 500
+"""
+
+import argparse
+import logging
+import math
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+
+from NDNNode import NDNNode
+from VirtualNetwork import VirtualNetwork
+from strategy import parse_strategy
+
+HOME_ID = 'bench_net'
+
+
+class BenchSensor:
+    def __init__(self, sensor_type):
+        self.sensor_type = sensor_type
+
+    def get_reading(self):
+        return 21.0
+
+
+def node_name(i):
+    return f"{HOME_ID}/node_{i}"
+
+
+def topology_links(topology, n_nodes, degree, rng):
+    if topology == 'mesh':
+        return None
+    links = set()
+    if topology in ('line', 'ring', 'random'):
+        links.update((i, i + 1) for i in range(n_nodes - 1))
+    if topology == 'ring' and n_nodes > 2:
+        links.add((n_nodes - 1, 0))
+    if topology == 'grid':
+        width = math.ceil(math.sqrt(n_nodes))
+        links.update((i, i + 1) for i in range(n_nodes - 1) if (i + 1) % width)
+        links.update((i, i + width) for i in range(n_nodes - width))
+    if topology == 'random':
+        for i in range(n_nodes):
+            links.update((i, j) for j in rng.sample(range(n_nodes), min(degree, n_nodes)) if j != i)
+    return [(node_name(a), node_name(b)) for a, b in links]
+
+
+def routes_converged(nodes):
+    for node in nodes:
+        vector = node.fib.get_distance_vector()
+        if len(vector) < len(nodes) or math.inf in vector.values():
+            return False
+    return True
+
+
+def run_routing(network, nodes, timeout):
+    start = time.perf_counter()
+    for node in nodes:
+        node.start()
+    while network.get_stats()['lag'] > 0.1 or not routes_converged(nodes):
+        if time.perf_counter() - start > timeout:
+            return None
+        time.sleep(0.1)
+    return time.perf_counter() - start
+
+
+def run_forwarding(nodes, n_interests, rate, rng):
+    sent = {}  # (consumer name, data name) -> time sent
+    rtts = []
+    nacks = [0]
+    done = threading.Event()
+    lock = threading.Lock()
+
+    def watch(node):
+        handle_data = node.handle_data
+
+        def handle_data_and_count(data_packet):
+            handle_data(data_packet)
+            key = (node.node_name, data_packet['name'])
+            with lock:
+                # Relayed data keeps the destination of its first hop, so replies are matched by the consumer
+                if key in sent:
+                    rtts.append(time.perf_counter() - sent.pop(key))
+                    nacks[0] += data_packet['data'].startswith('No data')
+                    if len(rtts) == n_interests:
+                        done.set()
+        node.handle_data = handle_data_and_count
+
+    for node in nodes:
+        watch(node)
+
+    hops = []
+    start = time.perf_counter()
+    for i in range(n_interests):
+        consumer, producer = rng.sample(nodes, 2)
+        data_name = f"{producer.node_name}/temp"
+        # Interests are sent to a neighbour, the first hop of the best route to the producer
+        first_hop = consumer.fib.get_routes(data_name)[0][0]
+        hops.append(consumer.fib.get_distance_vector()[producer.node_name])
+        with lock:
+            sent[(consumer.node_name, data_name)] = time.perf_counter()
+        consumer.create_send_interest_packet(data_name, first_hop)
+        if rate:
+            time.sleep(max(0.0, start + (i + 1) / rate - time.perf_counter()))
+    done.wait(nodes[0].pit.lifetime + 1.0)
+    return rtts, nacks[0], statistics.mean(hops)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark routing and forwarding of NDNNodes on a VirtualNetwork.')
+    parser.add_argument('--nodes', type=int, default=100, help='Number of nodes')
+    parser.add_argument('--topology', choices=['mesh', 'line', 'ring', 'grid', 'random'], default='grid')
+    parser.add_argument('--degree', type=int, default=3, help='Random links per node of the random topology')
+    parser.add_argument('--latency', type=float, default=0.001, help='Latency of every link in seconds')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Maximum random extra latency in seconds')
+    parser.add_argument('--loss', type=float, default=0.0, help='Probability that a link loses a packet')
+    parser.add_argument('--interests', type=int, default=500, help='Interests sent between random nodes')
+    parser.add_argument('--rate', type=float, default=200.0, help='Interests sent per second, 0 for a burst')
+    parser.add_argument('--timeout', type=float, default=600.0, help='Seconds to wait for routes to converge')
+    parser.add_argument('--strategy', type=parse_strategy, default='best_route',
+                        help='Forwarding strategy: best_route, multicast:<k> or hedged:<k>:<delay>')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    os.chdir(tempfile.mkdtemp())
+    os.makedirs(f"{HOME_ID}/device_logs")
+    network = VirtualNetwork(latency=args.latency, jitter=args.jitter, loss=args.loss,
+                             topology=topology_links(args.topology, args.nodes, args.degree, rng), seed=args.seed)
+
+    start = time.perf_counter()
+    nodes = [NDNNode(node_name(i), 1 + i, 0, ['temp'], [BenchSensor('temp')], engine=network)
+             for i in range(args.nodes)]
+    for node in nodes:
+        node.logger.setLevel(logging.WARNING)
+        node.set_strategy('', args.strategy)
+    print(f"{args.nodes} nodes on a {args.topology} topology, created in {time.perf_counter() - start:.2f} s")
+
+    converged = run_routing(network, nodes, args.timeout)
+    stats = network.get_stats()
+    if converged is None:
+        print(f"routing:    not converged after {args.timeout:.0f} s")
+        return
+    print(f"routing:    converged in {converged:.2f} s, {stats['delivered']} broadcasts and packets delivered, "
+          f"{stats['dropped']} dropped")
+
+    rtts, nacks, mean_hops = run_forwarding(nodes, args.interests, args.rate, rng)
+    if rtts:
+        rtts_ms = sorted(1000 * rtt for rtt in rtts)
+        print(f"forwarding: {len(rtts)}/{args.interests} answered ({nacks} NACKs) over {mean_hops:.1f} hops on "
+              f"average, RTT p50 {rtts_ms[len(rtts_ms) // 2]:.2f} ms, p99 {rtts_ms[int(0.99 * (len(rtts_ms) - 1))]:.2f} ms")
+    else:
+        print(f"forwarding: 0/{args.interests} answered")
+    network.stop()
+
+
+if __name__ == "__main__":
+    main()
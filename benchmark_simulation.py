@@ -0,0 +1,73 @@
+"""
+Benchmark of the room simulation
+- Compares one step of the previous per-room simulation, which updated a dict of stats per room with scalar
+  maths and random.uniform calls, against one vectorized step of HomeSimulation for all rooms.
+- The previous simulation ran a thread per room, so stepping all rooms took as many threads as rooms.
+
+Example Usage: python3 benchmark_simulation.py --rooms 10 100 1000 10000
+"""
+
+import argparse
+import timeit
+from random import uniform
+
+from HomeSimulation import APPARATUS, INITIAL_STATS, HomeSimulation
+
+
+class LegacyRoom:
+    def __init__(self):
+        self.stats = dict(INITIAL_STATS)
+        self.apparatus = {apparatus_type: [False, stat, change_type, amount]
+                          for apparatus_type, (stat, change_type, amount) in APPARATUS.items()}
+
+    def update_via_apparatus(self):
+        for on, affected_stat, change_type, change_amount in self.apparatus.values():
+            if on and affected_stat in self.stats.keys():
+                if change_type == "set_to":
+                    self.stats[affected_stat] = change_amount
+                elif change_type == "increase_by":
+                    self.stats[affected_stat] += change_amount
+                elif change_type == "decrease_by":
+                    self.stats[affected_stat] -= change_amount
+            if not on and affected_stat in self.stats.keys():
+                if change_type == "set_to":
+                    self.stats[affected_stat] = 0
+
+    def update_via_natural_changes(self):
+        self.stats["temp"] += uniform(-0.01, 0.01)
+        self.stats["temp"] = min(max(self.stats["temp"], -10), 40)
+        self.stats["humidity"] += uniform(-0.005, 0.005)
+        self.stats["humidity"] = min(max(self.stats["humidity"], 0), 1)
+        self.stats["CO"] += uniform(-0.01, 0.01)
+        self.stats["CO"] = min(max(self.stats["CO"], 0), 100)
+        self.stats["CO2"] += uniform(-0.01, 0.01)
+        self.stats["CO2"] = min(max(self.stats["CO2"], 300), 1000)
+
+
+def legacy_step(rooms):
+    for room in rooms:
+        room.update_via_apparatus()
+        room.update_via_natural_changes()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark per-room against vectorized room simulation.')
+    parser.add_argument('--rooms', type=int, nargs='+', default=[10, 100, 1000, 10000], help='Rooms per home')
+    parser.add_argument('--steps', type=int, default=20, help='Steps timed per home size')
+    args = parser.parse_args()
+
+    print(f"{'rooms':>7} {'per-room (ms)':>14} {'vectorized (ms)':>16} {'speedup':>9}")
+    for n_rooms in args.rooms:
+        rooms = [LegacyRoom() for _ in range(n_rooms)]
+        simulation = HomeSimulation(n_rooms, seed=0)
+        simulation.apparatus_on[::2, 0] = True
+        for room in rooms[::2]:
+            room.apparatus["heater"][0] = True
+
+        legacy_ms = 1e3 * timeit.timeit(lambda: legacy_step(rooms), number=args.steps) / args.steps
+        vectorized_ms = 1e3 * timeit.timeit(simulation.step, number=args.steps) / args.steps
+        print(f"{n_rooms:>7} {legacy_ms:>14.3f} {vectorized_ms:>16.3f} {legacy_ms / vectorized_ms:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
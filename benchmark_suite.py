@@ -0,0 +1,403 @@
+"""
+Benchmark suite of the NDN data path
+
+- Runs reproducible benchmarks of the paths a packet takes through a node, so that changes to fib.py,
+  helper.py, ECCManager.py or NDNNode.py can be checked for making forwarding faster or slower:
+    1. fib: ForwardingInfoBase.add_entry, update_distance_vector and get_routes, for a FIB that knows
+       --fib-nodes nodes through --neighbours neighbours.
+    2. packet: building packets, and encoding and decoding them in the binary and JSON formats.
+    3. crypto: ECDH key agreement of a session, and encryption and decryption with AES-GCM sessions and
+       AES-CFB.
+    4. round_trip: interests from the first to the last of a chain of --hops + 1 NDNNodes on loopback, in
+       which every node only knows its neighbours, and the data returned over all hops. The content stores
+       are cleared before every interest, so every round trip crosses all hops.
+    5. metrics: incrementing a counter and observing a histogram next to an empty call, and the round trips
+       over the chain with the counters and histograms of the nodes and with no-ops in their place.
+- Every operation is timed on its own. Results are printed and can be written as JSON with the throughput
+  and the mean, p50 and p99 latency of every benchmark. Like timeit, every benchmark is run --repeat times
+  and the run with the lowest p50 is kept, as slower runs are caused by other processes.
+- Results are compared with a stored baseline, and benchmarks whose p50 latency grew by more than the
+  threshold are reported as regressions, with a non-zero exit status. Latencies only compare on the same
+  machine, so a baseline recorded on another machine, or with other sizes of the benchmarks, is skipped.
+
+Example Usage:
+    python3 benchmark_suite.py --output results.json
+    python3 benchmark_suite.py --only fib packet --baseline benchmark_baseline.json --threshold 0.2
+    python3 benchmark_suite.py --save-baseline
+"""
+
+import argparse
+import base64
+import json
+import logging
+import os
+import platform
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+import fib
+from AsyncEngine import AsyncEngine
+from ECCManager import ECCManager
+from NDNNode import NDNNode
+from helper import build_packet, decode_binary_packet, encode_binary_packet
+from metrics import Counter, Histogram
+
+BASELINE = 'benchmark_baseline.json'
+# Arguments that change what is benchmarked, and not only how often
+WORKLOAD_ARGUMENTS = ('fib_nodes', 'neighbours', 'packet_size', 'asyncio', 'seed')
+HOME_ID = 'bench_suite'
+
+
+class BenchSensor:
+    def __init__(self, sensor_type):
+        self.sensor_type = sensor_type
+
+    def get_reading(self):
+        return 21.0
+
+
+class NoMetric:
+    """
+    Takes the place of a counter or histogram of a node, to time the node without metrics.
+    """
+
+    def inc(self):
+        pass
+
+    def add(self, amount):
+        pass
+
+    def observe(self, value):
+        pass
+
+
+def describe_machine():
+    """
+    Describe the machine the benchmarks run on, to tell whether results of a baseline are comparable.
+    """
+    processor = platform.processor()
+    if os.path.exists('/proc/cpuinfo'):
+        with open('/proc/cpuinfo', 'r') as file:
+            processor = next((line.split(':', 1)[1].strip() for line in file if line.startswith('model name')),
+                             processor)
+    return {'host': platform.node(),
+            'platform': platform.platform(),
+            'processor': processor or platform.machine(),
+            'cpus': os.cpu_count(),
+            'python': platform.python_version()}
+
+
+def baseline_mismatch(meta, baseline_meta):
+    """
+    Get the machine properties and workload arguments in which a baseline differs from the current run.
+    """
+    mismatch = [key for key, value in meta['machine'].items() if baseline_meta.get('machine', {}).get(key) != value]
+    return mismatch + [key for key in WORKLOAD_ARGUMENTS
+                       if baseline_meta['arguments'].get(key) != meta['arguments'].get(key)]
+
+
+def summarize(samples_ns):
+    """
+    Summarize the durations of single operations in nanoseconds.
+    """
+    samples = sorted(samples_ns)
+    total = sum(samples)
+    return {'iterations': len(samples),
+            'ops_per_s': round(len(samples) / (total / 1e9), 1),
+            'mean_us': round(total / len(samples) / 1e3, 3),
+            'p50_us': round(samples[len(samples) // 2] / 1e3, 3),
+            'p99_us': round(samples[int(0.99 * (len(samples) - 1))] / 1e3, 3)}
+
+
+def measure(operation, iterations, repeat=1, warmup=None, setup=None):
+    """
+    Time every call of operation(), after warmup calls, in repeat runs and summarize the run with the lowest
+    p50. setup() is called untimed before every call.
+    """
+    warmup = iterations // 10 if warmup is None else warmup
+    runs = []
+    for _ in range(repeat):
+        samples = []
+        for i in range(warmup + iterations):
+            if setup is not None:
+                setup()
+            start = time.perf_counter_ns()
+            operation()
+            elapsed = time.perf_counter_ns() - start
+            if i >= warmup:
+                samples.append(elapsed)
+        runs.append(summarize(samples))
+    return min(runs, key=lambda run: run['p50_us'])
+
+
+def benchmark_fib(args, rng):
+    names = [f"{HOME_ID}/node_{i}" for i in range(args.fib_nodes)]
+    neighbours = names[:args.neighbours]
+    table = fib.ForwardingInfoBase(f"{HOME_ID}/self")
+    vectors = {}
+    for i, neighbour in enumerate(neighbours):
+        table.add_entry(neighbour, ('127.0.0.1', 9000 + i))
+        vector = {name: float(rng.randint(1, 10)) for name in names}
+        vector[neighbour] = 0.0
+        # Every update alternates between two vectors, so every update changes the table
+        vectors[neighbour] = (vector, {name: hops + (name != neighbour) for name, hops in vector.items()})
+        table.update_distance_vector(neighbour, vector)
+
+    results = {}
+    counter = iter(range(10 ** 9))
+
+    def add_new_peer():
+        peer = f"{HOME_ID}/peer_{next(counter)}"
+        table.add_entry(peer, ('127.0.0.1', 8000))
+        return peer
+
+    added = []
+    results['fib.add_entry'] = measure(lambda: added.append(add_new_peer()), args.iterations // 10, args.repeat,
+                                       setup=lambda: added and table.remove_entry(added.pop()))
+    if added:
+        table.remove_entry(added.pop())
+
+    updates = iter(range(10 ** 9))
+
+    def update():
+        i = next(updates)
+        neighbour = neighbours[i % len(neighbours)]
+        table.update_distance_vector(neighbour, vectors[neighbour][i // len(neighbours) % 2])
+
+    results['fib.update_distance_vector'] = measure(update, args.iterations // 10, args.repeat)
+    data_names = [f"{rng.choice(names)}/temp" for _ in range(1024)]
+    lookups = iter(range(10 ** 9))
+    results['fib.get_routes'] = measure(lambda: table.get_routes(data_names[next(lookups) % len(data_names)]),
+                                        args.iterations, args.repeat)
+    return results
+
+
+def benchmark_packet(args, rng):
+    ecc_manager = ECCManager()
+    session = ecc_manager.create_session(ECCManager().get_public_key())
+    json_packet = build_packet('data', f"{HOME_ID}/node_1", f"{HOME_ID}/node_0", f"{HOME_ID}/node_1/temp", '21.0')
+    data = json_packet['data'].encode('utf-8')
+    sealed = session.encrypt(data)
+    encrypted = ecc_manager.encrypt_data(session.key, data)
+    binary = encode_binary_packet(json_packet, sealed)
+    encoded = json.dumps(dict(json_packet, data=base64.b64encode(encrypted).decode('utf-8'))).encode('utf-8')
+
+    return {'packet.build': measure(lambda: build_packet('interest', f"{HOME_ID}/node_0", f"{HOME_ID}/node_1",
+                                                         f"{HOME_ID}/node_1/temp", ''), args.iterations, args.repeat),
+            'packet.encode_binary': measure(lambda: encode_binary_packet(json_packet, sealed), args.iterations, args.repeat),
+            'packet.decode_binary': measure(lambda: decode_binary_packet(binary), args.iterations, args.repeat),
+            'packet.encode_json': measure(lambda: json.dumps(dict(json_packet, data=base64.b64encode(encrypted)
+                                                                  .decode('utf-8'))).encode('utf-8'), args.iterations, args.repeat),
+            'packet.decode_json': measure(lambda: base64.b64decode(json.loads(encoded.decode())['data']),
+                                          args.iterations, args.repeat)}
+
+
+def benchmark_crypto(args, rng):
+    node, peer = ECCManager(), ECCManager()
+    peer_public_key = peer.get_public_key()
+    session = node.create_session(peer_public_key)
+    peer_session = peer.create_session(node.get_public_key())
+    data = os.urandom(args.packet_size)
+    sealed = session.encrypt(data)
+    encrypted = node.encrypt_data(session.key, data)
+
+    return {'crypto.ecdh': measure(lambda: node.create_session(peer_public_key), args.iterations // 10, args.repeat),
+            'crypto.gcm_encrypt': measure(lambda: session.encrypt(data), args.iterations, args.repeat),
+            'crypto.gcm_decrypt': measure(lambda: peer_session.decrypt(sealed), args.iterations, args.repeat),
+            'crypto.cfb_encrypt': measure(lambda: node.encrypt_data(session.key, data), args.iterations, args.repeat),
+            'crypto.cfb_decrypt': measure(lambda: peer.decrypt_data(session.key, encrypted), args.iterations, args.repeat)}
+
+
+def create_chain(n_nodes, base_port, engine=None):
+    nodes = [NDNNode(f"{HOME_ID}/node_{i}", base_port + i, 0, ['temp'], [BenchSensor('temp')], engine)
+             for i in range(n_nodes)]
+    for node in nodes:
+        node.logger.setLevel(logging.WARNING)
+    # Every node only knows its neighbours, the next node towards the producer first, so that its routes to
+    # the producer start with the next node
+    for i, node in enumerate(nodes):
+        for peer in nodes[i + 1:i + 2] + nodes[max(0, i - 1):i]:
+            node.fib.add_entry(peer.node_name, ('127.0.0.1', peer.port))
+            node.peer_versions[peer.node_name] = peer.api_version
+            node.peer_keys[peer.node_name] = peer.public_key_pem
+    return nodes
+
+
+def start_chain(args, port, instrumented=True):
+    """
+    Start a chain of NDNNodes and return round_trip() timing one interest over it, clear() emptying its content
+    stores and stop(). Without instrumentation the counters and histograms of the nodes are no-ops.
+    """
+    os.makedirs(f"{HOME_ID}/device_logs", exist_ok=True)
+    engine = AsyncEngine() if args.asyncio else None
+    nodes = create_chain(args.hops + 1, port, engine)
+    for node in nodes:
+        if not instrumented:
+            for attribute, value in list(vars(node).items()):
+                if isinstance(value, (Counter, Histogram)):
+                    setattr(node, attribute, NoMetric())
+        node.running = True
+        if engine is not None:
+            engine.start_node(node, services=('connections',))
+        else:
+            node.threads = [threading.Thread(target=node.listen_for_connections, daemon=True)]
+            node.threads[0].start()
+    time.sleep(0.5)
+
+    consumer, producer = nodes[0], nodes[-1]
+    data_name = f"{producer.node_name}/temp"
+    received = threading.Event()
+    handle_data = consumer.handle_data
+
+    def handle_data_and_signal(data_packet):
+        handle_data(data_packet)
+        if data_packet['name'] == data_name:
+            received.set()
+    consumer.handle_data = handle_data_and_signal
+
+    def clear():
+        received.clear()
+        for node in nodes:
+            node.cs.clear()
+
+    def round_trip():
+        consumer.create_send_interest_packet(data_name, nodes[1].node_name)
+        if not received.wait(args.round_trip_timeout):
+            raise TimeoutError(f"No data {data_name} received over {args.hops} hops")
+
+    def stop():
+        for node in nodes:
+            node.running = False
+            node.close_connections()
+        if engine is not None:
+            engine.stop()
+
+    return round_trip, clear, stop
+
+
+def benchmark_round_trip(args, rng):
+    round_trip, clear, stop = start_chain(args, args.port)
+    try:
+        result = measure(round_trip, args.round_trips, args.repeat, warmup=5, setup=clear)
+    finally:
+        stop()
+    return {f"round_trip.loopback_{args.hops}_hops": result}
+
+
+def benchmark_metrics(args, rng):
+    counter = Counter('bench_total', 'Benchmarked counter')
+    histogram = Histogram('bench_seconds', 'Benchmarked histogram')
+    no_metric = NoMetric()
+    values = [rng.random() for _ in range(1024)]
+    observations = iter(range(10 ** 9))
+    results = {'metrics.no_op': measure(no_metric.inc, args.iterations, args.repeat),
+               'metrics.counter_inc': measure(counter.inc, args.iterations, args.repeat),
+               'metrics.histogram_observe': measure(lambda: histogram.observe(values[next(observations) % 1024]),
+                                                    args.iterations, args.repeat)}
+
+    # Runs over both chains alternate, so that both are slowed down alike by other processes
+    chains = [start_chain(args, args.port + args.hops + 1, instrumented=False),
+              start_chain(args, args.port + 2 * (args.hops + 1))]
+    runs = [[], []]
+    try:
+        for _ in range(args.repeat):
+            for (round_trip, clear, _), chain_runs in zip(chains, runs):
+                chain_runs.append(measure(round_trip, args.round_trips, warmup=5, setup=clear))
+    finally:
+        for _, _, stop in chains:
+            stop()
+    uninstrumented, instrumented = (min(chain_runs, key=lambda run: run['p50_us']) for chain_runs in runs)
+    results[f"metrics.loopback_{args.hops}_hops_off"] = uninstrumented
+    results[f"metrics.loopback_{args.hops}_hops_on"] = instrumented
+    print(f"Metrics change the p50 of {args.hops}-hop round trips by "
+          f"{instrumented['p50_us'] / uninstrumented['p50_us'] - 1:+.1%}")
+    return results
+
+
+
+
+BENCHMARKS = {'fib': benchmark_fib, 'packet': benchmark_packet, 'crypto': benchmark_crypto,
+              'round_trip': benchmark_round_trip, 'metrics': benchmark_metrics}
+
+
+def compare(results, baseline, threshold):
+    """
+    Print the results next to the baseline and return the names of the benchmarks that regressed.
+    """
+    regressions = []
+    print(f"{'benchmark':<32} {'ops/s':>12} {'p50 (us)':>11} {'p99 (us)':>11} {'base p50':>11} {'change':>8}")
+    for name, result in results.items():
+        base = baseline.get(name)
+        change = '' if base is None else f"{result['p50_us'] / base['p50_us'] - 1:+.1%}"
+        if base is not None and result['p50_us'] > base['p50_us'] * (1 + threshold):
+            regressions.append(name)
+            change += ' !'
+        print(f"{name:<32} {result['ops_per_s']:>12.1f} {result['p50_us']:>11.2f} {result['p99_us']:>11.2f} "
+              f"{'' if base is None else format(base['p50_us'], '.2f'):>11} {change:>8}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the FIB, packets, crypto, multi-hop round trips and '
+                                                 'the metrics of the nodes.')
+    parser.add_argument('--only', nargs='+', choices=list(BENCHMARKS), default=list(BENCHMARKS),
+                        help='Groups of benchmarks to run')
+    parser.add_argument('--iterations', type=int, default=20000, help='Timed operations per microbenchmark')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs of every benchmark, the fastest is kept')
+    parser.add_argument('--fib-nodes', type=int, default=1000, help='Nodes known to the benchmarked FIB')
+    parser.add_argument('--neighbours', type=int, default=8, help='Neighbours of the benchmarked FIB')
+    parser.add_argument('--packet-size', type=int, default=64, help='Data bytes encrypted per packet')
+    parser.add_argument('--hops', type=int, default=3, help='Hops between consumer and producer')
+    parser.add_argument('--round-trips', type=int, default=500, help='Timed interest/data round trips')
+    parser.add_argument('--round-trip-timeout', type=float, default=5.0, help='Seconds to wait for the data')
+    parser.add_argument('--asyncio', action='store_true', help='Run the round trip nodes on an AsyncEngine')
+    parser.add_argument('--port', type=int, default=9300, help='First TCP port of the round trip nodes')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='JSON file to write the results to')
+    parser.add_argument('--baseline', default=BASELINE, help='JSON file with the results to compare with')
+    parser.add_argument('--threshold', type=float, default=0.2, help='Relative p50 increase reported as regression')
+    parser.add_argument('--save-baseline', action='store_true', help='Store the results as the new baseline')
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    baseline_path = os.path.abspath(args.baseline)
+    output_path = args.output and os.path.abspath(args.output)
+    # Nodes write their logs relative to the working directory
+    os.chdir(tempfile.mkdtemp())
+
+    results = {}
+    for group in args.only:
+        results.update(BENCHMARKS[group](args, rng))
+    report = {'meta': {'time': datetime.now(timezone.utc).isoformat(),
+                       'machine': describe_machine(),
+                       'arguments': {key: value for key, value in vars(args).items()
+                                     if key not in ('output', 'baseline', 'save_baseline')}},
+              'results': results}
+
+    baseline = {}
+    if os.path.exists(baseline_path) and not args.save_baseline:
+        with open(baseline_path, 'r') as file:
+            stored = json.load(file)
+        mismatch = baseline_mismatch(report['meta'], stored['meta'])
+        if mismatch:
+            print(f"Not comparing with {args.baseline}, which was recorded with another {', '.join(mismatch)}. "
+                  f"Run with --save-baseline to record a baseline for this machine.")
+        else:
+            baseline = stored['results']
+    regressions = compare(results, baseline, args.threshold)
+
+    for path in filter(None, (output_path, args.save_baseline and baseline_path)):
+        with open(path, 'w') as file:
+            json.dump(report, file, indent=2)
+            file.write('\n')
+    if regressions:
+        print(f"{len(regressions)} benchmarks regressed by more than {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Benchmark of the NDNNode transport
+
+- Compares the interest/data throughput of NDNNodes in the threaded mode (a thread per service and per
+  TCP connection) against NDNNodes sharing one AsyncEngine event loop.
+- One producer node answers interests for its sensors. Every consumer node sends interests to the
+  producer, and the time until all data packets arrive back at the consumers is measured.
+- Nodes are connected to each other directly, without discovery broadcasts.
+
+Example Usage: python3 benchmark_transport.py --consumers 4 --interests 200
+"""
+
+import argparse
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from AsyncEngine import AsyncEngine
+from NDNNode import NDNNode
+
+HOME_ID = 'bench_home'
+
+
+class BenchSensor:
+    def __init__(self, sensor_type):
+        self.sensor_type = sensor_type
+
+    def get_reading(self):
+        return 21.0
+
+
+def create_nodes(n_nodes, base_port, engine=None):
+    nodes = [NDNNode(f"{HOME_ID}/node_{i}", base_port + i, 0, ['temp'], [BenchSensor('temp')], engine)
+             for i in range(n_nodes)]
+    for node in nodes:
+        node.logger.setLevel(logging.WARNING)
+
+    # Connect every pair of nodes as trusted neighbours
+    for node in nodes:
+        for peer in nodes:
+            if peer is not node:
+                node.fib.add_entry(peer.node_name, ('127.0.0.1', peer.port))
+                node.peer_versions[peer.node_name] = peer.api_version
+                node.peer_keys[peer.node_name] = peer.public_key_pem
+    return nodes
+
+
+def start_threaded(nodes):
+    for node in nodes:
+        node.running = True
+        node.threads = [threading.Thread(target=node.listen_for_connections, daemon=True)]
+        node.threads[0].start()
+
+
+def start_async(nodes, engine):
+    for node in nodes:
+        node.running = True
+        engine.start_node(node, services=('connections',))
+
+
+def run_workload(nodes, n_interests, timeout):
+    producer, consumers = nodes[0], nodes[1:]
+    expected = n_interests * len(consumers)
+    received = []
+    peak_threads = [threading.active_count()]
+    done = threading.Event()
+    lock = threading.Lock()
+
+    def count_data(data_packet):
+        with lock:
+            received.append(data_packet['name'])
+            peak_threads[0] = max(peak_threads[0], threading.active_count())
+            if len(received) == expected:
+                done.set()
+
+    for consumer in consumers:
+        consumer.handle_data = count_data
+
+    start = time.perf_counter()
+    for _ in range(n_interests):
+        for consumer in consumers:
+            consumer.create_send_interest_packet(f"{producer.node_name}/temp", producer.node_name)
+    done.wait(timeout)
+    elapsed = time.perf_counter() - start
+
+    return len(received), elapsed, peak_threads[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the threaded NDNNode transport against AsyncEngine.')
+    parser.add_argument('--consumers', type=int, default=4, help='Number of consumer nodes')
+    parser.add_argument('--interests', type=int, default=200, help='Interests sent by every consumer')
+    parser.add_argument('--port', type=int, default=9100, help='First TCP port to use')
+    parser.add_argument('--timeout', type=float, default=60.0, help='Seconds to wait for all data packets')
+    args = parser.parse_args()
+
+    os.chdir(tempfile.mkdtemp())
+    os.makedirs(f"{HOME_ID}/device_logs")
+    n_nodes = args.consumers + 1
+    total = args.consumers * args.interests
+
+    print(f"{'mode':<10} {'received':>10} {'seconds':>9} {'interests/s':>12} {'peak threads':>13}")
+
+    nodes = create_nodes(n_nodes, args.port)
+    start_threaded(nodes)
+    time.sleep(0.5)
+    received, elapsed, n_threads = run_workload(nodes, args.interests, args.timeout)
+    for node in nodes:
+        node.running = False
+        node.close_connections()
+    time.sleep(0.5)
+    print(f"{'threaded':<10} {f'{received}/{total}':>10} {elapsed:>9.3f} {received / elapsed:>12.1f} {n_threads:>13}")
+
+    engine = AsyncEngine()
+    nodes = create_nodes(n_nodes, args.port + n_nodes, engine)
+    start_async(nodes, engine)
+    received, elapsed, n_threads = run_workload(nodes, args.interests, args.timeout)
+    for node in nodes:
+        node.running = False
+    engine.stop()
+    print(f"{'asyncio':<10} {f'{received}/{total}':>10} {elapsed:>9.3f} {received / elapsed:>12.1f} {n_threads:>13}")
+
+
+if __name__ == "__main__":
+    main()
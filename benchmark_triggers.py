@@ -0,0 +1,70 @@
+"""
+Benchmark of the trigger evaluation
+- Compares the previous evaluation of Device._actuate, which builds and evaluates an expression per trigger,
+  against the compiled RuleEngine, for the default triggers of a Device and for sensors with many triggers.
+- Both evaluations are checked to fire the same triggers for every reading.
+
+Example Usage: python3 benchmark_triggers.py --rules 10 100 1000 --readings 2000
+"""
+
+import argparse
+import random
+import timeit
+
+from RuleEngine import OPERATORS, RuleEngine
+
+DEFAULT_TRIGGERS = {
+    "temp":     [("<", 19, "heater", "on"),
+                 (">", 26, "heater", "off"),
+                 ("<", 19, "ac", "off"),
+                 (">", 26, "ac", "on")],
+    "humidity": [("<", 0.4, "humidifier", "on"),
+                 (">", 0.5, "humidifier", "off")],
+    "motion":   [("<", 1, "lights", "off"),
+                 (">", 0, "lights", "on")]
+}
+
+
+def fired_by_eval(triggers, sensor_type, reading):
+    fired = []
+    if sensor_type in triggers:
+        for (comparer, value, apparatus, effect) in triggers[sensor_type]:
+            compare_string = f"{reading} {comparer} {value}"
+            if eval(compare_string):
+                fired.append((apparatus, effect))
+    return fired
+
+
+def random_triggers(n_rules, rng):
+    return {"temp": [(rng.choice(list(OPERATORS)), round(rng.uniform(-10, 40), 1),
+                      f"apparatus_{i}", rng.choice(["on", "off"])) for i in range(n_rules)]}
+
+
+def measure(label, triggers, readings):
+    rules = RuleEngine(triggers)
+    for sensor_type, reading in readings:
+        assert rules.fired(sensor_type, reading) == fired_by_eval(triggers, sensor_type, reading)
+
+    eval_us = 1e6 * timeit.timeit(lambda: [fired_by_eval(triggers, s, r) for s, r in readings], number=1) / len(readings)
+    rules_us = 1e6 * timeit.timeit(lambda: [rules.fired(s, r) for s, r in readings], number=1) / len(readings)
+    print(f"{label:<18} {len(rules):>6} {eval_us:>12.2f} {rules_us:>12.2f} {eval_us / rules_us:>8.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark eval() triggers against the compiled RuleEngine.')
+    parser.add_argument('--rules', type=int, nargs='+', default=[10, 100, 1000], help='Triggers of one sensor')
+    parser.add_argument('--readings', type=int, default=2000, help='Readings evaluated per rule set')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    print(f"{'rule set':<18} {'rules':>6} {'eval (us)':>12} {'rules (us)':>12} {'speedup':>9}")
+    readings = [(rng.choice(list(DEFAULT_TRIGGERS)), round(rng.uniform(0, 30), 3)) for _ in range(args.readings)]
+    measure('default triggers', DEFAULT_TRIGGERS, readings)
+    for n_rules in args.rules:
+        readings = [("temp", round(rng.uniform(-10, 40), 3)) for _ in range(args.readings)]
+        measure(f'{n_rules} random', random_triggers(n_rules, rng), readings)
+
+
+if __name__ == "__main__":
+    main()
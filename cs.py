@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""
+Content Store Class
+
+Caches data packets by data name, so interests for recently seen data are
+answered without forwarding them.
+
+- The store is bounded by a number of entries and by the total size of the
+  cached data. When either limit is exceeded, the least recently used entries
+  are evicted.
+- Every entry has a freshness period, which depends on the sensor type of its
+  data name (the last name component), so fast changing readings such as
+  motion expire sooner than slowly changing ones such as CO2.
+- Stale entries are not purged by a timer; they expire lazily when they are
+  looked up or when they reach the least recently used end of the store.
+"""
+
+# Imports
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_FRESHNESS = 10.0  # Seconds for data names without a freshness period of their own
+FRESHNESS_PERIODS = {
+    'motion': 1.0,
+    'light': 2.0,
+    'CO': 5.0,
+    'temp': 10.0,
+    'humidity': 10.0,
+    'CO2': 30.0,
+}
+
+
+class ContentStore:
+
+    def __init__(self, max_entries=1024, max_bytes=1024 * 1024, freshness_periods=None,
+                 default_freshness=DEFAULT_FRESHNESS):
+        """
+        Parameters
+        ----------
+        max_entries : int, optional
+            Maximum number of cached data names. The default is 1024.
+        max_bytes : int, optional
+            Maximum total size of the cached data in bytes. The default is 1 MiB.
+        freshness_periods : dict, optional
+            Seconds for which data stays fresh, keyed by full data name or by
+            sensor type. The default is FRESHNESS_PERIODS.
+        default_freshness : float, optional
+            Seconds for which data of any other name stays fresh.
+            The default is DEFAULT_FRESHNESS.
+
+        Returns
+        -------
+        None.
+
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.freshness_periods = FRESHNESS_PERIODS if freshness_periods is None else freshness_periods
+        self.default_freshness = default_freshness
+        self._entries = OrderedDict()  # data name -> (data, size, expiry time)
+        self._lock = threading.Lock()
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __contains__(self, data_name):
+        with self._lock:
+            entry = self._entries.get(data_name)
+            return entry is not None and entry[2] > time.monotonic()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, data_name, default=None):
+        """
+        Get fresh data and mark it as recently used.
+
+        Parameters
+        ----------
+        data_name : str
+            Name of the data.
+        default : optional
+            Returned if the data is not cached or is stale. The default is None.
+
+        Returns
+        -------
+        The cached data or default.
+
+        """
+        with self._lock:
+            entry = self._entries.get(data_name)
+            if entry is None:
+                self.misses += 1
+                return default
+            if entry[2] <= time.monotonic():
+                self._remove(data_name)
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._entries.move_to_end(data_name)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, data_name, data, freshness=None):
+        """
+        Cache data, evicting the least recently used entries if the store is full.
+
+        Parameters
+        ----------
+        data_name : str
+            Name of the data.
+        data : str or bytes
+            Data to cache.
+        freshness : float, optional
+            Seconds for which the data stays fresh. The default is the
+            freshness period of the data name.
+
+        Returns
+        -------
+        bool
+            Whether the data was cached. Data larger than max_bytes is not.
+
+        """
+        if freshness is None:
+            freshness = self.freshness_period(data_name)
+        size = len(data.encode('utf-8')) if isinstance(data, str) else len(data)
+
+        with self._lock:
+            self._remove(data_name)
+            if size > self.max_bytes or freshness <= 0:
+                return False
+            self._entries[data_name] = (data, size, time.monotonic() + freshness)
+            self.size_bytes += size
+
+            now = time.monotonic()
+            while len(self._entries) > self.max_entries or self.size_bytes > self.max_bytes:
+                name, (_, _, expiry) = next(iter(self._entries.items()))
+                self._remove(name)
+                if expiry <= now:
+                    self.expirations += 1
+                else:
+                    self.evictions += 1
+        return True
+
+    def freshness_period(self, data_name):
+        """
+        Get the freshness period of a data name, looked up by the full name
+        first and by its sensor type second.
+        """
+        freshness = self.freshness_periods.get(data_name)
+        if freshness is None:
+            freshness = self.freshness_periods.get(data_name.rsplit('/', 1)[-1], self.default_freshness)
+        return freshness
+
+    def purge_expired(self):
+        """
+        Remove all stale entries.
+
+        Returns
+        -------
+        int
+            Number of removed entries.
+
+        """
+        with self._lock:
+            now = time.monotonic()
+            expired = [name for name, (_, _, expiry) in self._entries.items() if expiry <= now]
+            for name in expired:
+                self._remove(name)
+            self.expirations += len(expired)
+        return len(expired)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size_bytes = 0
+
+    def get_stats(self):
+        """
+        Get statistics of the content store.
+
+        Returns
+        -------
+        dict
+            Number of entries, their total size in bytes and the number of
+            hits, misses, evictions and expirations.
+
+        """
+        with self._lock:
+            return {'entries': len(self._entries),
+                    'bytes': self.size_bytes,
+                    'hits': self.hits,
+                    'misses': self.misses,
+                    'evictions': self.evictions,
+                    'expirations': self.expirations}
+
+    def _remove(self, data_name):
+        entry = self._entries.pop(data_name, None)
+        if entry is not None:
+            self.size_bytes -= entry[1]
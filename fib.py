@@ -9,21 +9,64 @@ Forwarding Information Base Class
 Stores following information about peers in the network:
 - Address as tuple of IP address and port
 - Distance vectors to other peers in network
+
+The distance vector table is a square NumPy array indexed by integer node IDs.
+Entry [dest, owner] holds the distance from node 'owner' to node 'dest', so the
+column of this node is its own distance vector and the column of a neighbour is
+the last vector received from it. IDs of removed nodes are recycled and the
+array grows by doubling, so updates only touch the rows and columns involved.
+
+Neighbours are also indexed in a NameTree by the components of their names,
+so the longest prefix match of a data name is a single walk down the tree.
+
+Routes to the data of a known producer are ranked by cost: the number of hops
+to the producer via a neighbour, times the smoothed round trip time per hop
+measured through that neighbour, divided by the fraction of interests it did
+not fail. Only neighbours at most one hop further from the producer than the
+shortest route are considered, so a route never leads back through this node.
+Neighbours that were never tried are ranked first, so every route is measured, and
+the first route is swapped with another one at random for a small fraction of
+the lookups, so that the round trip times of all routes stay up to date and
+traffic moves back to neighbours that are no longer busy.
+Names without a known producer fall back to the longest prefix match.
+
+Resolved routes are memoised per data name. Every change of the routing state,
+including the distance vector of any neighbour, and every change of the cost
+of a neighbour by more than a quarter, bumps the routing epoch, which
+invalidates all memoised routes at once.
 """
 
 # Imports
-import pandas as pd
+import random
+import threading
+from collections import OrderedDict
+
 import numpy as np
 
 
 class ForwardingInfoBase:
 
-    def __init__(self, node_name):
+    _INITIAL_CAPACITY = 16
+    RTT_GAIN = 0.125  # Weight of a new sample in the smoothed round trip time and failure rate
+    MAX_FAILURE_RATE = 0.9
+    RERANK_THRESHOLD = 0.25  # Relative change of the cost of a neighbour that re-ranks the routes
+
+    def __init__(self, node_name, route_cache_size=1024, exploration=0.05, stretch=1):
         """
         Parameters
         ----------
         node_name : str
             Name of the node to which this FIB belongs to.
+        route_cache_size : int, optional
+            Maximum number of data names whose routes are memoised.
+            The default is 1024.
+        exploration : float, optional
+            Fraction of lookups for which the first route is swapped with
+            another one at random. The default is 0.05.
+        stretch : int, optional
+            Number of hops by which a route may be longer than the shortest
+            route to the producer to be ranked by cost. Longer routes are only
+            tried after the ranked ones. The default is 1.
 
         Returns
         -------
@@ -32,10 +75,31 @@ class ForwardingInfoBase:
         """
         self.name = node_name
         self.peer_list = {}
+        self.node_ids = {}
+        self._node_order = {}
+        self._free_ids = []
+        self._next_id = 0
+        self._next_order = 0
+        self._nbr_mask = np.zeros(self._INITIAL_CAPACITY, dtype=bool)
+        self.name_tree = NameTree()
         self.dv_table = self._init_distance_vector()
+        self._self_id = self.node_ids[self.name]
+        self.epoch = 0
+        self.route_cache_size = route_cache_size
+        self._route_cache = OrderedDict()
+        self._routes_via = {}  # neighbour name -> data names whose cached routes are ranked by its cost
+        self._cost_version = 0
+        self._cache_lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.exploration = exploration
+        self.stretch = stretch
+        self.explorations = 0
+        self._random = random.random
+        self._neighbour_stats = {}  # neighbour name -> _NeighbourStats
 
     # Public Methods:
-        
+
     def __contains__(self, item):
         return item in self.peer_list
 
@@ -57,10 +121,13 @@ class ForwardingInfoBase:
             (Note: This always returns true and is kept for consistency)
 
         """
+        if self.peer_list.get(node_name) != node_addr:
+            self._new_epoch()
         self.peer_list[node_name] = node_addr
+        self.name_tree.insert(node_name)
         self._add_peer_to_distance_vector(node_name, set_as_nbr=True)
         dv_changed = self._calculate_distance_vector()
-        
+
         return True
 
     def remove_entry(self, node_name):
@@ -80,15 +147,18 @@ class ForwardingInfoBase:
 
         """
         del self.peer_list[node_name]
+        self._neighbour_stats.pop(node_name, None)
+        self._new_epoch()
+        self.name_tree.remove(node_name)
         self._drop_peer_from_distance_vector(node_name)
         dv_changed = self._calculate_distance_vector()
-        
+
         return True
 
     def update_distance_vector(self, node_name, node_vector):
         """
         Update the FIB with a new distance vector from a neighbouring node.
-        The of the neighbour distance vector is overwritten by the new one 
+        The of the neighbour distance vector is overwritten by the new one
         and then the own distance vector is recalculated.
 
         Parameters
@@ -101,18 +171,25 @@ class ForwardingInfoBase:
         Returns
         -------
         dv_changed : bool
-            Returns True if own distance vector changed.
+            Returns True if own distance vector changed or the vector of the
+            neighbour added nodes to the table, so that neighbours only need
+            the own vector again if it holds news for them. Before the NumPy
+            engine this returned True whenever the own vector differed from
+            the costs to the neighbours, i.e. for almost every update.
 
         """
-        self._update_peer_distance_vector(node_name, node_vector)
-        dv_changed = self._calculate_distance_vector()
-        
-        return dv_changed
+        nodes_added = self._update_peer_distance_vector(node_name, node_vector)
+        dv_changed = self._relax_distance_vector(self.node_ids[node_name])
+
+        return dv_changed or nodes_added
 
     def get_routes(self, data_name):
         """
         Get routes that lead to data_name. Returns a list of addresses in order
-        of longest prefix matches and shortest number of hops.
+        of cost if the producer of the data is known, and otherwise in order of
+        longest prefix matches and shortest number of hops.
+        Routes are served from the route cache while the routing epoch is unchanged
+        and the cost of none of the ranked neighbours changed.
 
         Parameters
         ----------
@@ -125,65 +202,315 @@ class ForwardingInfoBase:
             List of address of the peer as a tuple of IP address and port number.
 
         """
-        # Distance vector to neighbours
-        dist_nbr = self.dv_table[[idx in self.peer_list.keys() for idx in self.dv_table.index]][self.name]
-        
-        # Add / to end of name to get correct matching
-        dist_nbr_fmt = dist_nbr.add_suffix('/')
-        
-        # Use a copy of peer list to keep track of which peers have already been identified as routes
-        peer_list_cpy = self.peer_list.copy()
-        
-        # Get list of addresses in order of longest prefix matches and shortest hops
-        addr_to_try = []
-        split = data_name.split('/')
-        for i in range(0, len(split)):
-            # Get prefix of data name to check for
-            prefix = '/'.join(split[:len(split)-i])
-            if not prefix.endswith('/'):
-                prefix += '/'
-                
-            # Otherwise would select all the nodes starting with '/' as addresses to try
-            if prefix == '/':
-                break
-        
-            # Sort in ascending order by number of hops
-            for index, value in dist_nbr[dist_nbr_fmt.index.str.startswith(prefix)].sort_values().items():
-                # Get from peer list and add to results list
-                addr = peer_list_cpy.pop(index, None)
-                if addr is not None:
-                    addr_to_try.append((index, addr))
-                if not peer_list_cpy:
-                    break
-                    
-            if not peer_list_cpy:
-                    break
-        
+        with self._cache_lock:
+            epoch = self.epoch
+            cost_version = self._cost_version
+            cached = self._route_cache.get(data_name)
+            if cached is not None and cached[0] == epoch:
+                self._route_cache.move_to_end(data_name)
+                self.cache_hits += 1
+                addr_to_try = list(cached[1])
+                if cached[2] > 1 and self._random() < self.exploration:
+                    self._explore(addr_to_try, cached[2])
+                return addr_to_try
+            self.cache_misses += 1
+
+        addr_to_try, n_ranked = self._resolve_routes(data_name)
+
+        with self._cache_lock:
+            # Routes resolved while the routing state changed are not cached
+            if self.epoch == epoch and self._cost_version == cost_version:
+                self._uncache(data_name)
+                self._route_cache[data_name] = (epoch, addr_to_try, n_ranked)
+                for name, _ in addr_to_try[:n_ranked]:
+                    self._routes_via.setdefault(name, set()).add(data_name)
+                if len(self._route_cache) > self.route_cache_size:
+                    self._uncache(next(iter(self._route_cache)))
+
+        addr_to_try = list(addr_to_try)
+        if n_ranked > 1 and self._random() < self.exploration:
+            self._explore(addr_to_try, n_ranked)
         return addr_to_try
-    
+
+    def record_rtt(self, neighbour, data_name, rtt):
+        """
+        Record the time from sending an interest to a neighbour until its data
+        or NACK arrived from that neighbour, which also counts as a success.
+
+        Parameters
+        ----------
+        neighbour : str
+            Name of the neighbour the interest was sent to.
+        data_name : str
+            Name of the requested data.
+        rtt : float
+            Round trip time in seconds.
+
+        Returns
+        -------
+        None.
+
+        """
+        stats = self._neighbour_stats.get(neighbour)
+        if stats is None:
+            if neighbour not in self.peer_list:
+                return
+            stats = self._neighbour_stats.setdefault(neighbour, _NeighbourStats())
+        # Round trip times of producers at different distances are compared per hop
+        producer_id = self._find_producer(data_name)
+        hops = 1.0
+        if producer_id is not None and neighbour in self.node_ids:
+            distance = self.dv_table[producer_id, self.node_ids[neighbour]]
+            if distance < np.inf:
+                hops += float(distance)
+        sample = rtt / hops
+        gain = self.RTT_GAIN
+        stats.hop_rtt = sample if stats.hop_rtt is None else stats.hop_rtt + gain * (sample - stats.hop_rtt)
+        stats.failure_rate -= gain * stats.failure_rate
+        stats.samples += 1
+        self._update_cost(neighbour, stats)
+
+    def record_failure(self, neighbour):
+        """
+        Record an interest that could not be sent to a neighbour, or that the
+        neighbour did not answer within its lifetime.
+
+        Parameters
+        ----------
+        neighbour : str
+            Name of the neighbour the interest was sent to.
+
+        Returns
+        -------
+        None.
+
+        """
+        stats = self._neighbour_stats.get(neighbour)
+        if stats is None:
+            if neighbour not in self.peer_list:
+                return
+            stats = self._neighbour_stats.setdefault(neighbour, _NeighbourStats())
+        stats.failure_rate += self.RTT_GAIN * (self.MAX_FAILURE_RATE - stats.failure_rate)
+        stats.failures += 1
+        self._update_cost(neighbour, stats)
+
+    def get_neighbour_stats(self):
+        """
+        Get the smoothed round trip time per hop, the failure rate and the
+        number of round trip samples and failures of every measured neighbour.
+
+        Returns
+        -------
+        dict
+            Statistics by neighbour name.
+
+        """
+        return {name: {'hop_rtt': stats.hop_rtt,
+                       'failure_rate': stats.failure_rate,
+                       'samples': stats.samples,
+                       'failures': stats.failures}
+                for name, stats in list(self._neighbour_stats.items())}
+
+    def get_cache_stats(self):
+        """
+        Get statistics of the route cache.
+
+        Returns
+        -------
+        dict
+            Routing epoch, number of cached names, hits and misses of the cache.
+
+        """
+        return {'epoch': self.epoch,
+                'size': len(self._route_cache),
+                'hits': self.cache_hits,
+                'misses': self.cache_misses}
+
     def get_distance_vector(self):
-        return self.dv_table[self.name].to_dict()
-    
+        ids = list(self.node_ids.values())
+        return dict(zip(self.node_ids, self.dv_table[ids, self._self_id].tolist()))
+
     def get_peers(self):
         return self.peer_list.keys()
-    
+
     # -------------------------------------------------------------------------
     # Private Methods:
-    
+
+    def _resolve_routes(self, data_name):
+        """
+        Ranks the routes to the producer of data_name by cost, or looks them up
+        in the name tree if the producer is unknown or unreachable, bypassing
+        the route cache.
+
+        Parameters
+        ----------
+        data_name : str
+            Name of data that should be matched to a node.
+
+        Returns
+        -------
+        addr_to_try : List[(str, int)]
+            List of address of the peer as a tuple of IP address and port number.
+        n_ranked : int
+            Number of leading routes that were ranked by cost and can be
+            explored, 0 if the producer is unknown or unreachable.
+
+        """
+        producer_id = self._find_producer(data_name)
+        if producer_id is not None and producer_id != self._self_id:
+            addr_to_try, n_ranked = self._rank_by_cost(producer_id)
+            if addr_to_try:
+                return addr_to_try, n_ranked
+
+        own_dv = self.dv_table[:, self._self_id]
+
+        def rank(name):
+            # Shortest number of hops first, then in order of addition to the table
+            return own_dv[self.node_ids[name]], self._node_order[name]
+
+        addr_to_try = [(name, self.peer_list[name])
+                       for name in self.name_tree.longest_prefix_match(data_name, rank, len(self.peer_list))]
+
+        return addr_to_try, 0
+
+    def _rank_by_cost(self, producer_id):
+        """
+        Ranks the neighbours that lead to a producer by cost, the number of hops
+        via the neighbour times its round trip time per hop, divided by the
+        fraction of interests it did not fail. Neighbours whose route is longer
+        than the shortest one by more than the stretch follow as fallbacks,
+        by hops and then in order of addition to the table.
+
+        Parameters
+        ----------
+        producer_id : int
+            ID of the producer in the distance vector table.
+
+        Returns
+        -------
+        addr_to_try : List[(str, int)]
+            List of address of the peer as a tuple of IP address and port number,
+            empty if no neighbour leads to the producer.
+        n_ranked : int
+            Number of leading routes that were ranked by cost.
+
+        """
+        names = list(self.peer_list)
+        if not names:
+            return [], 0
+        hops = (self.dv_table[producer_id, [self.node_ids[name] for name in names]] + 1).tolist()
+        shortest = min(hops)
+        if shortest == np.inf:
+            return [], 0
+
+        # Routes that are longer by more than the stretch could lead back through this node,
+        # so they are only tried after all others and never explored
+        candidates = []
+        fallbacks = []
+        for name, hop_count in zip(names, hops):
+            if hop_count <= shortest + self.stretch:
+                candidates.append((name, hop_count))
+            else:
+                fallbacks.append((name, hop_count))
+        measured = [stats.hop_rtt for name, _ in candidates
+                    if (stats := self._neighbour_stats.get(name)) is not None and stats.hop_rtt is not None]
+        # Neighbours that failed without ever replying are assumed as fast as the fastest one
+        default_rtt = min(measured) if measured else 1.0
+
+        def rank(candidate):
+            name, hop_count = candidate
+            stats = self._neighbour_stats.get(name)
+            if stats is None:
+                # Neighbours that were never tried come first, so every route is measured once
+                return 0.0, hop_count, self._node_order[name]
+            hop_rtt = default_rtt if stats.hop_rtt is None else stats.hop_rtt
+            return hop_count * hop_rtt / (1 - stats.failure_rate), hop_count, self._node_order[name]
+
+        def rank_fallback(fallback):
+            name, hop_count = fallback
+            return hop_count, self._node_order[name]
+
+        ranked = sorted(candidates, key=rank) + sorted(fallbacks, key=rank_fallback)
+        return [(name, self.peer_list[name]) for name, _ in ranked], len(candidates)
+
+    def _find_producer(self, data_name):
+        """
+        Gets the ID of the longest known node name that data_name starts with,
+        e.g. of 'home_1/room_0_device' for 'home_1/room_0_device/temp', or None.
+        """
+        node_ids = self.node_ids
+        name = data_name
+        while name:
+            node_id = node_ids.get(name)
+            if node_id is not None:
+                return node_id
+            name = name[:name.rfind('/')] if '/' in name else ''
+        return None
+
+    def _explore(self, addr_to_try, n_ranked):
+        """
+        Swaps the first route with another one of the n_ranked routes ranked by
+        cost at random, for the fraction of the lookups given by the exploration.
+        """
+        i = random.randrange(1, n_ranked)
+        addr_to_try[0], addr_to_try[i] = addr_to_try[i], addr_to_try[0]
+        self.explorations += 1
+
+    def _update_cost(self, neighbour, stats):
+        """
+        Drops the cached routes that were ranked with the cost per hop of a
+        neighbour if it changed by more than the threshold since then. Routes
+        of data names that do not lead through the neighbour stay cached.
+        """
+        cost = (1.0 if stats.hop_rtt is None else stats.hop_rtt) / (1 - stats.failure_rate)
+        ranked_cost = stats.ranked_cost
+        if ranked_cost is None or abs(cost - ranked_cost) > self.RERANK_THRESHOLD * ranked_cost:
+            stats.ranked_cost = cost
+            with self._cache_lock:
+                self._cost_version += 1
+                for data_name in self._routes_via.pop(neighbour, ()):
+                    self._uncache(data_name)
+
+    def _uncache(self, data_name):
+        """
+        Removes the routes of data_name from the route cache and from the data
+        names cached per neighbour. Must be called under the lock of the route cache.
+        """
+        cached = self._route_cache.pop(data_name, None)
+        if cached is not None:
+            for name, _ in cached[1][:cached[2]]:
+                data_names = self._routes_via.get(name)
+                if data_names is not None:
+                    data_names.discard(data_name)
+
+    def _new_epoch(self):
+        """
+        Starts a new routing epoch, under the lock of the route cache so that
+        routes resolved before a change are never cached under the new epoch.
+        """
+        with self._cache_lock:
+            self.epoch += 1
+
     def _init_distance_vector(self):
         """
         Initialises the distance vector table with this node as the single entry.
 
         Returns
         -------
-        pd.DataFrame
+        np.ndarray
             Initialised distance vector table.
         """
-        return pd.DataFrame(columns=[self.name], index=[self.name], data=[[0]])
+        self.dv_table = np.full((self._INITIAL_CAPACITY, self._INITIAL_CAPACITY), np.inf)
+        node_id = self._allocate_id(self.name)
+        self.dv_table[node_id, node_id] = 0
+
+        return self.dv_table
 
     def _calculate_distance_vector(self):
         """
         Performs the Bellman-Ford algorithm to determine the node's distance vector.
+        Costs to neighbours in peer list are 1, costs to self is 0 and all other
+        costs are inf, so only the columns of neighbours need to be considered.
 
         Returns
         -------
@@ -191,26 +518,72 @@ class ForwardingInfoBase:
             States whether the distance vector of this node changed.
 
         """
-        # Costs to neighbours in peer list is 1
-        # Costs to self is 0
-        # All other costs are inf
-        cost = pd.Series(data=np.concatenate([[0], np.ones(len(self.peer_list.keys()))]), 
-                  index=[self.name]+list(self.peer_list.keys()), 
-                  name='cost')
-        
+        nbr_ids = [self.node_ids[name] for name in self.peer_list]
+        if not nbr_ids:
+            return False
+
         # Bellman-Ford Algorithm
-        dv = []
-        for node, distance in self.dv_table.iterrows():
-            tmp = pd.concat([cost, distance], axis=1).fillna(np.inf)
-            dv.append(min(tmp['cost'] + tmp[node]))
-        self.dv_table[self.name] = dv
-        
-        return dv != list(cost)
+        own_dv = self.dv_table[:, self._self_id]
+        via_nbr = self.dv_table[:, nbr_ids].min(axis=1) + 1
+        improved = via_nbr < own_dv
+        np.minimum(own_dv, via_nbr, out=own_dv)
+
+        return self._commit_distance_vector(improved)
+
+    def _relax_distance_vector(self, peer_id):
+        """
+        Performs the Bellman-Ford step for a single changed neighbour column.
+        The own distance vector already accounts for every other neighbour, so
+        this gives the same result as a full recalculation.
+
+        Parameters
+        ----------
+        peer_id : int
+            ID of the neighbour whose distance vector changed.
+
+        Returns
+        -------
+        bool
+            States whether the distance vector of this node changed.
+
+        """
+        own_dv = self.dv_table[:, self._self_id]
+        via_nbr = self.dv_table[:, peer_id] + 1
+        improved = via_nbr < own_dv
+        np.minimum(own_dv, via_nbr, out=own_dv)
+
+        return self._commit_distance_vector(improved)
+
+    def _commit_distance_vector(self, changed):
+        """
+        Starts a new routing epoch if the own distance vector changed and
+        resorts the neighbours in the name tree if the number of hops to any
+        of them changed.
+
+        Parameters
+        ----------
+        changed : np.ndarray
+            Boolean mask of the entries of the own distance vector that changed.
+
+        Returns
+        -------
+        bool
+            States whether the distance vector of this node changed.
+
+        """
+        if not changed.any():
+            return False
+
+        self._new_epoch()
+        if (changed & self._nbr_mask).any():
+            self.name_tree.invalidate()
+
+        return True
 
     def _add_peer_to_distance_vector(self, name, set_as_nbr=False):
         """
         Adds a new node to the distance vector table with all distances initialised
-        as inf. If a node is considered as a neighbour, then the distance between 
+        as inf. If a node is considered as a neighbour, then the distance between
         this node and the new node is set to 1 hop.
 
         Parameters
@@ -226,15 +599,20 @@ class ForwardingInfoBase:
         None.
 
         """
-        self.dv_table[name] = np.inf
-        self.dv_table.loc[name] = np.inf
-    
+        node_id = self.node_ids.get(name)
+        if node_id is None:
+            node_id = self._allocate_id(name)
+        else:
+            self.dv_table[node_id, :] = np.inf
+            self.dv_table[:, node_id] = np.inf
+
         # Set distance of node to itself as 0
-        self.dv_table.loc[name, name] = 0
-        
+        self.dv_table[node_id, node_id] = 0
+
         if set_as_nbr:
-            self.dv_table.loc[self.name, name] = 1
-            self.dv_table.loc[name, self.name] = 1
+            self.dv_table[self._self_id, node_id] = 1
+            self.dv_table[node_id, self._self_id] = 1
+            self._nbr_mask[node_id] = True
 
     def _drop_peer_from_distance_vector(self, name):
         """
@@ -250,11 +628,18 @@ class ForwardingInfoBase:
         None.
 
         """
-        self.dv_table = self.dv_table.drop(index=[name], columns=[name], errors='ignore')
+        node_id = self.node_ids.pop(name, None)
+        if node_id is not None:
+            del self._node_order[name]
+            self.dv_table[node_id, :] = np.inf
+            self.dv_table[:, node_id] = np.inf
+            self._nbr_mask[node_id] = False
+            self._free_ids.append(node_id)
 
     def _update_peer_distance_vector(self, peer_name, peer_vector):
         """
-        Overwrites distance vector of peer with new vector
+        Overwrites distance vector of peer with new vector, and starts a new
+        routing epoch if it changed
 
         Parameters
         ----------
@@ -265,14 +650,196 @@ class ForwardingInfoBase:
 
         Returns
         -------
-        None.
+        bool
+            States whether new nodes were added to the table.
 
         """
         # Add missing nodes to table
-        vector = pd.Series(peer_vector, name=peer_name)
-        for node in set(vector.index) - set(self.dv_table.index):
+        missing = [node for node in peer_vector if node not in self.node_ids]
+        for node in missing:
             self._add_peer_to_distance_vector(node)
-        
+
         # Replace distance vector in table with new distance vector
-        self.dv_table = self.dv_table.drop(columns=[peer_name], errors='ignore')
-        self.dv_table = pd.concat([self.dv_table, vector], axis=1).fillna(np.inf)
\ No newline at end of file
+        peer_id = self.node_ids[peer_name]
+        column = self.dv_table[:, peer_id]
+        previous = column.copy()
+        column[:] = np.inf
+        ids = [self.node_ids[node] for node in peer_vector]
+        column[ids] = list(peer_vector.values())
+
+        # Routes are ranked by the distances of the neighbours, so a changed column re-ranks them
+        if not np.array_equal(previous, column):
+            self._new_epoch()
+
+        return bool(missing)
+
+    def _allocate_id(self, name):
+        """
+        Assigns an integer ID to a node, reusing IDs of removed nodes and
+        growing the table if it is full.
+
+        Parameters
+        ----------
+        name : str
+            Name of the node.
+
+        Returns
+        -------
+        int
+            ID of the node in the distance vector table.
+
+        """
+        if self._free_ids:
+            node_id = self._free_ids.pop()
+        else:
+            node_id = self._next_id
+            self._next_id += 1
+            capacity = self.dv_table.shape[0]
+            if node_id >= capacity:
+                table = np.full((2 * capacity, 2 * capacity), np.inf)
+                table[:capacity, :capacity] = self.dv_table
+                self.dv_table = table
+                self._nbr_mask = np.concatenate([self._nbr_mask, np.zeros(capacity, dtype=bool)])
+
+        self.node_ids[name] = node_id
+        self._node_order[name] = self._next_order
+        self._next_order += 1
+        return node_id
+
+
+class _NeighbourStats:
+    __slots__ = ('hop_rtt', 'failure_rate', 'samples', 'failures', 'ranked_cost')
+
+    def __init__(self):
+        self.hop_rtt = None  # Smoothed round trip time per hop in seconds
+        self.failure_rate = 0.0  # Smoothed fraction of failed interests, at most MAX_FAILURE_RATE
+        self.samples = 0
+        self.failures = 0
+        self.ranked_cost = None  # Cost per hop when the routes were last re-ranked
+
+
+class NameTree:
+    """
+    Name tree of the neighbours in the FIB, indexed by the components of their
+    names (e.g. 'home_1/room_0_device' is stored under 'home_1' -> 'room_0_device').
+    Every tree node holds the neighbours in its subtree, so all neighbours whose
+    name starts with a given prefix are found at the end of a single walk.
+    """
+
+    class _Node:
+        __slots__ = ('children', 'names', 'ranked', 'version')
+
+        def __init__(self):
+            self.children = {}
+            self.names = set()
+            self.ranked = None
+            self.version = -1
+
+    def __init__(self):
+        self._root = self._Node()
+        self._version = 0
+
+    def insert(self, name):
+        """
+        Add a neighbour to the tree.
+
+        Parameters
+        ----------
+        name : str
+            Name of the neighbour.
+
+        Returns
+        -------
+        None.
+
+        """
+        node = self._root
+        for component in name.split('/'):
+            node = node.children.setdefault(component, self._Node())
+            node.names.add(name)
+            node.ranked = None
+
+    def remove(self, name):
+        """
+        Remove a neighbour from the tree and prune branches left empty.
+
+        Parameters
+        ----------
+        name : str
+            Name of the neighbour.
+
+        Returns
+        -------
+        None.
+
+        """
+        node = self._root
+        for component in name.split('/'):
+            child = node.children.get(component)
+            if child is None:
+                return
+            child.names.discard(name)
+            child.ranked = None
+            if not child.names:
+                del node.children[component]
+                return
+            node = child
+
+    def invalidate(self):
+        """
+        Mark the ranking of all neighbours as outdated, e.g. when the number of
+        hops to a neighbour changed.
+
+        Returns
+        -------
+        None.
+
+        """
+        self._version += 1
+
+    def longest_prefix_match(self, data_name, rank, limit):
+        """
+        Get neighbours whose names share a prefix with data_name, in order of
+        longest prefix matches and then by the given rank.
+
+        Parameters
+        ----------
+        data_name : str
+            Name of data that should be matched to a neighbour.
+        rank : callable
+            Sort key applied to the names of neighbours with equally long matches.
+        limit : int
+            Stop once this many neighbours have been found.
+
+        Returns
+        -------
+        matches : List[str]
+            Names of the matching neighbours.
+
+        """
+        # Walk down the tree, a prefix needs at least one non-empty component
+        path = []
+        node = self._root
+        named = False
+        for component in data_name.split('/'):
+            node = node.children.get(component)
+            if node is None:
+                break
+            named = named or component != ''
+            if named:
+                path.append(node)
+
+        matches = []
+        seen = set()
+        for node in reversed(path):
+            if node.ranked is None or node.version != self._version:
+                node.ranked = sorted(node.names, key=rank)
+                node.version = self._version
+            for name in node.ranked:
+                if name not in seen:
+                    seen.add(name)
+                    matches.append(name)
+            if len(matches) >= limit:
+                break
+
+        return matches
@@ -0,0 +1,118 @@
+"""
+Framing of packets sent over TCP connections
+- Every packet is sent as a frame: a 4 byte big-endian length header followed by the packet itself,
+  so one connection can carry any number of packets of any size.
+- FrameBuffer reassembles frames from a stream. Data is received directly into a preallocated buffer
+  (socket.recv_into or asyncio.BufferedProtocol), which only grows when a frame does not fit into it.
+- Nodes without framing send a single JSON packet per connection. Such a stream starts with '{', which
+  is never the first byte of a valid length header, and is handled as one packet when the stream ends.
+- Broadcasts are single UDP datagrams, which carry at most MAX_BROADCAST_SIZE bytes. Broadcasts that are
+  larger, e.g. the distance vectors of networks of thousands of nodes, are sent compressed with zlib, which
+  shrinks the repetitive node names about tenfold. Broadcasts that do not fit even then are refused.
+"""
+
+import struct
+import zlib
+
+HEADER = struct.Struct('!I')
+MAX_FRAME_SIZE = 16 * 1024 * 1024
+MAX_DATAGRAM_SIZE = 65535
+MAX_BROADCAST_SIZE = 65507  # Largest UDP payload over IPv4
+
+
+def frame(packet):
+    return HEADER.pack(len(packet)) + packet
+
+
+def encode_broadcast(packet):
+    """
+    Get the datagram of a JSON broadcast packet, compressed if it is too large for a datagram.
+    Raises ValueError if it does not fit into a datagram compressed either.
+    """
+    if len(packet) <= MAX_BROADCAST_SIZE:
+        return packet
+    compressed = zlib.compress(packet)
+    if len(compressed) > MAX_BROADCAST_SIZE:
+        raise ValueError(f"Broadcast of {len(packet)} bytes exceeds {MAX_BROADCAST_SIZE} bytes compressed")
+    return compressed
+
+
+def decode_broadcast(datagram):
+    """
+    Get the JSON packet of a datagram. JSON packets start with '{', zlib streams never do.
+    """
+    if datagram[:1] == b'{':
+        return datagram
+    decompressor = zlib.decompressobj()
+    packet = decompressor.decompress(datagram, MAX_FRAME_SIZE)
+    if decompressor.unconsumed_tail:
+        raise ValueError(f"Broadcast exceeds {MAX_FRAME_SIZE} bytes decompressed")
+    return packet
+
+
+class FrameBuffer:
+    def __init__(self, size=65536):
+        self._buffer = bytearray(size)
+        self._view = memoryview(self._buffer)
+        self._start = 0
+        self._end = 0
+        self.legacy = False
+
+    def get_buffer(self):
+        """
+        Get the free part of the buffer to receive data into.
+        """
+        if self._end == len(self._buffer):
+            self._reserve(self._end - self._start + 1)
+        return self._view[self._end:]
+
+    def buffer_updated(self, nbytes):
+        """
+        Mark nbytes of the free part of the buffer as received and return the completed packets.
+        Raises ValueError if the length header of a frame exceeds MAX_FRAME_SIZE.
+        """
+        self._end += nbytes
+        packets = []
+        while not self.legacy and self._end - self._start >= HEADER.size:
+            if self._buffer[self._start] == ord('{'):
+                self.legacy = True
+                break
+
+            length, = HEADER.unpack_from(self._buffer, self._start)
+            if length > MAX_FRAME_SIZE:
+                raise ValueError(f"Frame of {length} bytes exceeds maximum of {MAX_FRAME_SIZE} bytes")
+
+            frame_end = self._start + HEADER.size + length
+            if frame_end > self._end:
+                # Make sure the rest of the frame fits into the buffer
+                self._reserve(HEADER.size + length)
+                break
+
+            packets.append(bytes(self._view[self._start + HEADER.size:frame_end]))
+            self._start = frame_end
+
+        if self._start == self._end:
+            self._start = self._end = 0
+        return packets
+
+    def eof(self):
+        """
+        Return the packet of an unframed stream once the stream has ended.
+        """
+        if self.legacy and self._end > self._start:
+            packet = bytes(self._view[self._start:self._end])
+            self._start = self._end = 0
+            return [packet]
+        return []
+
+    def _reserve(self, size):
+        # Move the partial frame to the front of the buffer and grow the buffer if it is still too small
+        if self._start + size <= len(self._buffer):
+            return
+        pending = bytes(self._view[self._start:self._end])
+        if size > len(self._buffer):
+            self._buffer = bytearray(max(size, 2 * len(self._buffer)))
+            self._view = memoryview(self._buffer)
+        self._view[:len(pending)] = pending
+        self._start = 0
+        self._end = len(pending)
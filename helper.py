@@ -3,11 +3,23 @@
 Packet building and decoding helper
 - In order to decouple some logic from the NDNNode and make it less lengthy. 
   Functionalities of formatting json packets and decoding it are put in this class.  
+- API version v2 sends packets as JSON. API version v3 sends interest and data packets in a binary
+  encoding to peers that announced v3 in their discovery broadcast, and JSON to all other peers.
 """
 
-from datetime import datetime, timezone
+import struct
+from datetime import datetime, timedelta, timezone
 
-API_VERSION = 'v2'
+API_VERSION = 'v3'
+BINARY_API_VERSION = 'v3'
+
+# Binary packet: format version (1 byte), packet type (1 byte), time stamp in microseconds since the
+# epoch (8 bytes), lengths of sender, destination and name (2 bytes each) and of data (4 bytes),
+# followed by sender, destination and name encoded as UTF-8 and the raw (encrypted) data.
+BINARY_FORMAT_VERSION = 3
+BINARY_HEADER = struct.Struct('!BBqHHHI')
+BINARY_PACKET_TYPES = ('interest', 'data')
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
 
 def build_packet(packet_type, sender, destination, name, data):
     current_time_utc = datetime.now(timezone.utc)
@@ -34,6 +46,51 @@ def build_broadcast_packet(packet_type, name, data, api_version):
     return json_packet
 
 
+def encode_binary_packet(json_packet, data):
+    """
+    Encode a packet built by build_packet in the binary format, with data
+    as raw bytes instead of the data field of the packet.
+    """
+    sender = json_packet['sender'].encode('utf-8')
+    destination = json_packet['destination'].encode('utf-8')
+    name = json_packet['name'].encode('utf-8')
+    time_stamp = json_packet['time_stamp']
+    if isinstance(time_stamp, str):
+        time_stamp = (datetime.fromisoformat(time_stamp) - EPOCH) // timedelta(microseconds=1)
+    header = BINARY_HEADER.pack(BINARY_FORMAT_VERSION, BINARY_PACKET_TYPES.index(json_packet['type']),
+                                time_stamp, len(sender), len(destination), len(name), len(data))
+    return b''.join((header, sender, destination, name, data))
+
+
+def decode_binary_packet(packet):
+    """
+    Decode a binary packet into the same dict as build_packet. The time stamp is
+    kept in microseconds since the epoch and the data field is a memoryview of
+    the packet, so the (encrypted) data is not copied.
+    """
+    (format_version, type_id, time_stamp,
+     sender_len, destination_len, name_len, data_len) = BINARY_HEADER.unpack_from(packet)
+    if format_version != BINARY_FORMAT_VERSION or type_id >= len(BINARY_PACKET_TYPES):
+        raise ValueError(f"Unsupported binary packet version {format_version} or type {type_id}")
+    destination_start = BINARY_HEADER.size + sender_len
+    name_start = destination_start + destination_len
+    data_start = name_start + name_len
+    if len(packet) != data_start + data_len:
+        raise ValueError("Binary packet length does not match its header")
+
+    return {'type': BINARY_PACKET_TYPES[type_id],
+            'version': BINARY_API_VERSION,
+            'sender': str(packet[BINARY_HEADER.size:destination_start], 'utf-8'),
+            'destination': str(packet[destination_start:name_start], 'utf-8'),
+            'time_stamp': time_stamp,
+            'name': str(packet[name_start:data_start], 'utf-8'),
+            'data': memoryview(packet)[data_start:]}
+
+
+def is_binary_packet(packet):
+    return packet[0] == BINARY_FORMAT_VERSION
+
+
 def decode_broadcast_packet(packet):
     return (packet['type'], packet['status'], packet['node_name'],
             int(packet['peer_port']), packet['public_key_pem'], packet['sensor_types'].split(','))
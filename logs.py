@@ -0,0 +1,118 @@
+"""
+Logging of devices and their NDNNodes
+- A device and its node share one logger per device, which writes to <home_id>/device_logs/<device_id>.log.
+- Loggers do not write to their files themselves: a QueueHandler only puts the log records on the queue of
+  the home, and a QueueListener thread per home formats them and writes them to the files of all devices of
+  the home. Logging a message on the packet path therefore never waits for the disk.
+- Messages are formatted lazily: the arguments of logger.debug("... %s", value) are only formatted into the
+  message by the writer thread, and not at all if the level of the message is disabled. Arguments must not
+  be changed after they were logged. Payloads that are expensive to compute, e.g. a distance vector, are
+  guarded with logger.isEnabledFor(logging.DEBUG).
+- The level of all device loggers is set by set_level(), DEBUG by default. Queued records are written by
+  close_logs(), which is also called when the interpreter exits.
+
+Example Usage:
+    logger = get_device_logger("home_1", "room_0_device")
+    logger.debug("Sent %s '%s' to %s", packet_type, name, destination)
+"""
+
+import atexit
+import logging
+import logging.handlers
+import queue
+import threading
+
+LOG_FORMAT = "%(asctime)s.%(msecs)04d [%(levelname)s] %(message)s"
+DATE_FORMAT = "%H:%M:%S:%m"
+
+_level = logging.DEBUG
+_loggers = {}  # logger name -> logger of a device
+_homes = {}  # home id -> _HomeLog
+_lock = threading.Lock()
+
+
+def get_device_logger(home_id, device_id):
+    """
+    Get the logger of a device of a home, creating it and the writer of the home on first use.
+    """
+    name = f"{home_id}/{device_id}_logger"
+    with _lock:
+        logger = _loggers.get(name)
+        if logger is None:
+            home_log = _homes.get(home_id)
+            if home_log is None:
+                home_log = _homes[home_id] = _HomeLog()
+            logger = logging.getLogger(name)
+            logger.propagate = False
+            logger.setLevel(_level)
+            logger.addHandler(home_log.add_device(name, f"{home_id}/device_logs/{device_id}.log"))
+            _loggers[name] = logger
+        return logger
+
+
+def set_level(level):
+    """
+    Set the level of all device loggers, including the ones created later, e.g. logging.WARNING or 'INFO'.
+    """
+    global _level
+    with _lock:
+        _level = level
+        for logger in _loggers.values():
+            logger.setLevel(level)
+
+
+@atexit.register
+def close_logs():
+    """
+    Write the queued records of all homes and stop their writer threads.
+    """
+    with _lock:
+        home_logs = list(_homes.values())
+        _homes.clear()
+        for logger in _loggers.values():
+            logger.handlers.clear()
+        _loggers.clear()
+    for home_log in home_logs:
+        home_log.stop()
+
+
+class _HomeLog:
+    # Queue and writer thread of a home, with the file handler of every device of the home
+    def __init__(self):
+        self.queue = queue.SimpleQueue()
+        self.files = _DeviceFiles()
+        self.listener = logging.handlers.QueueListener(self.queue, self.files)
+        self.listener.start()
+
+    def add_device(self, logger_name, log_file):
+        handler = logging.FileHandler(log_file, delay=True)
+        handler.setFormatter(logging.Formatter(LOG_FORMAT, datefmt=DATE_FORMAT))
+        self.files.handlers[logger_name] = handler
+        return _LazyQueueHandler(self.queue)
+
+    def stop(self):
+        self.listener.stop()
+        for handler in list(self.files.handlers.values()):
+            handler.close()
+
+
+class _DeviceFiles(logging.Handler):
+    # Writes every record to the file of the device that logged it, on the writer thread
+    def __init__(self):
+        super().__init__()
+        self.handlers = {}  # logger name -> file handler
+
+    def handle(self, record):
+        handler = self.handlers.get(record.name)
+        if handler is not None:
+            handler.handle(record)
+
+
+class _LazyQueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        # The QueueHandler formats the message on the logging thread, this leaves it to the writer thread.
+        # Only tracebacks are rendered here, as the frames they refer to change once the exception is handled
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
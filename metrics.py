@@ -0,0 +1,262 @@
+"""
+Metrics of NDNNodes
+- Every node keeps a MetricsRegistry of counters, gauges and histograms, labelled with the node name:
+    1. Counters only go up, e.g. interests received or packets sent. Incrementing one by one is a single
+       call of a C iterator, which is atomic without taking a lock, and other amounts are summed in batches.
+       Counters that a table already keeps, e.g. the hits of the CS, are read from a function instead.
+    2. Gauges are read from a function when the metrics are collected, e.g. the occupancy of the PIT, so they
+       cost nothing on the packet path.
+    3. Histograms count observations, e.g. interest round trip times, in fixed exponential buckets. An
+       observation is only appended to a deque, and is sorted into its bucket by numpy in batches or when
+       the histogram is collected. Quantiles are estimated from the bucket counts.
+- A MetricsExporter collects the registries of all nodes of a process, and serves them over HTTP on
+  localhost in the Prometheus text format (/metrics) and as JSON (/metrics.json), and/or writes a JSON
+  snapshot file every interval. The file is replaced atomically, so readers never see a partial snapshot.
+
+Example Usage:
+    exporter = MetricsExporter([node.metrics for node in nodes], port=9100, snapshot_file="metrics.json")
+    exporter.start()
+"""
+
+import collections
+import http.server
+import itertools
+import json
+import math
+import os
+import threading
+import time
+
+import numpy as np
+
+# Seconds from 10 us to about 84 s, doubling from bucket to bucket
+LATENCY_BUCKETS = tuple(1e-5 * 2 ** i for i in range(24))
+# Routes per forwarded interest
+COUNT_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+BATCH = 256  # Amounts and observations kept before they are summed or sorted into buckets
+
+
+class Counter:
+    def __init__(self, name, description, function=None):
+        self.name = name
+        self.description = description
+        self.function = function
+        self._count = itertools.count()
+        self._reads = 0  # Values taken from the count by collect()
+        self._added = 0
+        self._pending = collections.deque()  # Amounts added but not summed yet
+        self._lock = threading.Lock()
+        # next() of itertools.count is a single call into C that holds the GIL throughout, so concurrent
+        # increments are never lost, and it is faster than a method taking a lock
+        self.inc = self._count.__next__
+
+    def add(self, amount):
+        self._pending.append(amount)
+        if len(self._pending) >= BATCH:
+            self._flush()
+
+    def collect(self):
+        if self.function is not None:
+            return self.function()
+        self._flush()
+        with self._lock:
+            value = next(self._count) - self._reads + self._added
+            self._reads += 1
+            return value
+
+    def _flush(self):
+        # Amounts appended meanwhile are left for the next flush
+        with self._lock:
+            popleft = self._pending.popleft
+            self._added += sum(popleft() for _ in range(len(self._pending)))
+
+
+class Gauge:
+    def __init__(self, name, description, function):
+        self.name = name
+        self.description = description
+        self.function = function
+
+    def collect(self):
+        return self.function()
+
+
+class Histogram:
+    def __init__(self, name, description, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(buckets)
+        self._bounds = np.array(self.buckets, dtype=float)
+        self._counts = np.zeros(len(self.buckets) + 1, dtype=np.int64)  # The last bucket is above all bounds
+        self._sum = 0.0
+        self._pending = collections.deque()
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        self._pending.append(value)
+        if len(self._pending) >= BATCH:
+            self._flush()
+
+    def collect(self):
+        """
+        Get the count and sum of the observations, the counts per bucket bound and the estimated p50, p90 and p99,
+        the upper bound of the bucket the quantile falls into.
+        """
+        self._flush()
+        with self._lock:
+            counts, total = self._counts.tolist(), self._sum
+        count = sum(counts)
+        result = {'count': count, 'sum': total,
+                  'buckets': dict(zip(map(str, self.buckets + (math.inf,)), counts))}
+        for quantile in (0.5, 0.9, 0.99):
+            result[f"p{round(quantile * 100)}"] = self._quantile(counts, quantile) if count else None
+        return result
+
+    def _flush(self):
+        # Observations appended meanwhile are left for the next flush
+        with self._lock:
+            popleft = self._pending.popleft
+            values = np.array([popleft() for _ in range(len(self._pending))], dtype=float)
+            if len(values):
+                self._counts += np.bincount(np.searchsorted(self._bounds, values), minlength=len(self._counts))
+                self._sum += float(values.sum())
+
+    def _quantile(self, counts, quantile):
+        rank = quantile * sum(counts)
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+            cumulative += bucket_count
+            if cumulative >= rank:
+                return bound
+        return math.inf
+
+
+class MetricsRegistry:
+    def __init__(self, node_name):
+        self.node_name = node_name
+        self._metrics = {}  # name -> metric, in the order they were registered
+
+    def counter(self, name, description='', function=None):
+        return self._register(name, lambda: Counter(name, description, function))
+
+    def gauge(self, name, function, description=''):
+        return self._register(name, lambda: Gauge(name, description, function))
+
+    def histogram(self, name, description='', buckets=LATENCY_BUCKETS):
+        return self._register(name, lambda: Histogram(name, description, buckets))
+
+    def collect(self):
+        """
+        Get the current value of every metric by name.
+        """
+        return {name: metric.collect() for name, metric in self._metrics.items()}
+
+    def __iter__(self):
+        return iter(self._metrics.values())
+
+    def _register(self, name, create):
+        # Registering a name twice returns the metric registered first
+        if name not in self._metrics:
+            self._metrics[name] = create()
+        return self._metrics[name]
+
+
+class MetricsExporter:
+    def __init__(self, registries, port=None, snapshot_file=None, interval=10.0, host='127.0.0.1'):
+        """
+        Export the metrics of registries, a list or a function returning the current list of registries.
+        """
+        self.registries = registries if callable(registries) else lambda: registries
+        self.port = port
+        self.snapshot_file = snapshot_file
+        self.interval = interval
+        self.host = host
+        self._server = None
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        if self.port is not None:
+            self._server = http.server.ThreadingHTTPServer((self.host, self.port), self._handler())
+            self._server.daemon_threads = True
+            self._threads.append(threading.Thread(target=self._server.serve_forever, daemon=True))
+        if self.snapshot_file is not None:
+            self._threads.append(threading.Thread(target=self._write_snapshots, daemon=True))
+        for t in self._threads:
+            t.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+        for t in self._threads:
+            t.join()
+        self._threads = []
+        if self.snapshot_file is not None:
+            self.write_snapshot()
+
+    def snapshot(self):
+        return {'time': time.time(),
+                'nodes': {registry.node_name: registry.collect() for registry in self.registries()}}
+
+    def write_snapshot(self):
+        temporary_file = f"{self.snapshot_file}.tmp"
+        with open(temporary_file, 'w') as file:
+            json.dump(self.snapshot(), file)
+        os.replace(temporary_file, self.snapshot_file)
+
+    def render(self):
+        """
+        Render the metrics of all registries in the Prometheus text format, one family per metric name.
+        """
+        families = {}  # name -> (metric, [(node name, value)])
+        for registry in self.registries():
+            for metric in registry:
+                families.setdefault(metric.name, (metric, []))[1].append((registry.node_name, metric.collect()))
+        lines = []
+        for name, (metric, values) in families.items():
+            kind = {Counter: 'counter', Gauge: 'gauge', Histogram: 'histogram'}[type(metric)]
+            lines.append(f"# HELP {name} {metric.description}")
+            lines.append(f"# TYPE {name} {kind}")
+            for node_name, value in values:
+                label = f'node="{node_name}"'
+                if kind != 'histogram':
+                    lines.append(f"{name}{{{label}}} {value}")
+                    continue
+                cumulative = 0
+                for bound, count in value['buckets'].items():
+                    cumulative += count
+                    le = '+Inf' if bound == 'inf' else bound
+                    lines.append(f'{name}_bucket{{{label},le="{le}"}} {cumulative}')
+                lines.append(f"{name}_sum{{{label}}} {value['sum']}")
+                lines.append(f"{name}_count{{{label}}} {value['count']}")
+        return "\n".join(lines) + "\n"
+
+    def _write_snapshots(self):
+        while not self._stop.wait(self.interval):
+            self.write_snapshot()
+
+    def _handler(self):
+        exporter = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == '/metrics':
+                    body, content_type = exporter.render().encode('utf-8'), 'text/plain; version=0.0.4'
+                elif self.path == '/metrics.json':
+                    body, content_type = json.dumps(exporter.snapshot()).encode('utf-8'), 'application/json'
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                # Scrapes are not logged
+                pass
+
+        return Handler
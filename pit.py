@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+"""
+Pending Interest Table Class
+
+Keeps track of the requesters waiting for data, so that data coming back can
+be returned to all of them.
+
+- Interests for the same data name are aggregated: only the first interest
+  creates an entry and is forwarded upstream, later ones are added to the
+  requesters of the pending entry.
+- Every entry has a lifetime, which is extended by every aggregated interest.
+  Entries whose lifetime ends are expired, so the requesters can be sent a NACK.
+  Entries that cannot be forwarded on any route are rejected, and their
+  requesters are sent a NACK right away.
+- Expiry runs on a hashed timer wheel: every entry is scheduled in the slot of
+  the tick at which it expires, and advancing the wheel only visits the slots
+  of the ticks that passed, rather than scanning the whole table.
+"""
+
+# Imports
+import threading
+import time
+
+INTEREST_LIFETIME = 4.0  # Seconds an interest waits for data before it expires
+
+
+class PendingInterestTable:
+
+    def __init__(self, lifetime=INTEREST_LIFETIME, tick=0.1, slots=128):
+        """
+        Parameters
+        ----------
+        lifetime : float, optional
+            Default lifetime of an interest in seconds. The default is INTEREST_LIFETIME.
+        tick : float, optional
+            Resolution of the timer wheel in seconds. The default is 0.1.
+        slots : int, optional
+            Number of slots of the timer wheel. Entries expiring more than
+            slots * tick seconds ahead stay in their slot for further turns.
+            The default is 128.
+
+        Returns
+        -------
+        None.
+
+        """
+        self.lifetime = lifetime
+        self.tick = tick
+        self._entries = {}
+        self._wheel = [set() for _ in range(slots)]
+        self._current_tick = int(time.monotonic() / tick)
+        self._lock = threading.Lock()
+        self.aggregated = 0
+        self.satisfied = 0
+        self.expired = 0
+        self.rejected = 0
+
+    def __contains__(self, data_name):
+        return data_name in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, data_name, requester, addr, lifetime=None):
+        """
+        Add a pending interest.
+
+        Parameters
+        ----------
+        data_name : str
+            Name of the requested data.
+        requester : str
+            Name of the node that sent the interest.
+        addr : tuple
+            Address of the requester, or None if this node is the requester.
+        lifetime : float, optional
+            Lifetime of the interest in seconds. The default is the lifetime
+            of the table.
+
+        Returns
+        -------
+        bool
+            Whether a new entry was created, i.e. the interest has to be
+            forwarded. False if it was aggregated into a pending entry.
+
+        """
+        expiry = time.monotonic() + (self.lifetime if lifetime is None else lifetime)
+        with self._lock:
+            entry = self._entries.get(data_name)
+            if entry is not None:
+                entry.requesters.add((requester, addr))
+                # The entry is rescheduled lazily when the wheel reaches its current slot
+                entry.expiry = max(entry.expiry, expiry)
+                self.aggregated += 1
+                return False
+
+            self._entries[data_name] = _Entry({(requester, addr)}, expiry)
+            self._schedule(data_name, expiry)
+            return True
+
+    def get(self, data_name):
+        """
+        Get the requesters of a pending entry as a set of (requester, addr) tuples, or None.
+        """
+        with self._lock:
+            entry = self._entries.get(data_name)
+            return None if entry is None else set(entry.requesters)
+
+    def pop(self, data_name):
+        """
+        Remove a pending entry that is satisfied by data.
+
+        Returns
+        -------
+        set or None
+            The (requester, addr) tuples of the entry, or None if there was no entry.
+
+        """
+        with self._lock:
+            entry = self._entries.pop(data_name, None)
+            if entry is None:
+                return None
+            self.satisfied += 1
+            return entry.requesters
+
+    def reject(self, data_name):
+        """
+        Remove a pending entry that could not be forwarded, without counting it as satisfied.
+
+        Returns
+        -------
+        set or None
+            The (requester, addr) tuples of the entry, or None if there was no entry.
+
+        """
+        with self._lock:
+            entry = self._entries.pop(data_name, None)
+            if entry is None:
+                return None
+            self.rejected += 1
+            return entry.requesters
+
+    def expire(self, now=None):
+        """
+        Advance the timer wheel and remove the entries whose lifetime ended.
+
+        Parameters
+        ----------
+        now : float, optional
+            Current time.monotonic(). The default is the current time.
+
+        Returns
+        -------
+        list
+            (data_name, requesters) tuples of the expired entries.
+
+        """
+        now = time.monotonic() if now is None else now
+        target_tick = int(now / self.tick)
+        expired = []
+        with self._lock:
+            # After a long pause every slot is visited only once
+            first_tick = max(self._current_tick + 1, target_tick - len(self._wheel) + 1)
+            for tick in range(first_tick, target_tick + 1):
+                slot = self._wheel[tick % len(self._wheel)]
+                names = list(slot)
+                slot.clear()
+                for data_name in names:
+                    entry = self._entries.get(data_name)
+                    if entry is None:
+                        continue
+                    if entry.expiry <= now:
+                        del self._entries[data_name]
+                        expired.append((data_name, entry.requesters))
+                    else:
+                        self._schedule(data_name, entry.expiry)
+            self._current_tick = max(self._current_tick, target_tick)
+            self.expired += len(expired)
+        return expired
+
+    def get_stats(self):
+        """
+        Get statistics of the pending interest table.
+
+        Returns
+        -------
+        dict
+            Number of pending entries and the number of aggregated
+            interests, satisfied entries, expired entries and entries
+            rejected for lack of routes.
+
+        """
+        with self._lock:
+            return {'entries': len(self._entries),
+                    'aggregated': self.aggregated,
+                    'satisfied': self.satisfied,
+                    'expired': self.expired,
+                    'rejected': self.rejected}
+
+    def _schedule(self, data_name, expiry):
+        # The slot of the first tick after the expiry, so the entry has expired once the wheel reaches it
+        tick = max(int(expiry / self.tick) + 1, self._current_tick + 1)
+        self._wheel[tick % len(self._wheel)].add(data_name)
+
+
+class _Entry:
+    __slots__ = ('requesters', 'expiry')
+
+    def __init__(self, requesters, expiry):
+        self.requesters = requesters
+        self.expiry = expiry
@@ -0,0 +1,356 @@
+# -*- coding: utf-8 -*-
+"""
+Forwarding Strategies
+
+Decide how an interest is forwarded over the routes the FIB returns for its
+data name, and which reply satisfies it.
+
+- A strategy sends an interest to up to fanout routes. With a hedge delay it
+  sends to one route first and to the next one every hedge delay while no
+  reply arrived; without one it sends to all of them at once. Routes that
+  cannot be sent on are replaced by the next route right away.
+  BEST_ROUTE (fanout 1) tries one route after the other, multicast(k) sends
+  to the top k routes at once and hedged(k, delay) staggers them.
+- The first data reply satisfies the interest, and later replies from the
+  other routes are suppressed as duplicates until the interest would have
+  expired. A NACK is held back while other routes may still return data,
+  and the route that sent it is replaced by the next one, as if it failed.
+- Strategies are chosen per name prefix in a StrategyChoiceTable, by the
+  longest prefix of the data name that a strategy was set for.
+"""
+
+# Imports
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ForwardingStrategy:
+
+    def __init__(self, fanout=1, hedge_delay=None):
+        """
+        Parameters
+        ----------
+        fanout : int, optional
+            Maximum number of routes an interest is sent on. The default is 1.
+        hedge_delay : float, optional
+            Seconds to wait for a reply before sending on the next route.
+            The default is None, sending on all routes at once.
+
+        Returns
+        -------
+        None.
+
+        """
+        self.fanout = max(1, fanout)
+        self.hedge_delay = hedge_delay
+
+    def __repr__(self):
+        if self.fanout == 1:
+            return 'best_route'
+        if self.hedge_delay:
+            return f"hedged:{self.fanout}:{self.hedge_delay}"
+        return f"multicast:{self.fanout}"
+
+
+BEST_ROUTE = ForwardingStrategy()
+
+
+def multicast(fanout):
+    return ForwardingStrategy(fanout)
+
+
+def hedged(fanout, hedge_delay):
+    return ForwardingStrategy(fanout, hedge_delay)
+
+
+def parse_strategy(spec):
+    """
+    Parse a strategy such as 'best_route', 'multicast:3' or 'hedged:2:0.05' (fanout and hedge delay in seconds).
+    """
+    kind, *params = spec.split(':')
+    if kind == 'best_route' and not params:
+        return BEST_ROUTE
+    if kind == 'multicast' and len(params) == 1:
+        return multicast(int(params[0]))
+    if kind == 'hedged' and len(params) == 2:
+        return hedged(int(params[0]), float(params[1]))
+    raise ValueError(f"Unknown forwarding strategy '{spec}'")
+
+
+def parse_strategy_choice(choice):
+    """
+    Parse a strategy for a name prefix such as 'home_1/room_3_device=hedged:2:0.05' into (prefix, strategy).
+    Without a prefix, e.g. 'multicast:2', the strategy is chosen for all names.
+    """
+    prefix, _, spec = choice.rpartition('=')
+    return prefix, parse_strategy(spec)
+
+
+class StrategyChoiceTable:
+
+    def __init__(self, default=BEST_ROUTE):
+        """
+        Parameters
+        ----------
+        default : ForwardingStrategy, optional
+            Strategy of names without a strategy of their own.
+            The default is BEST_ROUTE.
+
+        Returns
+        -------
+        None.
+
+        """
+        self._strategies = {'': default}  # name prefix -> strategy
+
+    def set(self, prefix, strategy):
+        """
+        Set the strategy of all names under a prefix, '' for all names.
+        """
+        self._strategies[prefix.strip('/')] = strategy
+
+    def unset(self, prefix):
+        prefix = prefix.strip('/')
+        if prefix:
+            self._strategies.pop(prefix, None)
+
+    def find(self, data_name):
+        """
+        Get the strategy of the longest prefix of data_name that a strategy was set for.
+        """
+        if len(self._strategies) == 1:
+            return self._strategies['']
+        components = data_name.split('/')
+        for i in range(len(components), 0, -1):
+            strategy = self._strategies.get('/'.join(components[:i]))
+            if strategy is not None:
+                return strategy
+        return self._strategies['']
+
+
+class Forwarder:
+    MAX_PARALLEL_SENDS = 4  # Threads that send on further routes at once with parallel sends
+
+    def __init__(self, send, call_later, lifetime, parallel_sends=False):
+        """
+        Parameters
+        ----------
+        send : callable
+            send(data_name, destination, dest_addr, on_failure) sends an
+            interest to a route and returns whether it was sent. If sending
+            fails later, on_failure is called instead.
+        call_later : callable
+            call_later(delay, callback) calls callback after delay seconds.
+        lifetime : float
+            Seconds for which duplicates of a reply are suppressed, the
+            lifetime of the interests.
+        parallel_sends : bool, optional
+            Whether sends block until the route accepted the interest, so
+            that sends on further routes are started on a pool of reused
+            threads instead of waiting for each other. The default is False.
+
+        Returns
+        -------
+        None.
+
+        """
+        self.strategies = StrategyChoiceTable()
+        self._send = send
+        self._call_later = call_later
+        self.lifetime = lifetime
+        self.parallel_sends = parallel_sends
+        self._attempts = OrderedDict()  # data name -> _Attempt, in order of expiry
+        self._lock = threading.Lock()
+        self._executor = None  # Threads of the parallel sends, started on the first one
+        self.hedges = 0
+        self.duplicates = 0
+        self.nacks_held = 0
+
+    def forward(self, data_name, routes, on_exhausted):
+        """
+        Forward an interest on the routes with the strategy of its name.
+
+        Parameters
+        ----------
+        data_name : str
+            Name of the requested data.
+        routes : list
+            (destination, address) tuples of the routes in order of preference.
+        on_exhausted : callable
+            Called if the interest could not be sent on any route.
+
+        Returns
+        -------
+        None.
+
+        """
+        strategy = self.strategies.find(data_name)
+        now = time.monotonic()
+        attempt = _Attempt(strategy, list(routes), on_exhausted, now + self.lifetime)
+        with self._lock:
+            self._expire(now)
+            replaced = self._attempts.pop(data_name, None)
+            if replaced is not None:
+                # The interest expired without a reply, its hedges are not sent anymore
+                replaced.done = True
+            self._attempts[data_name] = attempt
+        self._launch(data_name, attempt, 1 if strategy.hedge_delay else strategy.fanout)
+        self._check_exhausted(attempt)
+        if strategy.hedge_delay and strategy.fanout > 1:
+            self._call_later(strategy.hedge_delay, lambda: self._hedge(data_name, attempt))
+
+    def on_reply(self, data_name, nack, pending):
+        """
+        Decide whether a data reply or NACK satisfies a forwarded interest.
+
+        Parameters
+        ----------
+        data_name : str
+            Name of the data.
+        nack : bool
+            Whether the reply is a NACK.
+        pending : bool
+            Whether an interest in the data is pending in the PIT. Replies
+            to a satisfied interest still satisfy interests that are pending
+            again, e.g. interests of this node that were not forwarded.
+
+        Returns
+        -------
+        bool
+            True if the reply satisfies the interest or the interest was not
+            forwarded by the strategy. False if it is a duplicate of a reply
+            that satisfied it already, or a NACK held back while other routes
+            may still return the data.
+
+        """
+        with self._lock:
+            # A reply to an interest that expired is handled as if it was not forwarded
+            self._expire(time.monotonic())
+            attempt = self._attempts.get(data_name)
+            if attempt is None:
+                return True
+            if attempt.done:
+                if pending:
+                    return True
+                self.duplicates += 1
+                return False
+            attempt.in_flight = max(0, attempt.in_flight - 1)
+            if not nack:
+                attempt.done = True
+                return True
+            if not attempt.routes and attempt.in_flight == 0:
+                attempt.done = True
+                return True
+            # The route has no data, so like a failed route it is replaced by the next one right away
+            attempt.sent = max(0, attempt.sent - 1)
+            self.nacks_held += 1
+        self._launch(data_name, attempt, 1)
+        self._check_exhausted(attempt)
+        return False
+
+    def get_stats(self):
+        """
+        Get statistics of the forwarder.
+
+        Returns
+        -------
+        dict
+            Number of interests of which replies are tracked, and the number
+            of hedged sends, suppressed duplicates and held back NACKs.
+
+        """
+        with self._lock:
+            self._expire(time.monotonic())
+            return {'attempts': len(self._attempts),
+                    'hedges': self.hedges,
+                    'duplicates': self.duplicates,
+                    'nacks_held': self.nacks_held}
+
+    def close(self):
+        """
+        Stop the threads of the parallel sends once their sends are done.
+        They are started again by the next parallel send.
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    def _launch(self, data_name, attempt, count):
+        # Send on up to count more routes, replacing routes that cannot be sent on
+        for i in range(count):
+            with self._lock:
+                if attempt.done or not attempt.routes or attempt.sent >= attempt.strategy.fanout:
+                    break
+                destination, dest_addr = attempt.routes.pop(0)
+                attempt.sent += 1
+                attempt.in_flight += 1
+            if self.parallel_sends and i < count - 1:
+                # Only the last send blocks this thread
+                self._send_in_parallel(data_name, attempt, destination, dest_addr)
+            else:
+                self._send_on(data_name, attempt, destination, dest_addr)
+
+    def _send_in_parallel(self, data_name, attempt, destination, dest_addr):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.MAX_PARALLEL_SENDS, thread_name_prefix='forwarder')
+            executor = self._executor
+        try:
+            executor.submit(self._send_on, data_name, attempt, destination, dest_addr)
+        except RuntimeError:
+            # The forwarder was closed meanwhile
+            self._send_on(data_name, attempt, destination, dest_addr)
+
+    def _send_on(self, data_name, attempt, destination, dest_addr):
+        on_failure = lambda: self._failed(data_name, attempt)
+        if not self._send(data_name, destination, dest_addr, on_failure):
+            on_failure()
+
+    def _failed(self, data_name, attempt):
+        with self._lock:
+            attempt.sent -= 1
+            attempt.in_flight -= 1
+        self._launch(data_name, attempt, 1)
+        self._check_exhausted(attempt)
+
+    def _check_exhausted(self, attempt):
+        with self._lock:
+            exhausted = not attempt.done and attempt.in_flight == 0 and not attempt.routes
+            if exhausted:
+                attempt.done = True
+        if exhausted:
+            attempt.on_exhausted()
+
+    def _hedge(self, data_name, attempt):
+        with self._lock:
+            if attempt.done or not attempt.routes or attempt.sent >= attempt.strategy.fanout:
+                return
+            self.hedges += 1
+        self._launch(data_name, attempt, 1)
+        self._call_later(attempt.strategy.hedge_delay, lambda: self._hedge(data_name, attempt))
+
+    def _expire(self, now):
+        # Attempts are added with the same lifetime, so the oldest ones expire first
+        while self._attempts:
+            data_name, attempt = next(iter(self._attempts.items()))
+            if attempt.expiry > now:
+                break
+            del self._attempts[data_name]
+            # Its hedges and the routes replacing failed ones are not sent anymore
+            attempt.done = True
+
+
+class _Attempt:
+    __slots__ = ('strategy', 'routes', 'on_exhausted', 'expiry', 'sent', 'in_flight', 'done')
+
+    def __init__(self, strategy, routes, on_exhausted, expiry):
+        self.strategy = strategy
+        self.routes = routes
+        self.on_exhausted = on_exhausted
+        self.expiry = expiry
+        self.sent = 0  # Routes the interest was sent on, without the ones that failed or sent a NACK
+        self.in_flight = 0  # Routes that did not reply yet
+        self.done = False